@@ -21,6 +21,11 @@ CORS(app, resources={r"/api/*": {"origins": [
     "http://localhost:3000"
 ]}})
 
+# News buffers are filled in the background; handlers only read them
+if os.environ.get('NEWS_POLLER', '1') != '0':
+    from services.news_feed import start_poller
+    start_poller()
+
 @app.route('/')
 def index():
     return "🚀 Backend WiseFinan rodando! Acesse /api/home para dados."
@@ -33,6 +38,64 @@ def get_stocks():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stocks/screen', methods=['GET', 'POST'])
+def screen_stocks_route():
+    """
+    Server-side screener over the BASE snapshot.
+    /api/stocks/screen?where=roe_val > 0.15 and div_ebit < 2&sort=-roe_val&fields=ticker,price,roe_val&limit=20
+    (POST accepts the same keys as a JSON body.)
+    """
+    try:
+        from flask import request
+        from services.screener import screen_stocks, ScreenerError, DEFAULT_LIMIT
+
+        params = (request.json or {}) if request.method == 'POST' else request.args
+        fields = params.get('fields') or ''
+        if isinstance(fields, list):
+            fields = ','.join(fields)
+        try:
+            result = screen_stocks(
+                where=params.get('where') or None,
+                sort=params.get('sort') or None,
+                fields=fields or None,
+                limit=int(params.get('limit', DEFAULT_LIMIT)),
+                offset=int(params.get('offset', 0))
+            )
+        except (ScreenerError, TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/correlation', methods=['GET'])
+def get_correlation():
+    """
+    Correlation / covariance matrix of daily log returns from the candle store.
+    /api/correlation?tickers=PETR4,VALE3,ITUB4&window=126&kind=corr&cluster=1
+    (no tickers: the whole BASE universe)
+    """
+    try:
+        from flask import request
+        from services.correlation import correlation_matrix, DEFAULT_WINDOW
+
+        universe = [s['ticker'] for s in get_sheet_data() if s.get('ticker')]
+        tickers = [t for t in request.args.get('tickers', '').split(',') if t.strip()] or None
+        kind = request.args.get('kind', 'corr').strip().lower()
+        if kind not in ('corr', 'cov'):
+            return jsonify({"error": "kind must be corr or cov"}), 400
+        return jsonify(correlation_matrix(
+            universe, tickers,
+            window=request.args.get('window', DEFAULT_WINDOW, type=int),
+            kind=kind,
+            cluster=request.args.get('cluster', '0').lower() in ('1', 'true', 'yes')
+        ))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/calendar', methods=['GET'])
 def get_calendar():
     try:
@@ -77,57 +140,48 @@ def get_stock_history(ticker):
 
 @app.route('/api/chart/<ticker>', methods=['GET'])
 def get_chart_data(ticker):
-    """Fetch OHLCV candlestick data using yfinance."""
-    import yfinance as yf
+    """
+    OHLCV candlestick data from the local candle store (cached per ticker / range / interval).
+    ?indicators=sma:20,ema:9,rsi:14,macd:12:26:9,bb:20:2,atr:14,vwap adds
+    server-side indicator series computed on the local candle store.
+    ?max_points=300&mode=candle|line downsamples to the viewport width
+    (OHLC buckets / LTTB).
+    Prices are split- and dividend-adjusted ("adjusted": true, as yfinance
+    history()); ?adjusted=0 returns split-adjusted only prices, the basis the
+    indicators are computed on.
+    """
     from flask import request
-    import math
+    from services.charts import get_chart
     try:
         time_range = request.args.get('range', '1mo')
         interval = request.args.get('interval', '1d')
-        
-        # Brazilian tickers need .SA suffix for Yahoo Finance
-        yf_ticker = ticker if '.' in ticker else f"{ticker}.SA"
-        
-        stock = yf.Ticker(yf_ticker)
-        df = stock.history(period=time_range, interval=interval)
-        
-        if df.empty:
+        max_points = request.args.get('max_points', type=int)
+        mode = request.args.get('mode', 'candle').strip().lower()
+        if mode not in ('candle', 'line'):
+            return jsonify({"error": "mode must be candle or line", "candles": []}), 400
+        adjust = request.args.get('adjusted', '1').strip().lower() not in ('0', 'false', 'no')
+
+        chart = get_chart(ticker, time_range, interval, max_points, mode, adjust)
+        if not chart:
             return jsonify({"error": "Nenhum dado encontrado para este ativo.", "candles": []}), 404
-        
-        # Get company name
-        try:
-            info = stock.info
-            name = info.get('longName', info.get('shortName', ticker))
-        except:
-            name = ticker
-        
-        candles = []
-        for idx, row in df.iterrows():
-            # Convert timestamp to unix seconds
-            ts = int(idx.timestamp())
-            
-            o = round(row['Open'], 2) if not math.isnan(row['Open']) else 0
-            h = round(row['High'], 2) if not math.isnan(row['High']) else 0
-            l = round(row['Low'], 2) if not math.isnan(row['Low']) else 0
-            c = round(row['Close'], 2) if not math.isnan(row['Close']) else 0
-            v = int(row['Volume']) if not math.isnan(row['Volume']) else 0
-            
-            if o > 0 and h > 0 and l > 0 and c > 0:
-                candles.append({
-                    'time': ts,
-                    'open': o,
-                    'high': h,
-                    'low': l,
-                    'close': c,
-                    'volume': v
-                })
-        
-        return jsonify({
-            'ticker': ticker,
-            'name': name,
-            'currency': 'BRL',
-            'candles': candles
-        })
+
+        payload = dict(chart)  # the cached payload is shared between requests
+        candles = payload['candles']
+
+        # Optional server-side indicators (?indicators=sma:20,rsi:14,macd,bb:20:2)
+        indicators_spec = request.args.get('indicators', '').strip()
+        if indicators_spec:
+            from services.indicators import get_indicators
+            try:
+                payload['indicators'] = get_indicators(
+                    ticker.split('.')[0], indicators_spec, interval,
+                    start=candles[0]['time'] if candles else None,
+                    sample=[c['time'] for c in candles] if max_points else None,
+                    buckets=mode == 'candle')
+            except ValueError as e:
+                return jsonify({"error": str(e), "candles": []}), 400
+
+        return jsonify(payload)
     except Exception as e:
         import traceback
         print(f"[CHART ERROR] {ticker}: {e}")
@@ -152,6 +206,18 @@ def get_stock_options(ticker):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/stocks/<ticker>/volatility', methods=['GET'])
+def get_stock_volatility(ticker):
+    """Realized volatility estimators from the local candle store."""
+    try:
+        from services.volatility import realized_volatility, VOL_WINDOW
+        data = realized_volatility([ticker]).get(ticker.strip().upper())
+        if not data:
+            return jsonify({"error": "Sem histórico local para este ativo."}), 404
+        return jsonify(dict(data, ticker=ticker.upper(), window=VOL_WINDOW))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/stocks/<ticker>/fundamentals', methods=['GET'])
 def get_stock_fundamentals(ticker):
     try:
@@ -224,30 +290,71 @@ def update_rf():
 
 @app.route('/api/news/dashboard', methods=['GET'])
 def get_news_dashboard():
+    """
+    Market indicators + buffered news of a category.
+    /api/news/dashboard?category=BRASIL[&since=<cursor>]
+    News never waits on Google News (see services/news_feed.py); "cursor" is
+    the value to pass as `since` on the next poll to get only newer items
+    (returned oldest first, at most 10 per poll; keep polling until empty).
+    """
     try:
         from flask import request
-        from services.market_data import get_market_indicators, get_rss_news
+        from concurrent.futures import ThreadPoolExecutor
+        from services.market_data import get_market_indicators
+        from services.news_feed import get_news
         
         category = request.args.get('category', 'BRASIL')
-        
-        # Fetch loosely to avoid one failure blocking the other
+        since = request.args.get('since', type=int)
+
+        # Indicators and news in parallel; one failing never blocks the other
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            indicators_job = executor.submit(get_market_indicators)
+            news_job = executor.submit(get_news, category, 10, since)
+
         try:
-            indicators = get_market_indicators()
+            indicators = indicators_job.result()
         except Exception as e:
             print(f"Indicators failed: {e}")
             indicators = {}
 
         try:
-            news = get_rss_news(limit=10, topic=category)
+            news, cursor = news_job.result()
         except Exception as e:
             print(f"News failed: {e}")
-            news = []
+            news, cursor = [], since
 
-        return jsonify({"indicators": indicators, "news": news})
+        return jsonify({"indicators": indicators, "news": news, "cursor": cursor})
     except Exception as e:
         # Fallback to empty structure instead of 500
         return jsonify({"indicators": {}, "news": [], "error": str(e)})
 
+@app.route('/api/news/feed', methods=['GET'])
+def get_news_feed():
+    """
+    Buffered news of a topic or ticker, optionally only items after a cursor
+    (then oldest first, `limit` per call, so polling with the returned cursor
+    delivers every item once).
+    /api/news/feed?topic=MUNDO&limit=20
+    /api/news/feed?ticker=PETR4&since=1234
+    """
+    try:
+        from flask import request
+        from services.news_feed import NewsFeedError, get_news, topic_key
+
+        topic = request.args.get('topic', 'BRASIL')
+        ticker = request.args.get('ticker')
+        since = request.args.get('since', type=int)
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        try:
+            news, cursor = get_news(topic, limit, since, ticker=ticker)
+        except NewsFeedError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"topic": topic_key(topic, ticker), "news": news, "cursor": cursor})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/news/highlights', methods=['GET'])
 def get_news_highlights():
     try:
@@ -259,37 +366,17 @@ def get_news_highlights():
 
 @app.route('/api/news/movers', methods=['GET'])
 def get_market_movers():
+    """
+    Top gainers / losers / dividend payers of the BASE snapshot.
+    /api/news/movers?n=5[&sector=Bancos]
+    """
     try:
-        data = get_sheet_data()
-        
-        # Helper to parse percentage string to float
-        def parse_pct(val):
-            if isinstance(val, (int, float)): return float(val)
-            if not val or val == '-': return 0.0
-            try:
-                clean = str(val).replace('%', '').replace(',', '.').strip()
-                return float(clean)
-            except:
-                return 0.0
-
-        stocks = []
-        for s in data:
-             stocks.append({
-                 **s,
-                 "var_val": parse_pct(s.get('variation', '0')),
-                 "dy_val": parse_pct(s.get('dy', '0'))
-             })
-
-        # Sort
-        highs = sorted(stocks, key=lambda x: x['var_val'], reverse=True)[:5]
-        lows = sorted(stocks, key=lambda x: x['var_val'])[:5]
-        divs = sorted(stocks, key=lambda x: x['dy_val'], reverse=True)[:5]
-        
-        return jsonify({
-            "highs": highs,
-            "lows": lows,
-            "dividends": divs
-        })
+        from flask import request
+        from services.movers import get_market_movers as compute_movers
+
+        n = request.args.get('n', 5, type=int)
+        sector = request.args.get('sector', '').strip() or None
+        return jsonify(compute_movers(n, sector))
 
     except Exception as e:
         print(f"Error in movers: {e}")
@@ -349,11 +436,50 @@ def get_home_data():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/opportunities/top', methods=['GET'])
+def get_top_opportunities():
+    """
+    Best K options for a strategy, ranked server-side.
+    /api/opportunities/top?strategy=put_sale&metric=edge&k=20[&per_stock=3]
+    """
+    try:
+        from flask import request
+        from services.option_chain import prefetch_chain_sources
+        from services.ranking import rank_opportunities, METRICS
+        from services.strategies import STRATEGIES
+
+        strategy = request.args.get('strategy', '').strip().lower()
+        metric = request.args.get('metric', 'edge').strip().lower()
+        k = request.args.get('k', 20, type=int)
+        per_stock = request.args.get('per_stock', None, type=int)
+        if strategy not in STRATEGIES:
+            return jsonify({"error": f"strategy must be one of {', '.join(STRATEGIES)}"}), 400
+        if metric not in METRICS:
+            return jsonify({"error": f"metric must be one of {', '.join(METRICS)}"}), 400
+
+        prefetch_chain_sources()
+        return jsonify(rank_opportunities(strategy, metric, k, per_stock))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/strategies/pozinho', methods=['GET'])
 def get_pozinho_strategies():
     try:
+        from flask import request
         from services.sheets import get_pozinho_options
-        data = get_pozinho_options()
+
+        # Optional thresholds (defaults reproduce the classic pozinho rule)
+        max_price = request.args.get('max_price', 0.05, type=float)
+        min_delta = request.args.get('min_delta', 0.01, type=float)
+        min_bdays = request.args.get('min_bdays', None, type=int)
+        max_bdays = request.args.get('max_bdays', None, type=int)
+        option_type = request.args.get('type', '').strip().upper() or None
+        if option_type not in (None, 'CALL', 'PUT'):
+            return jsonify({"error": "type must be CALL or PUT"}), 400
+
+        data = get_pozinho_options(max_price, min_delta, min_bdays, max_bdays, option_type)
         return jsonify(data)
     except Exception as e:
         import traceback
@@ -361,6 +487,167 @@ def get_pozinho_strategies():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/strategies/payoff', methods=['POST'])
+def get_strategy_payoff():
+    """
+    Multi-leg P&L over a spot x date grid.
+    Body: {"legs": [{"ticker": "PETRK300", "side": "sell", "quantity": 100},
+                    {"type": "STOCK", "ticker": "PETR4", "quantity": 100}],
+           "spot_points": 200, "date_points": 30, "spot_range": 0.3}
+    """
+    try:
+        from flask import request
+        from services.option_chain import prefetch_chain_sources, get_option_chain
+        from services.payoff import compute_payoff, PayoffError
+
+        data = request.json or {}
+        legs = data.get('legs') or []
+        if not legs:
+            return jsonify({"error": "legs required"}), 400
+
+        prefetch_chain_sources()
+        try:
+            result = compute_payoff(
+                legs, get_option_chain(),
+                underlying=data.get('underlying'),
+                spot_points=data.get('spot_points', 200),
+                date_points=data.get('date_points', 30),
+                spot_range=data.get('spot_range', 0.30),
+                sigma=data.get('sigma'),
+                r=data.get('r')
+            )
+        except PayoffError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/portfolio/risk', methods=['POST'])
+def get_portfolio_risk():
+    """
+    Portfolio Greeks and 1-day / 10-day historical VaR and expected shortfall.
+    Body: {"positions": [{"ticker": "PETRK300", "side": "sell", "quantity": 1000},
+                         {"ticker": "VALE3", "quantity": 200}],
+           "history": 500}
+    """
+    try:
+        from flask import request
+        from services.option_chain import prefetch_chain_sources, get_option_chain
+        from services.risk import portfolio_risk, RiskError, DEFAULT_HISTORY
+
+        data = request.json or {}
+        positions = data.get('positions') or []
+        if not positions:
+            return jsonify({"error": "positions required"}), 400
+
+        prefetch_chain_sources()
+        try:
+            result = portfolio_risk(
+                positions, get_option_chain(),
+                history=data.get('history', DEFAULT_HISTORY),
+                r=data.get('r')
+            )
+        except RiskError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/alerts', methods=['GET', 'POST'])
+def alerts_handler():
+    """
+    GET ?user=: registered alerts. POST: registers one, e.g.
+    {"user": "ana", "ticker": "PETR4", "field": "price", "op": "below", "value": 30}
+    {"user": "ana", "ticker": "PETR4", "kind": "pozinho"}
+    """
+    try:
+        from flask import request
+        from services.alerts import get_alert_engine, AlertError
+
+        engine = get_alert_engine()
+        if request.method == 'GET':
+            return jsonify(engine.list(request.args.get('user') or None))
+        try:
+            return jsonify(engine.add(request.json or {})), 201
+        except AlertError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/alerts/<int:alert_id>', methods=['DELETE'])
+def delete_alert(alert_id):
+    from services.alerts import get_alert_engine
+    if not get_alert_engine().remove(alert_id):
+        return jsonify({"error": "Alert not found"}), 404
+    return jsonify({"status": "deleted"})
+
+@app.route('/api/alerts/events', methods=['GET'])
+def alert_events():
+    """Polling: fired events after ?since=<event id> (optionally ?user=)."""
+    try:
+        from flask import request
+        from services.alerts import get_alert_engine
+        from services.option_chain import get_option_chain
+
+        # Reading the snapshots triggers a refresh (and evaluation) when their TTL expired
+        get_sheet_data()
+        get_option_chain()
+        since = request.args.get('since', 0, type=int)
+        return jsonify(get_alert_engine().events_since(since, request.args.get('user') or None))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/alerts/stream', methods=['GET'])
+def alert_stream():
+    """
+    Server-Sent Events: pushes fired events as they happen (?since=, ?user=).
+    Each stream ends after STREAM_LIFETIME seconds and EventSource reconnects
+    with Last-Event-ID (see services/alerts.py for the limits; long-lived
+    streams need an async gunicorn worker). 503 when all stream slots are busy.
+    """
+    import json
+    import time
+    from flask import request, Response, stream_with_context
+    from services.alerts import (KEEPALIVE, STREAM_LIFETIME, get_alert_engine, release_stream_slot,
+                                 start_refresher, stream_slot)
+
+    engine = get_alert_engine()
+    user = request.args.get('user') or None
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+
+    if not stream_slot():
+        return jsonify({"error": "Too many alert streams, poll /api/alerts/events"}), 503, {'Retry-After': '15'}
+    start_refresher()
+
+    def generate():
+        last = since
+        deadline = time.monotonic() + STREAM_LIFETIME
+        yield "retry: 3000\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = engine.wait(last, user, timeout=min(KEEPALIVE, remaining))
+            for event in events:
+                last = event["id"]
+                yield f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+            if not events:
+                yield ": keep-alive\n\n"
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release_stream_slot)   # also when the client disconnects
+    return response
+
+
 # Chat Store (In-Memory)
 chat_messages = []
 
@@ -0,0 +1,44 @@
+# backtest_rules.py — Backtest das regras CHEAP/EXPENSIVE e pozinho sobre o arquivo histórico de opções
+#
+# Exemplos:
+#   python scripts/backtest_rules.py
+#   python scripts/backtest_rules.py --strategies put_sale,pozinho --start 2025-01-01 --trades trades.csv
+
+import os, sys, argparse, json, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from services.backtest import DEFAULT_RISK_FREE, STRATEGIES, run_backtest
+from services.chain_archive import ARCHIVE_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest das estratégias de opções sobre snapshots diários arquivados")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="Lista separada por vírgula")
+    parser.add_argument("--start", default=None, help="Data inicial AAAA-MM-DD")
+    parser.add_argument("--end", default=None, help="Data final AAAA-MM-DD")
+    parser.add_argument("--tickers", default=None, help="Subjacentes (padrão: todos do arquivo)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Pasta do arquivo histórico")
+    parser.add_argument("--workers", type=int, default=None, help="Processos (padrão: nº de CPUs)")
+    parser.add_argument("--juros", type=float, default=DEFAULT_RISK_FREE,
+                        help="Taxa livre de risco anual do delta do pozinho (ex.: 0.1075)")
+    parser.add_argument("--trades", default=None, help="CSV de saída com todas as operações")
+    args = parser.parse_args()
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    tickers = [t.strip().upper() for t in args.tickers.split(",")] if args.tickers else None
+
+    t0 = time.time()
+    result = run_backtest(strategies, args.start, args.end, tickers, args.archive_dir, args.workers,
+                          r=args.juros)
+    elapsed = time.time() - t0
+
+    print(f"[INFO] Período: {result['period']} ({elapsed:.1f}s)")
+    print(json.dumps(result["summary"], indent=2, ensure_ascii=False))
+
+    if args.trades and not result["trades"].empty:
+        result["trades"].to_csv(args.trades, index=False)
+        print(f"[OK] {len(result['trades'])} operações gravadas em {args.trades}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmark_pricers.py — Compara o precificador binomial (services/binomial.py) com o Black-Scholes em lote
+#
+# Gera uma cadeia sintética (spot, strike, prazo e vol aleatórios) e mede:
+#   - tempo de bs_batch vs binomial_batch (LR e CRR, europeia e americana)
+#   - erro da binomial europeia contra o Black-Scholes fechado
+#   - convergência da americana contra uma árvore de referência com muitos passos
+# Exemplos:
+#   python scripts/benchmark_pricers.py
+#   python scripts/benchmark_pricers.py --options 5000 --steps 101
+
+import os, sys, argparse, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from services.bs_engine import bs_price_batch
+from services.binomial import DEFAULT_STEPS, binomial_batch
+
+
+def synthetic_chain(n, seed=7):
+    rng = np.random.default_rng(seed)
+    S = rng.uniform(5.0, 100.0, n)
+    K = S * rng.uniform(0.7, 1.3, n)
+    T = rng.integers(5, 250, n) / 252.0
+    sigma = rng.uniform(0.15, 0.80, n)
+    is_call = rng.random(n) < 0.5
+    return S, K, T, sigma, is_call
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Black-Scholes vs binomial (LR / CRR)")
+    parser.add_argument("--options", type=int, default=2000, help="Quantidade de opções sintéticas")
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="Passos da árvore")
+    parser.add_argument("--ref-steps", type=int, default=801, help="Passos da árvore de referência")
+    parser.add_argument("--r", type=float, default=0.1075, help="Taxa livre de risco anual")
+    args = parser.parse_args()
+
+    S, K, T, sigma, is_call = synthetic_chain(args.options)
+    r = args.r
+
+    bs, t_bs = timed(lambda: bs_price_batch(S, K, T, r, sigma, is_call))
+    print(f"[BS] {args.options} opções em {t_bs * 1000:.1f} ms")
+
+    for method in ("lr", "crr"):
+        euro, t_euro = timed(lambda: binomial_batch(S, K, T, r, sigma, is_call, american=False,
+                                                    steps=args.steps, method=method))
+        amer, t_amer = timed(lambda: binomial_batch(S, K, T, r, sigma, is_call,
+                                                    steps=args.steps, method=method))
+        err = np.abs(euro - bs)
+        print(f"[{method.upper()}] europeia {t_euro * 1000:.1f} ms | americana {t_amer * 1000:.1f} ms | "
+              f"erro vs BS: máx {err.max():.5f}, médio {err.mean():.5f}")
+
+        premium = amer - euro
+        print(f"[{method.upper()}] prêmio de exercício antecipado: puts {premium[~is_call].mean():.4f}, "
+              f"calls {premium[is_call].mean():.4f} (médio, R$)")
+
+    ref, t_ref = timed(lambda: binomial_batch(S, K, T, r, sigma, is_call, steps=args.ref_steps), repeat=1)
+    for method in ("lr", "crr"):
+        amer = binomial_batch(S, K, T, r, sigma, is_call, steps=args.steps, method=method)
+        err = np.abs(amer - ref)
+        print(f"[{method.upper()}] americana {args.steps} vs LR {args.ref_steps} passos "
+              f"({t_ref:.1f}s): máx {err.max():.5f}, médio {err.mean():.5f}")
+
+    # Dividendos discretos: um pagamento de 2% do spot no meio da vida da opção
+    div_times = (T / 2)[:, None]
+    div_amounts = (S * 0.02)[:, None]
+    with_div, t_div = timed(lambda: binomial_batch(S, K, T, r, sigma, is_call, steps=args.steps,
+                                                   div_times=div_times, div_amounts=div_amounts))
+    plain = binomial_batch(S, K, T, r, sigma, is_call, steps=args.steps)
+    print(f"[DIV] americana com dividendos {t_div * 1000:.1f} ms | calls {np.mean(with_div[is_call] - plain[is_call]):+.4f}, "
+          f"puts {np.mean(with_div[~is_call] - plain[~is_call]):+.4f} (R$ médio)")
+
+
+if __name__ == "__main__":
+    main()
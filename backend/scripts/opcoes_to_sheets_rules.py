@@ -7,6 +7,9 @@ import requests
 from requests.adapters import HTTPAdapter, Retry
 from typing import List
 
+# ==== Arquivo histórico (services/chain_archive.py, importado só quando usado: exige pyarrow) ====
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
 # ==== Google Sheets ====
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
@@ -143,6 +146,44 @@ def write_df_to_sheet(df: pd.DataFrame, spreadsheet_name: str, worksheet_name: s
 
     return True
 
+# ---------- Arquivo histórico ----------
+def fetch_spots(tickers: List[str]) -> dict:
+    """Último fechamento de cada subjacente (Yahoo, sufixo .SA) num único download."""
+    import yfinance as yf
+    symbols = [f"{t}.SA" for t in tickers]
+    data = yf.download(symbols, period="5d", progress=False, auto_adjust=False)
+    if data.empty:
+        return {}
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(symbols[0])
+    last = closes.ffill().iloc[-1]
+    return {sym.replace(".SA", ""): float(v) for sym, v in last.items() if pd.notna(v)}
+
+def fetch_risk_free() -> float:
+    from services.indices import get_economic_indices
+    try:
+        return float(get_economic_indices().get("selic", "10.75").replace("%", "").replace(",", ".")) / 100.0
+    except Exception:
+        return 0.1075
+
+def archive_snapshot(df: pd.DataFrame, archive_dir: str = None) -> None:
+    from services.chain_archive import ARCHIVE_DIR, archive_chain
+    archive_dir = archive_dir or ARCHIVE_DIR
+    tickers = sorted(df["subjacente"].dropna().unique().tolist())
+    spots = fetch_spots(tickers)
+    r = fetch_risk_free()
+    n = archive_chain(df, spots, r, root=archive_dir)
+    print(f"[OK] Arquivo histórico: {n} subjacentes em '{archive_dir}' (spots: {len(spots)}/{len(tickers)}, r={r:.4f}).")
+
+def archive_stock_snapshot(snapshot_dir: str = None) -> None:
+    # Valuation do dia (aba BASE) para o backtester: um arquivo por dia, regravado a cada execução
+    from services.chain_archive import STOCK_SNAPSHOT_DIR, write_stock_snapshot
+    from services.sheets import get_sheet_data
+    snapshot_dir = snapshot_dir or STOCK_SNAPSHOT_DIR
+    n = write_stock_snapshot(get_sheet_data() or [], root=snapshot_dir)
+    print(f"[OK] Snapshot da BASE: {n} ativos em '{snapshot_dir}'.")
+
 # ---------- MAIN ----------
 def main():
     parser = argparse.ArgumentParser(description="Opções B3 (TODAS, somente negócios > 0) → Google Sheets")
@@ -151,6 +192,11 @@ def main():
     parser.add_argument("-s", "--sheet", default=SPREADSHEET, help="Nome da planilha")
     parser.add_argument("-w", "--tab", default=WORKSHEET, help="Nome da aba")
     parser.add_argument("-c", "--creds", default=CREDS_JSON, help="JSON da Service Account")
+    parser.add_argument("--archive-dir", default=None,
+                        help="Pasta do arquivo histórico de cadeias (Parquet; padrão: OPTION_ARCHIVE_DIR ou backend/data/option_chains)")
+    parser.add_argument("--stock-snapshot-dir", default=None,
+                        help="Pasta dos snapshots diários da aba BASE (Parquet; padrão: STOCK_SNAPSHOT_DIR ou backend/data/stock_snapshots)")
+    parser.add_argument("--no-archive", action="store_true", help="Não grava o snapshot diário no arquivo histórico")
     args = parser.parse_args()
     
     # Try to get credentials: file first, then env var
@@ -215,5 +261,16 @@ def main():
     write_df_to_sheet(final, args.sheet, args.tab, creds_source)
     print("[OK] Planilha atualizada.")
 
+    # Histórico: o Sheets é sobrescrito, o arquivo guarda um snapshot por dia
+    if not args.no_archive:
+        try:
+            archive_snapshot(final, args.archive_dir)
+        except Exception as e:
+            print(f"[WARN] Falha ao arquivar snapshot ({e})")
+        try:
+            archive_stock_snapshot(args.stock_snapshot_dir)
+        except Exception as e:
+            print(f"[WARN] Falha ao gravar snapshot da BASE ({e})")
+
 if __name__ == "__main__":
     main()
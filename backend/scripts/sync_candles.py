@@ -0,0 +1,36 @@
+# sync_candles.py — Atualiza o armazenamento local de candles (services/candle_store.py)
+#
+# Baixa apenas as barras posteriores à última gravada de cada ativo.
+# Exemplos:
+#   python scripts/sync_candles.py                       (todos os ativos da aba BASE)
+#   python scripts/sync_candles.py --tickers PETR4,VALE3 --interval 1d
+
+import os, sys, argparse, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from services.candle_store import CANDLE_DIR, sync
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza candles OHLCV locais com o Yahoo Finance")
+    parser.add_argument("--tickers", default=None, help="Lista separada por vírgula (padrão: aba BASE)")
+    parser.add_argument("--interval", default="1d", help="Intervalo das barras (1d, 1wk, 1h...)")
+    parser.add_argument("--dir", default=CANDLE_DIR, help="Pasta do armazenamento de candles")
+    args = parser.parse_args()
+
+    if args.tickers:
+        tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    else:
+        from services.sheets import get_sheet_data
+        tickers = [s['ticker'].strip().upper() for s in get_sheet_data() if s.get('ticker')]
+
+    t0 = time.time()
+    written = sync(tickers, args.interval, args.dir, force=True)
+    print(f"[OK] {sum(written.values())} barras em {len(written)}/{len(tickers)} ativos ({time.time() - t0:.1f}s)")
+    missing = [t for t in tickers if not written.get(t)]
+    if missing:
+        print(f"[INFO] Sem barras novas: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
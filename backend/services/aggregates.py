@@ -0,0 +1,176 @@
+"""
+Coarser candle intervals derived from stored base bars.
+
+Weekly and monthly bars follow deterministically from daily bars (and 15m from
+5m), so only base intervals are downloaded and stored; derived ones are built
+with a vectorized group-by: period keys on the B3 local date / time, group
+starts from np.diff, then reduceat for first open / max high / min low / last
+close / summed volume and dividends / combined split ratio. Bars are stamped
+with the period start (Monday, the 1st of the month, the quarter-hour) in B3
+local time, as Yahoo does.
+
+Aggregates are cached per (ticker, interval). Complete periods are committed
+once, when a base bar of the next period lands; the last, still-open period is
+re-aggregated from its few base bars on every read (as in the other books, the
+newest stored bar may be replaced by the next sync), so a read costs
+O(bars since the period start) instead of O(history).
+"""
+import threading
+
+import numpy as np
+
+from services.candle_store import COLUMNS, _to_unix, read_candles, series_version
+
+# derived interval -> base interval it is built from
+DERIVED_INTERVALS = {"1wk": "1d", "1mo": "1d", "15m": "5m"}
+B3_UTC_OFFSET = -3 * 3600
+DAY = 86400
+
+
+def base_interval(interval):
+    """Interval actually stored / downloaded for `interval`."""
+    return DERIVED_INTERVALS.get(interval, interval)
+
+
+def period_keys(times, interval):
+    """Period start (unix seconds, B3 local start of the period) of each bar time."""
+    local = np.asarray(times, dtype=np.int64) + B3_UTC_OFFSET
+    if interval == "15m":
+        return local // 900 * 900 - B3_UTC_OFFSET
+    # Daily bars are stamped at local midnight: 03:00 UTC, but 02:00 UTC under
+    # the daylight saving time Brazil used until 2019 -> one hour of slack
+    days = (local + 3600) // DAY
+    if interval == "1wk":
+        start = days - (days + 3) % 7      # epoch day 0 is a Thursday
+    elif interval == "1mo":
+        start = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    else:
+        raise ValueError(f"No aggregation rule for interval {interval}")
+    return start * DAY - B3_UTC_OFFSET
+
+
+def aggregate(candles, interval, keys_only=False):
+    """
+    Bars of `interval` from base candles ({column: array}) as (bars, starts):
+    starts[i] is the index of the first base bar of group i. keys_only skips
+    the bars (only "time" is needed then).
+    """
+    times = np.asarray(candles["time"])
+    if len(times) == 0:
+        return {col: np.empty(0, dtype=dtype) for col, dtype in COLUMNS.items()}, np.empty(0, dtype=np.int64)
+    keys = period_keys(times, interval)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    if keys_only:
+        return None, starts
+    ends = np.append(starts[1:], len(times)) - 1
+    bars = {
+        "time": keys[starts],
+        "open": np.asarray(candles["open"])[starts],
+        "high": np.maximum.reduceat(np.asarray(candles["high"]), starts),
+        "low": np.minimum.reduceat(np.asarray(candles["low"]), starts),
+        "close": np.asarray(candles["close"])[ends],
+        "volume": np.add.reduceat(np.asarray(candles["volume"]), starts),
+        "dividends": np.add.reduceat(np.asarray(candles["dividends"]), starts),
+        "splits": _split_factors(np.asarray(candles["splits"]), starts),
+    }
+    return bars, starts
+
+
+def _split_factors(splits, starts):
+    """Combined split ratio of each group (0 = no split, as in the base bars)."""
+    factor = np.multiply.reduceat(np.where(splits > 0, splits, 1.0), starts)
+    return np.where(factor == 1.0, 0.0, factor)
+
+
+class _Aggregate:
+    def __init__(self):
+        self.committed = {col: np.empty(0, dtype=dtype) for col, dtype in COLUMNS.items()}
+        self.base_used = 0        # base bars consumed by the committed (complete) periods
+        self.base_last = None     # time of the last consumed base bar
+        self.version = None
+
+
+class AggregateBook:
+    """Cached derived-interval bars per (ticker, interval), updated incrementally."""
+
+    def __init__(self, root=None, max_series=2048):
+        self.root = root
+        self.max_series = max_series
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def _refresh(self, ticker, interval):
+        base = base_interval(interval)
+        version = series_version(ticker, base, self.root)
+        candles = read_candles(ticker, base, root=self.root)
+        entry = self.series.get((ticker, interval))
+        if entry is None or entry.version != version:
+            n = len(candles["time"])
+            if entry is None or entry.base_used > n or entry.version[2] != version[2] or (
+                    entry.base_used and int(candles["time"][entry.base_used - 1]) != entry.base_last):
+                # First read, or base bars rewritten under committed periods (shorter,
+                # other times, or a new generation after a split reload): rebuild
+                entry = _Aggregate()
+                if len(self.series) >= self.max_series:
+                    self.series.pop(next(iter(self.series)))
+                self.series[(ticker, interval)] = entry
+            _, starts = aggregate({"time": candles["time"][entry.base_used:]}, interval, keys_only=True)
+            if len(starts) > 1:
+                # Every period but the last is complete: commit it
+                done = entry.base_used + int(starts[-1])
+                bars, _ = aggregate({col: arr[entry.base_used:done] for col, arr in candles.items()}, interval)
+                entry.committed = {col: np.concatenate([entry.committed[col], bars[col]]) for col in COLUMNS}
+                entry.base_used = done
+                entry.base_last = int(candles["time"][done - 1])
+            entry.version = version
+
+        # The open period is re-aggregated on every read: its newest base bar can be
+        # replaced in place by the next sync without changing the series version
+        tail, _ = aggregate({col: arr[entry.base_used:] for col, arr in candles.items()}, interval)
+        return {col: np.concatenate([entry.committed[col], tail[col]]) for col in COLUMNS}
+
+    def read(self, ticker, interval):
+        with self.lock:
+            return self._refresh(ticker.strip().upper(), interval)
+
+    def version(self, ticker, interval):
+        """(bars, last time, base generation) of the derived series, like candle_store.series_version."""
+        ticker = ticker.strip().upper()
+        with self.lock:
+            bars = self._refresh(ticker, interval)
+            gen = self.series[(ticker, interval)].version[2]
+        n = len(bars["time"])
+        return (n, int(bars["time"][-1]), gen) if n else (0, None, gen)
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def _book(root=None):
+    with _books_lock:
+        book = _books.get(root)
+        if book is None:
+            book = _books[root] = AggregateBook(root)
+        return book
+
+
+def read_interval(ticker, interval="1d", start=None, end=None, root=None):
+    """
+    read_candles() for any interval: base intervals straight from the store,
+    derived ones from the cached aggregates (same {column: array} layout).
+    """
+    if interval not in DERIVED_INTERVALS:
+        return read_candles(ticker, interval, start, end, root)
+    bars = _book(root).read(ticker, interval)
+    times = bars["time"]
+    lo = 0 if start is None else int(np.searchsorted(times, _to_unix(start), side="left"))
+    hi = len(times) if end is None else int(np.searchsorted(times, _to_unix(end, end_of_day=True), side="right"))
+    return {col: arr[lo:hi] for col, arr in bars.items()}
+
+
+def interval_version(ticker, interval="1d", root=None):
+    """series_version() for any interval."""
+    if interval not in DERIVED_INTERVALS:
+        return series_version(ticker, interval, root)
+    return _book(root).version(ticker, interval)
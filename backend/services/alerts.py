@@ -0,0 +1,356 @@
+"""
+Price / valuation / pozinho alerts.
+
+Users register thresholds on BASE fields:
+    price       spot price (R$)
+    falta_val   distance to the target, in % (as in the BASE sheet: -9.0 = 9% below)
+    min_gap     price / min_val - 1   (0 = touching "Custo Baixo")
+    max_gap     price / max_val - 1   (0 = touching "Custo Alto")
+    change_day  day variation (fraction, 0.03 = +3%)
+with op 'above' (fires when the value rises through the threshold) or 'below'
+(falls through it), or a 'pozinho' alert on an underlying (fires when one of
+its options enters the pozinho rule, see services/strategies.py).
+
+Evaluation is incremental. Each BASE snapshot is compared with the previous one
+and only tickers whose value moved are looked at. Per (field, op), thresholds
+are kept sorted by (ticker, threshold), so the alerts crossed by a move from
+`old` to `new` are one searchsorted range inside the ticker's segment. Fired
+events go to an in-memory queue read by polling (events since an id) or SSE;
+snapshots are refreshed by one background AlertRefresher, not by each stream.
+"""
+import itertools
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+FIELDS = ("price", "falta_val", "min_gap", "max_gap", "change_day")
+OPS = ("above", "below")
+MAX_EVENTS = 10000
+
+# SSE (/api/alerts/stream). Under gunicorn's threaded workers every open stream
+# holds a request thread, so streams are bounded: each one ends after
+# STREAM_LIFETIME seconds (EventSource reconnects by itself, resuming from
+# Last-Event-ID) and at most MAX_STREAMS are open at once. Long-lived streams
+# for many clients need an async worker class (gevent / eventlet).
+STREAM_LIFETIME = 60
+KEEPALIVE = 15
+MAX_STREAMS = 4
+REFRESH_INTERVAL = 15   # seconds between two snapshot refreshes of the alert refresher
+
+
+class AlertError(ValueError):
+    """Invalid alert definition (unknown field / op, missing ticker...)."""
+
+
+def stock_values(stocks):
+    """{ticker: {field: float}} for the alert FIELDS of a BASE snapshot (NaN when missing)."""
+    from services.sheets import parse_price
+    from services.screener import parse_number
+
+    values = {}
+    for s in stocks or []:
+        ticker = str(s.get('ticker', '')).strip().upper()
+        if not ticker:
+            continue
+        price = parse_price(s.get('price', 0.0)) or np.nan
+        min_val = parse_price(s.get('min_val', 0.0))
+        max_val = parse_price(s.get('max_val', 0.0))
+        try:
+            falta = float(s.get('falta_val', np.nan))
+        except (TypeError, ValueError):
+            falta = np.nan
+        values[ticker] = {
+            "price": price,
+            "falta_val": np.nan if falta == -999.0 else falta,
+            "min_gap": price / min_val - 1.0 if min_val > 0 else np.nan,
+            "max_gap": price / max_val - 1.0 if max_val > 0 else np.nan,
+            "change_day": parse_number(s.get('change_day')),
+        }
+    return values
+
+
+class _ThresholdIndex:
+    """Alert ids of one (field, op) sorted by (ticker id, threshold), with per-ticker segments."""
+
+    def __init__(self, ids, tids, thresholds, n_tickers):
+        order = np.lexsort((thresholds, tids))
+        self.ids = ids[order]
+        self.thresholds = thresholds[order]
+        tids = tids[order]
+        self.starts = np.searchsorted(tids, np.arange(n_tickers + 1), side="left")
+
+    def crossed(self, tid, old, new, op):
+        """Alert ids whose threshold lies between old and new in the op's direction."""
+        s, e = self.starts[tid], self.starts[tid + 1]
+        if s == e:
+            return self.ids[:0]
+        seg = self.thresholds[s:e]
+        if op == "above":   # old < t <= new
+            lo, hi = np.searchsorted(seg, old, side="right"), np.searchsorted(seg, new, side="right")
+        else:               # new <= t < old
+            lo, hi = np.searchsorted(seg, new, side="left"), np.searchsorted(seg, old, side="left")
+        return self.ids[s + lo:s + hi]
+
+
+class AlertEngine:
+    def __init__(self, max_events=MAX_EVENTS):
+        self.alerts = {}                      # id -> definition dict
+        self.tickers = {}                     # ticker -> tid
+        self.indexes = None                   # {(field, op): _ThresholdIndex}, rebuilt lazily
+        self.pozinho = {}                     # underlying -> set of alert ids
+        self.last_values = {}                 # {field: float array by tid}
+        self.last_pozinho = None              # option tickers in the pozinho set
+        self.events = deque(maxlen=max_events)
+        self.next_alert = itertools.count(1)
+        self.next_event = itertools.count(1)
+        self.lock = threading.Lock()
+        self.new_events = threading.Condition(self.lock)
+
+    # --- Registry ---
+
+    def _tid(self, ticker):
+        if ticker not in self.tickers:
+            self.tickers[ticker] = len(self.tickers)
+            for field, arr in self.last_values.items():
+                self.last_values[field] = np.append(arr, np.nan)
+        return self.tickers[ticker]
+
+    def add(self, definition):
+        """Registers an alert; returns it with its id. Raises AlertError."""
+        ticker = str(definition.get('ticker', '')).strip().upper()
+        kind = str(definition.get('kind', 'threshold')).strip().lower()
+        alert = {"user": definition.get('user'), "ticker": ticker, "kind": kind,
+                 "repeat": bool(definition.get('repeat', False)), "created": time.time()}
+
+        if kind == 'pozinho':
+            if not ticker:
+                raise AlertError("ticker (underlying) required")
+        elif kind == 'threshold':
+            field = str(definition.get('field', '')).strip().lower()
+            op = str(definition.get('op', '')).strip().lower()
+            if not ticker:
+                raise AlertError("ticker required")
+            if field not in FIELDS:
+                raise AlertError(f"field must be one of {', '.join(FIELDS)}")
+            if op not in OPS:
+                raise AlertError("op must be 'above' or 'below'")
+            try:
+                value = float(definition.get('value'))
+            except (TypeError, ValueError):
+                raise AlertError("numeric value required")
+            if not np.isfinite(value):
+                raise AlertError("numeric value required")
+            alert.update(field=field, op=op, value=value)
+        else:
+            raise AlertError("kind must be 'threshold' or 'pozinho'")
+
+        with self.lock:
+            alert["id"] = next(self.next_alert)
+            self.alerts[alert["id"]] = alert
+            if kind == 'pozinho':
+                self.pozinho.setdefault(ticker, set()).add(alert["id"])
+            else:
+                self._tid(ticker)
+                self.indexes = None
+                # Already past the threshold on the last snapshot: fire right away
+                current = self.last_values.get(alert["field"])
+                if current is not None:
+                    v = current[self.tickers[ticker]]
+                    if np.isfinite(v) and (v >= value if op == "above" else v <= value):
+                        self._fire([alert["id"]], {ticker: v}, reason="already")
+        return dict(alert)
+
+    def remove(self, alert_id):
+        with self.lock:
+            alert = self.alerts.pop(alert_id, None)
+            if alert is None:
+                return False
+            if alert["kind"] == 'pozinho':
+                self.pozinho.get(alert["ticker"], set()).discard(alert_id)
+            else:
+                self.indexes = None
+            return True
+
+    def list(self, user=None):
+        with self.lock:
+            return [dict(a) for a in self.alerts.values() if user is None or a["user"] == user]
+
+    def _build_indexes(self):
+        groups = {}
+        for a in self.alerts.values():
+            if a["kind"] == 'threshold':
+                groups.setdefault((a["field"], a["op"]), []).append((a["id"], self.tickers[a["ticker"]], a["value"]))
+        self.indexes = {}
+        for key, rows in groups.items():
+            ids, tids, thresholds = (np.array(col) for col in zip(*rows))
+            self.indexes[key] = _ThresholdIndex(ids.astype(np.int64), tids.astype(np.int64),
+                                                thresholds.astype(float), len(self.tickers))
+
+    # --- Evaluation ---
+
+    def _fire(self, ids, values, reason="crossed", extra=None):
+        """Queues one event per alert id (lock held); one-shot alerts are removed."""
+        now = time.time()
+        for alert_id in ids:
+            alert = self.alerts.get(int(alert_id))
+            if alert is None:
+                continue
+            event = {"id": next(self.next_event), "time": now, "alert_id": alert["id"],
+                     "user": alert["user"], "ticker": alert["ticker"], "kind": alert["kind"], "reason": reason}
+            if alert["kind"] == 'threshold':
+                event.update(field=alert["field"], op=alert["op"], threshold=alert["value"],
+                             value=float(values[alert["ticker"]]))
+            if extra:
+                event.update(extra)
+            self.events.append(event)
+            if not alert["repeat"]:
+                # Stale index entries of removed alerts are skipped above and
+                # dropped at the next rebuild (on add / remove)
+                self.alerts.pop(alert["id"], None)
+                if alert["kind"] == 'pozinho':
+                    self.pozinho.get(alert["ticker"], set()).discard(alert["id"])
+        if ids is not None and len(ids):
+            self.new_events.notify_all()
+
+    def on_stocks(self, stocks):
+        """Evaluates the threshold alerts against a new BASE snapshot; returns events fired."""
+        snapshot = stock_values(stocks)
+        fired = 0
+        with self.lock:
+            for ticker in snapshot:
+                self._tid(ticker)
+            n = len(self.tickers)
+            if self.indexes is None:
+                self._build_indexes()
+            names = list(self.tickers)  # tid -> ticker (insertion order)
+
+            for field in FIELDS:
+                new = np.full(n, np.nan)
+                for ticker, vals in snapshot.items():
+                    new[self.tickers[ticker]] = vals[field]
+                old = self.last_values.get(field)
+                self.last_values[field] = new
+                if old is None:
+                    continue
+                moved = np.flatnonzero(np.isfinite(old) & np.isfinite(new) & (old != new))
+                for op in OPS:
+                    index = self.indexes.get((field, op))
+                    if index is None:
+                        continue
+                    tids = moved[new[moved] > old[moved]] if op == "above" else moved[new[moved] < old[moved]]
+                    tids = tids[tids < len(index.starts) - 1]  # tickers seen after the last rebuild have no alerts
+                    tids = tids[index.starts[tids + 1] > index.starts[tids]]  # tickers with alerts only
+                    if len(tids) == 0:
+                        continue
+                    for tid in tids:
+                        ids = index.crossed(tid, old[tid], new[tid], op)
+                        if len(ids):
+                            self._fire(ids, {names[tid]: new[tid]})
+                            fired += len(ids)
+        return fired
+
+    def on_chain(self, chain):
+        """Fires pozinho alerts for options that entered the pozinho rule since the last chain."""
+        from services.ranking import strategy_mask
+
+        rows = np.flatnonzero(strategy_mask(chain, "pozinho"))
+        current = {str(chain.rows[i].get('ticker', '')).strip().upper(): i for i in rows}
+        fired = 0
+        with self.lock:
+            previous, self.last_pozinho = self.last_pozinho, set(current)
+            if previous is None or not any(self.pozinho.values()):
+                return 0
+            for option in set(current) - previous:
+                i = current[option]
+                underlying = chain.stocks[chain.stock_idx[i]]['ticker'].strip().upper()
+                ids = sorted(self.pozinho.get(underlying, ()))
+                if ids:
+                    self._fire(ids, {}, reason="entered", extra={
+                        "option": option, "price": float(chain.price[i]), "delta": round(float(chain.delta[i]), 4)})
+                    fired += len(ids)
+        return fired
+
+    # --- Consumers ---
+
+    def events_since(self, since=0, user=None):
+        with self.lock:
+            return [e for e in self.events if e["id"] > since and (user is None or e["user"] == user)]
+
+    def wait(self, since, user=None, timeout=15.0):
+        """Blocks until events newer than `since` exist (or timeout); returns them."""
+        with self.new_events:
+            self.new_events.wait_for(
+                lambda: any(e["id"] > since and (user is None or e["user"] == user) for e in reversed(self.events)),
+                timeout=timeout)
+            return [e for e in self.events if e["id"] > since and (user is None or e["user"] == user)]
+
+
+_engine = AlertEngine()
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def get_alert_engine():
+    return _engine
+
+
+def stream_slot():
+    """Takes one of the MAX_STREAMS SSE slots (non-blocking); True when taken, release with release_stream_slot()."""
+    return _stream_slots.acquire(blocking=False)
+
+
+def release_stream_slot():
+    _stream_slots.release()
+
+
+class AlertRefresher(threading.Thread):
+    """
+    Daemon thread pulling the BASE snapshot and the option chain every
+    REFRESH_INTERVAL seconds while alerts are registered. Both are cache reads
+    until their TTL expires; a new snapshot runs the engine through the
+    on_*_snapshot hooks, so streams only wait on the engine.
+    """
+
+    def __init__(self):
+        super().__init__(name="alert-refresher", daemon=True)
+
+    def run(self):
+        from services.option_chain import get_option_chain
+        from services.sheets import get_sheet_data
+
+        while True:
+            if _engine.alerts:
+                try:
+                    get_sheet_data()
+                    get_option_chain()
+                except Exception as e:
+                    print(f"[ALERTS] Refresh error: {e}")
+            time.sleep(REFRESH_INTERVAL)
+
+
+def start_refresher():
+    """Starts the alert refresher (once per process)."""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = AlertRefresher()
+            _refresher.start()
+        return _refresher
+
+
+def on_stocks_snapshot(stocks):
+    """Hook for each new BASE snapshot (called from sheets.get_sheet_data)."""
+    t0 = time.perf_counter()
+    fired = _engine.on_stocks(stocks)
+    if fired:
+        print(f"[ALERTS] {fired} alerts fired ({(time.perf_counter() - t0) * 1000:.1f} ms).")
+
+
+def on_chain_snapshot(chain):
+    """Hook for each new option chain (called from option_chain.get_option_chain)."""
+    fired = _engine.on_chain(chain)
+    if fired:
+        print(f"[ALERTS] {fired} pozinho alerts fired.")
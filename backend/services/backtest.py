@@ -0,0 +1,220 @@
+"""
+Historical backtest of the option entry rules over the chain archive.
+
+Replays the daily snapshots written by services/chain_archive.py, applies the
+entry rules of get_filtered_opportunities (CHEAP / EXPENSIVE) and of the
+pozinho scanner, holds every position to expiry and settles it at the spot
+archived on (or just before) the expiry date. A covered call also holds the
+stock bought at entry, so its P&L is min(S_T, K) - S_0 + premium.
+
+The pozinho |delta| filter uses the same sigma as the live scanner: the BASE
+'VOL ANO' of that day (stock snapshots), DEFAULT_SIGMA when the day has none
+(live falls back to realized volatility there), with a flat risk-free rate
+(the archive does not keep the day's Selic). The archived "delta" column comes
+from each option's implied volatility and is not used by the rules.
+
+Each underlying is processed by one worker of a process pool; inside a worker
+all snapshot dates are evaluated at once with numpy masks (no per-option loop).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.bs_engine import bs_batch
+from services.chain_archive import (
+    ARCHIVE_DIR, list_archive_dates, list_archived_underlyings,
+    read_chain_range, read_stock_snapshots, parse_expiries
+)
+from services.strategies import STRATEGIES, rule_mask
+
+# Max calendar days between the last archived spot and the expiry to settle a trade
+SETTLE_TOLERANCE_DAYS = 7
+DEFAULT_SIGMA = 0.40        # as parse_volatility / the live chain when VOL ANO is missing
+DEFAULT_RISK_FREE = 0.1075  # as sheets.parse_risk_free
+
+CHAIN_FIELDS = ["vencimento", "ativo", "tipo", "strike", "preco", "spot", "dias_uteis"]
+
+
+def entry_mask(strategy, df, r=DEFAULT_RISK_FREE):
+    """
+    Vectorized entry rules (services/strategies.py) over an archived chain frame.
+    df needs the chain fields, vol_ano (pricing sigma of the underlying that
+    day, for the live-equivalent delta) and, for valuation-based strategies,
+    falta_val / cost_val / max_val.
+    """
+    tipo = df["tipo"].astype(str).str.upper()
+    price = df["preco"].to_numpy(dtype=float)
+    spot = df["spot"].to_numpy(dtype=float)
+    strike = df["strike"].to_numpy(dtype=float)
+    bdays = df["dias_uteis"].to_numpy(dtype=float)
+    is_call = tipo.str.contains("CALL").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yld = np.where(spot > 0, price / spot, 0.0)
+    delta = bs_batch(spot, strike, bdays / 252.0, r, df["vol_ano"].to_numpy(dtype=float), is_call)["delta"]
+
+    valuation = {}
+    if STRATEGIES.get(strategy, {}).get("valuation"):
+        valuation = {col: df[col].to_numpy(dtype=float)
+                     for col in ("falta_val", "cost_val", "max_val")}
+    return rule_mask(
+        strategy, price, strike, spot, bdays, is_call, yld, delta=delta,
+        falta=valuation.get("falta_val"), cost_val=valuation.get("cost_val"), max_val=valuation.get("max_val"),
+    )
+
+
+def _backtest_underlying(task):
+    """
+    Worker: every trade of every strategy for one underlying.
+    task = (underlying, start, end, last_date, strategies, valuation_frame, root, r)
+    """
+    underlying, start, end, last_date, strategies, valuation, root, r = task
+    df = read_chain_range(underlying, start, end, columns=CHAIN_FIELDS, root=root)
+    if df.empty:
+        return pd.DataFrame()
+    df["date"] = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[D]")
+
+    if valuation is not None and not valuation.empty:
+        df = df.merge(valuation, on="date", how="left")
+    for col, fill in (("falta_val", -999.0), ("cost_val", 0.0), ("max_val", 0.0), ("vol_ano", DEFAULT_SIGMA)):
+        if col not in df.columns:
+            df[col] = fill
+        df[col] = df[col].astype(float).fillna(fill)
+
+    # Spot history from the snapshots themselves (one per archived day)
+    spots = df.groupby("date", sort=True)["spot"].first().dropna()
+    spot_dates = spots.index.to_numpy(dtype="datetime64[D]")
+    spot_values = spots.to_numpy(dtype=float)
+
+    trades = []
+    for name in strategies:
+        mask = entry_mask(name, df, r)
+        if not mask.any():
+            continue
+        entries = df.loc[mask].sort_values("date", kind="stable")
+        # One position per option: first day it qualifies
+        entries = entries.drop_duplicates(["ativo", "vencimento"], keep="first")
+
+        expiry = parse_expiries(entries["vencimento"].to_numpy())
+        idx = np.searchsorted(spot_dates, expiry, side="right") - 1
+        safe_idx = np.clip(idx, 0, max(len(spot_dates) - 1, 0))
+        settle_date = spot_dates[safe_idx] if len(spot_dates) else expiry
+        settled = (
+            (idx >= 0) & ~np.isnat(expiry) & (expiry <= last_date) &
+            ((expiry - settle_date).astype(np.int64) <= SETTLE_TOLERANCE_DAYS)
+        )
+        if not settled.any():
+            continue
+
+        entries = entries.loc[settled]
+        expiry = expiry[settled]
+        spot_T = spot_values[safe_idx[settled]]
+
+        K = entries["strike"].to_numpy(dtype=float)
+        premium = entries["preco"].to_numpy(dtype=float)
+        is_call = entries["tipo"].astype(str).str.upper().str.contains("CALL").to_numpy()
+        payoff = np.where(is_call, np.maximum(spot_T - K, 0.0), np.maximum(K - spot_T, 0.0))
+
+        spot_0 = entries["spot"].to_numpy(dtype=float)
+        spec = STRATEGIES[name]
+        pnl = premium - payoff if spec["side"] == "sell" else payoff - premium
+        if spec["covered"]:
+            pnl = pnl + (spot_T - spot_0)   # long stock: min(S_T, K) - S_0 + premium for a call
+        capital = {"premium": premium, "strike": K, "spot": spot_0}[spec["capital"]]
+
+        trades.append(pd.DataFrame({
+            "strategy": name,
+            "underlying": underlying,
+            "ativo": entries["ativo"].to_numpy(),
+            "entry_date": entries["date"].to_numpy(),
+            "expiry": expiry,
+            "strike": K,
+            "premium": premium,
+            "spot_entry": spot_0,
+            "spot_expiry": spot_T,
+            "pnl": pnl,
+            "ret": np.where(capital > 0, pnl / np.where(capital > 0, capital, 1.0), 0.0),
+        }))
+
+    return pd.concat(trades, ignore_index=True) if trades else pd.DataFrame()
+
+
+def summarize(trades):
+    """Win rate, P&L distribution and drawdown of a trade list (one strategy)."""
+    if trades is None or trades.empty:
+        return {"trades": 0}
+
+    pnl = trades["pnl"].to_numpy(dtype=float)
+    ret = trades["ret"].to_numpy(dtype=float)
+
+    # Equal-weighted equity curve in settlement order (returns on capital)
+    order = np.argsort(trades["expiry"].to_numpy(), kind="stable")
+    equity = np.cumsum(ret[order])
+    peak = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:]
+    drawdown = peak - equity
+
+    pct = np.percentile(ret, [5, 25, 50, 75, 95])
+    return {
+        "trades": int(len(trades)),
+        "underlyings": int(trades["underlying"].nunique()),
+        "win_rate": float((pnl > 0).mean()),
+        "pnl_total": float(pnl.sum()),
+        "pnl_mean": float(pnl.mean()),
+        "return_mean": float(ret.mean()),
+        "return_std": float(ret.std()),
+        "return_percentiles": {p: float(v) for p, v in zip(("p5", "p25", "p50", "p75", "p95"), pct)},
+        "best_return": float(ret.max()),
+        "worst_return": float(ret.min()),
+        "cumulative_return": float(equity[-1]),
+        "max_drawdown": float(drawdown.max()),
+    }
+
+
+def _valuation_by_underlying(start, end):
+    """BASE snapshots reshaped to {ticker: frame(date, falta_val, cost_val, max_val, vol_ano)}."""
+    snaps = read_stock_snapshots(start, end)
+    if snaps.empty:
+        return {}
+    snaps = snaps.rename(columns={"min_val": "cost_val"})
+    snaps["date"] = pd.to_datetime(snaps["date"]).to_numpy(dtype="datetime64[D]")
+    cols = [c for c in ("date", "falta_val", "cost_val", "max_val", "vol_ano") if c in snaps.columns]
+    return {t: g[cols].drop_duplicates("date", keep="last") for t, g in snaps.groupby("ticker")}
+
+
+def run_backtest(strategies=None, start=None, end=None, underlyings=None, root=None, workers=None,
+                 r=DEFAULT_RISK_FREE):
+    """
+    Backtests the given strategies (default: all) over the archive; r is the
+    risk-free rate of the pozinho delta.
+    Returns {"summary": {strategy: metrics}, "trades": DataFrame, "period": [...]}.
+    """
+    root = root or ARCHIVE_DIR
+    strategies = list(strategies or STRATEGIES.keys())
+    for s in strategies:
+        if s not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {s}")
+
+    dates = list_archive_dates(root, start, end)
+    if not dates:
+        return {"summary": {s: {"trades": 0} for s in strategies}, "trades": pd.DataFrame(), "period": []}
+    last_date = np.datetime64(dates[-1], "D")
+
+    tickers = [t.upper() for t in underlyings] if underlyings else list_archived_underlyings(root, start, end)
+    # Every strategy reads the BASE snapshots: valuation columns, or VOL ANO for the delta
+    valuation = _valuation_by_underlying(start, end)
+
+    tasks = [(t, start, end, last_date, strategies, valuation.get(t), root, r) for t in tickers]
+    workers = workers or min(len(tasks), os.cpu_count() or 1) or 1
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_backtest_underlying, tasks))
+    else:
+        results = [_backtest_underlying(t) for t in tasks]
+
+    results = [r for r in results if r is not None and not r.empty]
+    trades = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=["strategy"])
+
+    summary = {s: summarize(trades[trades["strategy"] == s]) for s in strategies}
+    return {"summary": summary, "trades": trades, "period": [dates[0], dates[-1]]}
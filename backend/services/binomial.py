@@ -0,0 +1,117 @@
+"""
+Batch binomial lattice pricer (American or European exercise).
+
+Counterpart of bs_engine for B3 equity options, which are mostly American:
+early exercise matters for deep ITM puts and for calls ahead of a dividend.
+The whole candidate set is priced at once: the lattice is an (options, nodes)
+array and backward induction is one vectorized step per time step.
+
+Methods:
+    crr  Cox-Ross-Rubinstein (u = exp(sigma*sqrt(dt)), d = 1/u)
+    lr   Leisen-Reimer (Peizer-Pratt inversion; odd steps, converges ~1/n^2)
+
+Discrete dividends use the escrowed model: the lattice runs on the spot minus
+the present value of the dividends paid before expiry, and the PV of the
+dividends still to come is added back wherever the stock price is needed
+(exercise value).
+"""
+import numpy as np
+
+DEFAULT_STEPS = 101
+
+
+def _peizer_pratt(z, n):
+    """Peizer-Pratt method 2 inversion of the normal CDF onto a binomial with n steps."""
+    a = z / (n + 1.0 / 3.0 + 0.1 / (n + 1.0))
+    return 0.5 + np.sign(z) * 0.5 * np.sqrt(1.0 - np.exp(-a * a * (n + 1.0 / 6.0)))
+
+
+def _dividend_pv(t, T, r, div_times, div_amounts):
+    """PV at time t (years, shape (n,)) of the dividends paid in (t, T]; (n,) array."""
+    if div_times is None:
+        return np.zeros_like(t)
+    live = (div_times > t[:, None]) & (div_times <= T[:, None]) & (div_amounts > 0)
+    disc = np.exp(-r[:, None] * np.maximum(div_times - t[:, None], 0.0))
+    return np.sum(np.where(live, div_amounts * disc, 0.0), axis=1)
+
+
+def binomial_batch(S, K, T, r, sigma, is_call, american=True, steps=DEFAULT_STEPS, method="lr",
+                   div_times=None, div_amounts=None):
+    """
+    Option prices for arrays of options (scalars broadcast).
+    S: Spot, K: Strike, T: Years to maturity, r: Risk-free (annual),
+    sigma: Volatility (annual), is_call: bool array (True=CALL, False=PUT).
+    div_times / div_amounts: optional (n, m) arrays of projected cash dividends
+    (years from today, R$ per share; zero-padded).
+
+    Degenerate rows (T<=0, sigma<=0, S<=0, K<=0) get intrinsic value, as in bs_batch.
+    """
+    S, K, T, r, sigma, is_call = (a.ravel() for a in np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(r, dtype=float),
+        np.asarray(sigma, dtype=float), np.asarray(is_call, dtype=bool)
+    ))
+    n_opts = len(S)
+    intrinsic = np.where(is_call, np.maximum(S - K, 0.0), np.maximum(K - S, 0.0))
+    valid = (T > 0) & (sigma > 0) & (S > 0) & (K > 0)
+    out = intrinsic.copy()
+    if n_opts == 0 or not valid.any():
+        return out
+
+    idx = np.flatnonzero(valid)
+    S, K, T, r, sigma, is_call = S[idx], K[idx], T[idx], r[idx], sigma[idx], is_call[idx]
+    if div_times is not None:
+        div_times = np.atleast_2d(np.asarray(div_times, dtype=float))[idx]
+        div_amounts = np.atleast_2d(np.asarray(div_amounts, dtype=float))[idx]
+
+    N = int(steps)
+    if method == "lr" and N % 2 == 0:
+        N += 1
+    dt = T / N
+    growth = np.exp(r * dt)
+    disc = 1.0 / growth
+    sign = np.where(is_call, 1.0, -1.0)[:, None]
+
+    # Escrowed spot: dividends paid before expiry come out of the lattice
+    S_star = S - _dividend_pv(np.zeros_like(T), T, r, div_times, div_amounts)
+    S_star = np.maximum(S_star, 1e-8)
+
+    if method == "crr":
+        log_u = sigma * np.sqrt(dt)
+        log_d = -log_u
+        p = (growth - np.exp(log_d)) / (np.exp(log_u) - np.exp(log_d))
+    elif method == "lr":
+        vol_sqrt_T = sigma * np.sqrt(T)
+        d1 = (np.log(S_star / K) + (r + 0.5 * sigma ** 2) * T) / vol_sqrt_T
+        d2 = d1 - vol_sqrt_T
+        p = _peizer_pratt(d2, N)
+        p_star = _peizer_pratt(d1, N)
+        u = growth * p_star / p
+        d = (growth - p * u) / (1.0 - p)
+        log_u, log_d = np.log(u), np.log(d)
+    else:
+        raise ValueError(f"Unknown lattice method: {method}")
+
+    log_u, log_d, p = log_u[:, None], log_d[:, None], p[:, None]
+    log_S = np.log(S_star)[:, None]
+    j = np.arange(N + 1)
+
+    # Terminal payoff (no dividends left to add at expiry)
+    S_T = np.exp(log_S + j * log_u + (N - j) * log_d)
+    V = np.maximum(sign * (S_T - K[:, None]), 0.0)
+
+    # Node prices one step back: S_i[j] = S_{i+1}[j] / d (no exp per step)
+    inv_d = np.exp(-log_d)
+    S_i = S_T
+    for i in range(N - 1, -1, -1):
+        V = disc[:, None] * (p * V[:, 1:i + 2] + (1.0 - p) * V[:, :i + 1])
+        if american:
+            S_i = S_i[:, :i + 1] * inv_d
+            spot_i = S_i
+            if div_times is not None:
+                spot_i = S_i + _dividend_pv(dt * i, T, r, div_times, div_amounts)[:, None]
+            np.maximum(V, sign * (spot_i - K[:, None]), out=V)
+
+    out[idx] = V[:, 0]
+    return out
+
@@ -0,0 +1,129 @@
+"""
+Batch Black-Scholes engine.
+
+Vectorized counterpart of black_scholes_price / calculate_delta in sheets.py.
+Every function accepts scalars or numpy arrays (broadcast together), so a whole
+option chain is priced in a single numpy pass instead of one call per option.
+"""
+import numpy as np
+from scipy.special import ndtr
+
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+
+def _pdf(x):
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def bs_batch(S, K, T, r, sigma, is_call):
+    """
+    Prices and Greeks for arrays of options.
+    S: Spot, K: Strike, T: Years to maturity, r: Risk-free (annual),
+    sigma: Volatility (annual), is_call: bool array (True=CALL, False=PUT).
+
+    Returns dict of arrays: price, delta, gamma, vega, theta (per year), d1, d2.
+    Expired or degenerate rows (T<=0, sigma<=0, S<=0, K<=0) get intrinsic value
+    and zero Greeks, mirroring the scalar helpers.
+    """
+    S, K, T, r, sigma, is_call = np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(r, dtype=float),
+        np.asarray(sigma, dtype=float), np.asarray(is_call, dtype=bool)
+    )
+
+    valid = (T > 0) & (sigma > 0) & (S > 0) & (K > 0)
+    # Safe placeholders keep log/sqrt warning-free on invalid rows
+    S_ = np.where(valid, S, 1.0)
+    K_ = np.where(valid, K, 1.0)
+    T_ = np.where(valid, T, 1.0)
+    v_ = np.where(valid, sigma, 1.0)
+
+    sqrt_T = np.sqrt(T_)
+    vol_sqrt_T = v_ * sqrt_T
+    d1 = (np.log(S_ / K_) + (r + 0.5 * v_ ** 2) * T_) / vol_sqrt_T
+    d2 = d1 - vol_sqrt_T
+
+    disc = np.exp(-r * T_)
+    nd1 = ndtr(d1)
+    nd2 = ndtr(d2)
+    pdf_d1 = _pdf(d1)
+
+    call_price = S_ * nd1 - K_ * disc * nd2
+    put_price = K_ * disc * (1.0 - nd2) - S_ * (1.0 - nd1)
+
+    price = np.where(is_call, call_price, put_price)
+    delta = np.where(is_call, nd1, nd1 - 1.0)
+    gamma = pdf_d1 / (S_ * vol_sqrt_T)
+    vega = S_ * pdf_d1 * sqrt_T
+    theta_common = -(S_ * pdf_d1 * v_) / (2.0 * sqrt_T)
+    theta = np.where(
+        is_call,
+        theta_common - r * K_ * disc * nd2,
+        theta_common + r * K_ * disc * (1.0 - nd2)
+    )
+
+    intrinsic = np.where(is_call, np.maximum(S - K, 0.0), np.maximum(K - S, 0.0))
+    zero = np.zeros_like(price)
+
+    return {
+        "price": np.where(valid, price, intrinsic),
+        "delta": np.where(valid, delta, zero),
+        "gamma": np.where(valid, gamma, zero),
+        "vega": np.where(valid, vega, zero),
+        "theta": np.where(valid, theta, zero),
+        "d1": np.where(valid, d1, zero),
+        "d2": np.where(valid, d2, zero),
+    }
+
+
+def bs_price_batch(S, K, T, r, sigma, is_call):
+    """Price only (skips Greeks bookkeeping of callers)."""
+    return bs_batch(S, K, T, r, sigma, is_call)["price"]
+
+
+def implied_vol_batch(market_price, S, K, T, r, is_call, low=1e-4, high=5.0, tol=1e-6, max_iter=50):
+    """
+    Implied volatility for arrays of options (safeguarded Newton-Raphson).
+    Newton steps use vega; any step leaving the [low, high] bracket falls back
+    to bisection, so every row converges. Rows whose price is outside the
+    no-arbitrage bounds (or with T<=0) return NaN.
+    """
+    price, S, K, T, r, is_call = np.broadcast_arrays(
+        np.asarray(market_price, dtype=float), np.asarray(S, dtype=float),
+        np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(is_call, dtype=bool)
+    )
+
+    lo = np.full(price.shape, low)
+    hi = np.full(price.shape, high)
+    p_lo = bs_price_batch(S, K, T, r, lo, is_call)
+    p_hi = bs_price_batch(S, K, T, r, hi, is_call)
+    solvable = (T > 0) & (S > 0) & (K > 0) & (price > p_lo) & (price < p_hi)
+
+    sigma = np.where(solvable, 0.30, np.nan)
+    active = solvable.copy()
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        res = bs_batch(S[active], K[active], T[active], r[active], sigma[active], is_call[active])
+        diff = res['price'] - price[active]
+
+        # Tighten the bracket with the sign of the pricing error
+        lo_a, hi_a, sig_a = lo[active], hi[active], sigma[active]
+        too_high = diff > 0
+        hi_a = np.where(too_high, sig_a, hi_a)
+        lo_a = np.where(too_high, lo_a, sig_a)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sig_a - diff / res['vega']
+        use_newton = np.isfinite(newton) & (newton > lo_a) & (newton < hi_a)
+        new_sigma = np.where(use_newton, newton, 0.5 * (lo_a + hi_a))
+        new_sigma = np.where(diff == 0, sig_a, new_sigma)
+
+        lo[active], hi[active], sigma[active] = lo_a, hi_a, new_sigma
+        done = (diff == 0) | (np.abs(new_sigma - sig_a) < tol)
+        idx = np.flatnonzero(active)
+        active[idx[done]] = False
+
+    return sigma
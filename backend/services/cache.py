@@ -37,7 +37,8 @@ _cache = SimpleCache()
 def cached(ttl_seconds=300):
     """
     Decorator to cache function results.
-    TTL default: 5 minutes (300s).
+    TTL default: 5 minutes (300s). ttl_seconds may also be a callable taking
+    the result and returning the TTL (e.g. shorter while the market is open).
     """
     def decorator(func):
         @functools.wraps(func)
@@ -60,13 +61,101 @@ def cached(ttl_seconds=300):
             # Only cache if result is valid (not None or empty list if strict?)
             # For now, cache everything except None
             if result is not None:
-                _cache.set(key, result, ttl_seconds)
+                ttl = ttl_seconds(result) if callable(ttl_seconds) else ttl_seconds
+                _cache.set(key, result, ttl)
                 
             return result
         return wrapper
     return decorator
 
 
+def market_hours_ttl(open_ttl, closed_ttl, now=None):
+    """
+    TTL for market quotes: open_ttl during the B3 session (weekdays, 10h-18h
+    Brasília time, UTC-3), closed_ttl otherwise (prices barely move).
+    """
+    brt = time.gmtime((now if now is not None else time.time()) - 3 * 3600)
+    is_open = brt.tm_wday < 5 and 10 <= brt.tm_hour < 18
+    return open_ttl if is_open else closed_ttl
+
+
+def snapshot_cached(*sources, max_entries=64):
+    """
+    Decorator for values derived from cached snapshots (e.g. get_sheet_data()).
+    Each source is called on every request (cheap: it's a cache read) and the
+    snapshots are passed as the first arguments of the wrapped function.
+    The result is reused until any source returns a NEW object, so derived
+    indexes are rebuilt once per snapshot instead of once per request.
+    """
+    def decorator(func):
+        memo = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            snapshots = tuple(src() for src in sources)
+            key = (tuple(str(a) for a in args),
+                   tuple(f"{k}={v}" for k, v in sorted(kwargs.items())))
+
+            with lock:
+                hit = memo.get(key)
+                if hit is not None and all(a is b for a, b in zip(hit[0], snapshots)):
+                    return hit[1]
+
+            result = func(*snapshots, *args, **kwargs)
+
+            with lock:
+                memo.pop(key, None)
+                if len(memo) >= max_entries:
+                    # Drop oldest entry (dicts keep insertion order)
+                    memo.pop(next(iter(memo)))
+                memo[key] = (snapshots, result)
+            return result
+        return wrapper
+    return decorator
+
+
+class FragmentCache:
+    """
+    Per-key derived fragments tagged with the signature of their inputs.
+    get_or_build() only calls the builder when the key is new or its signature
+    changed, so a refresh recomputes just the "dirty" keys.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.lock = threading.Lock()
+        self._rebuilds = 0
+
+    def get_or_build(self, key, signature, builder):
+        with self.lock:
+            item = self.store.get(key)
+            if item is not None and item[0] == signature:
+                return item[1]
+
+        value = builder()
+        with self.lock:
+            self.store[key] = (signature, value)
+            self._rebuilds += 1
+        return value
+
+    def end_pass(self, live_keys):
+        """
+        Finishes a refresh pass: drops keys that disappeared from the source
+        and returns how many fragments were rebuilt since the previous pass.
+        """
+        with self.lock:
+            for key in [k for k in self.store if k not in live_keys]:
+                del self.store[key]
+            rebuilt, self._rebuilds = self._rebuilds, 0
+            return rebuilt
+
+    def clear(self):
+        with self.lock:
+            self.store = {}
+            self._rebuilds = 0
+
+
 # ============ PERSISTENT VALUE CACHE ============
 # Cache that stores last valid values for volatile fields
 # (FALTA, MENOR VALOR, MAIOR VALOR, VOL ANO)
@@ -118,11 +207,13 @@ class PersistentValueCache:
         return True
     
     def _save_to_disk(self):
-        """Save current store to disk"""
+        """Save current store to disk (temp file + os.replace: a concurrent load never sees a partial file)"""
         if self.persist_file:
+            tmp_path = self.persist_file + '.tmp'
             try:
-                with open(self.persist_file, 'w', encoding='utf-8') as f:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
                     json.dump(self.store, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.persist_file)
             except Exception as e:
                 print(f"Warning: Could not save persistent cache: {e}")
     
@@ -135,9 +226,10 @@ class PersistentValueCache:
         
         with self.lock:
             if self._is_valid(current_value):
-                # Valid value - update cache and return
-                self.store[key] = current_value
-                self._save_to_disk()
+                # Valid value - update cache (the file is rewritten only when it changed) and return
+                if self.store.get(key) != current_value:
+                    self.store[key] = current_value
+                    self._save_to_disk()
                 return current_value
             else:
                 # Invalid value - return cached value if exists
@@ -1,61 +1,48 @@
-import yfinance as yf
 import pandas as pd
 from datetime import datetime
 from services.cache import cached
 import requests
 from bs4 import BeautifulSoup
-import concurrent.futures
+from services.candle_store import B3_UTC_OFFSET, read_candles, sync_stale
 
 def process_ticker(t):
     """
     Helper function to process a single ticker.
+    Dividend history comes from the local candle store (synced by get_calendar_data).
     Returns a tuple (dividend_events_list, earnings_events_list)
     """
     div_events = []
-    earn_events = []
     
     clean_ticker = t.replace(".SA", "")
     current_year = datetime.now().year
     
     try:
-        tik = yf.Ticker(t)
-        
         # --- 1. Dividends (Probability) ---
-        try:
-            hist = tik.dividends
-            if not hist.empty:
-                # timezone fix
-                if hasattr(hist.index, 'tz') and hist.index.tz is not None:
-                    hist.index = hist.index.tz_localize(None)
-                    
-                # Filter last 24 months
-                cutoff = pd.Timestamp.now() - pd.DateOffset(months=24)
-                recent = hist[hist.index >= cutoff]
-                
-                # Sort by date desc
-                recent_sorted = recent.sort_index(ascending=False)
+        # Filter last 24 months
+        cutoff = pd.Timestamp.now() - pd.DateOffset(months=24)
+        candles = read_candles(clean_ticker, "1d", start=cutoff)
+        paid = candles["dividends"] > 0
+        # B3 day of each ex-date, newest first
+        dates = pd.to_datetime(candles["time"][paid] + B3_UTC_OFFSET, unit="s")[::-1]
+        
+        seen_months = set()
+        for date in dates:
+            m = date.month
+            if m not in seen_months:
+                d = date.day
+                seen_months.add(m)
                 
-                seen_months = set()
-                for date in recent_sorted.index:
-                    m = date.month
-                    if m not in seen_months:
-                        d = date.day
-                        seen_months.add(m)
-                        
-                        # Project to current year
-                        try:
-                            proj_date = datetime(current_year, m, d)
-                            div_events.append({
-                                "date": proj_date.strftime("%Y-%m-%d"),
-                                "ticker": clean_ticker,
-                                "type": "Dividend",
-                                "confidence": "High"
-                            })
-                        except ValueError:
-                            pass
-        except Exception as e:
-            # print(f"Error fetching dividends for {t}: {e}")
-            pass
+                # Project to current year
+                try:
+                    proj_date = datetime(current_year, m, d)
+                    div_events.append({
+                        "date": proj_date.strftime("%Y-%m-%d"),
+                        "ticker": clean_ticker,
+                        "type": "Dividend",
+                        "confidence": "High"
+                    })
+                except ValueError:
+                    pass
 
     except Exception as outer_e:
         print(f"Error processing {t}: {outer_e}")
@@ -129,7 +116,7 @@ def scrape_earnings_investidor10():
 @cached(ttl_seconds=3600*12) # Cache dividends for 12 hours
 def get_calendar_data(tickers):
     """
-    Fetches dividend history (yfinance) and earnings calendar (Investidor10).
+    Fetches dividend history (candle store, synced from yfinance) and earnings calendar (Investidor10).
     """
     dividend_events = []
     earnings_events = []
@@ -140,10 +127,10 @@ def get_calendar_data(tickers):
     
     if not unique_tickers_sa: return {"dividend_events": [], "earnings_events": []}
 
-    # 1. Fetch Dividends via yfinance (Threaded)
+    # 1. Dividends from the candle store (stale tickers synced in batched downloads)
     print(f"[CALENDAR SERVICE] Fetching dividends for {len(unique_tickers_sa)} tickers...")
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(process_ticker, unique_tickers_sa))
+    sync_stale([t.replace(".SA", "") for t in unique_tickers_sa], "1d")
+    results = [process_ticker(t) for t in unique_tickers_sa]
         
     for res_divs, _ in results: # _ is empty earnings list
         dividend_events.extend(res_divs)
@@ -165,3 +152,37 @@ def get_calendar_data(tickers):
         "earnings_events": earnings_events
     }
 
+
+def get_dividend_projections(tickers, horizon_days=400):
+    """
+    Projected cash dividends for the next horizon_days, per ticker, from the
+    local candle store: each payment of the trailing 12 months is assumed to
+    repeat one year later (same month/day projection as the calendar events).
+    Returns {ticker: [(date, amount), ...]} sorted by date; tickers without
+    stored dividends are omitted.
+    """
+    from datetime import date, timedelta
+
+    today = date.today()
+    horizon = today + timedelta(days=horizon_days)
+    projections = {}
+    for t in tickers:
+        clean = t.upper().replace(".SA", "")
+        candles = read_candles(clean, "1d", start=today - timedelta(days=365))
+        paid = candles["dividends"] > 0
+        if not paid.any():
+            continue
+        events = []
+        for ts, amount in zip(candles["time"][paid], candles["dividends"][paid]):
+            ex_date = pd.Timestamp(int(ts), unit="s").date()
+            for years in (1, 2):
+                try:
+                    proj = ex_date.replace(year=ex_date.year + years)
+                except ValueError:  # 29/02
+                    proj = ex_date.replace(year=ex_date.year + years, day=28)
+                if today < proj <= horizon:
+                    events.append((proj, float(amount)))
+        if events:
+            projections[clean] = sorted(events)
+    return projections
+
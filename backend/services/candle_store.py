@@ -0,0 +1,352 @@
+"""
+Local OHLCV candle store.
+
+One directory per (interval, ticker) with one raw little-endian file per column:
+
+    <CANDLE_DIR>/1d/PETR4/time.i8      (unix seconds, ascending)
+    <CANDLE_DIR>/1d/PETR4/close.f8     (open, high, low, close, volume, dividends)
+
+Columns are read back with np.memmap, so a date-range slice is a view over the
+page cache (no copy, no parsing). sync() only asks Yahoo for bars after the
+last stored timestamp; the last stored bar is re-fetched and replaced because
+it may still be forming. Yahoo prices are split-adjusted backwards, so when a
+sync brings a split the store has not seen, the whole series is downloaded
+again instead of appended (otherwise it would keep a permanent price jump).
+Writes never touch a file in place: the columns are
+rewritten to temp files and swapped in with os.replace (services/column_files.py),
+so mapped views held by readers, in this or another process, stay valid.
+
+Each series also keeps a rewrite generation (<series dir>/generation), bumped
+whenever its whole history is replaced (split reload, full re-download). It is
+part of series_version(), so in-memory books built on top of the store
+(volatility, indicators, correlation, aggregates) know that bars they already
+folded in changed, even when the length and the last time did not.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from services.column_files import read_columns, replace_columns, write_lock
+
+_backend_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+CANDLE_DIR = os.environ.get('CANDLE_STORE_DIR', os.path.join(_backend_dir, 'data', 'candles'))
+
+COLUMNS = {
+    "time": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+    "dividends": np.dtype("<f8"),
+    "splits": np.dtype("<f8"),      # split ratio on its ex-date (yfinance 'Stock Splits'), 0 otherwise
+}
+
+# History requested the first time a (ticker, interval) is synced
+INITIAL_PERIOD = {"1d": "10y", "1wk": "max", "1mo": "max", "1h": "730d", "15m": "60d", "5m": "60d"}
+
+# Yahoo-style ranges ('1mo', '1y'...) as calendar days; 'Nd' ranges count sessions
+RANGE_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827, "10y": 3653}
+B3_UTC_OFFSET = -3 * 3600
+SYNC_FRESHNESS = 60     # seconds between two syncs of the same series by one process
+GENERATION_FILE = "generation"
+
+_synced = {}
+
+def yf_symbol(ticker):
+    """Yahoo symbol of a B3 ticker (PETR4 -> PETR4.SA); indices / FX / crypto / suffixed symbols unchanged."""
+    t = ticker.strip().upper()
+    if '.' in t or t.startswith('^') or '=' in t or '-' in t:
+        return t
+    return f"{t}.SA"
+
+
+def _to_unix(value, end_of_day=False):
+    """Unix seconds of a bound; a plain date as end bound covers the whole day."""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    if end_of_day and ts == ts.normalize() and not isinstance(value, datetime):
+        ts += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return int(ts.to_datetime64().astype("datetime64[s]").astype(np.int64))
+
+
+def _series_dir(ticker, interval, root=None):
+    safe = ticker.strip().upper().replace('^', '_').replace('=', '_')
+    return os.path.join(root or CANDLE_DIR, interval, safe)
+
+
+def _column_path(ticker, interval, column, root=None):
+    return os.path.join(_series_dir(ticker, interval, root), f"{column}.{COLUMNS[column].str[1:]}")
+
+
+def _paths(ticker, interval, root=None, columns=COLUMNS):
+    return {col: _column_path(ticker, interval, col, root) for col in columns}
+
+
+def generation(ticker, interval="1d", root=None):
+    """Rewrite generation of a stored series (0 until its history is first replaced)."""
+    try:
+        with open(os.path.join(_series_dir(ticker, interval, root), GENERATION_FILE)) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _bump_generation(ticker, interval, root=None):
+    """Next generation, swapped in like the columns. Call under write_lock(), after the columns."""
+    directory = _series_dir(ticker, interval, root)
+    tmp = os.path.join(directory, f".{GENERATION_FILE}.tmp")
+    with open(tmp, "w") as f:
+        f.write(str(generation(ticker, interval, root) + 1))
+    os.replace(tmp, os.path.join(directory, GENERATION_FILE))
+
+
+def series_version(ticker, interval="1d", root=None):
+    """
+    (bars, last time, generation) of a stored series: changes whenever bars are
+    appended or replaced. A new generation means committed bars were rewritten.
+    """
+    # Generation first: a reader that sees the new one also sees the new columns
+    gen = generation(ticker, interval, root)
+    times = read_columns(_paths(ticker, interval, root, ("time",)), COLUMNS, "time")["time"]
+    n = len(times)
+    return (n, int(times[-1]), gen) if n else (0, None, gen)
+
+
+def last_write(ticker, interval="1d", root=None):
+    """Unix time a stored series was last written (every sync rewrites it), None when nothing is stored."""
+    try:
+        return os.path.getmtime(_column_path(ticker, interval, "time", root))
+    except OSError:
+        return None
+
+
+def read_candles(ticker, interval="1d", start=None, end=None, root=None):
+    """
+    Columns of a stored series as {column: array}, sliced to [start, end]
+    (datetime / date / 'YYYY-MM-DD' / unix seconds). Arrays are read-only
+    memmap views. Empty arrays when nothing is stored.
+    """
+    cols = read_columns(_paths(ticker, interval, root), COLUMNS, "time")
+    n = len(cols["time"])
+    if n == 0:
+        return cols
+    lo = 0 if start is None else int(np.searchsorted(cols["time"], _to_unix(start), side="left"))
+    hi = n if end is None else int(np.searchsorted(cols["time"], _to_unix(end, end_of_day=True), side="right"))
+    return {col: arr[lo:hi] for col, arr in cols.items()}
+
+
+def slice_range(candles, time_range, now=None):
+    """
+    Sub-slice (views) of read_candles() output for a Yahoo-style range:
+    '1d' / '5d' = last 1 / 5 sessions, '1mo'...'10y' = calendar span back from
+    now, 'ytd' = since Jan 1st, 'max' (or unknown) = everything.
+    """
+    times = candles["time"]
+    if len(times) == 0 or time_range in (None, "max"):
+        return candles
+    if time_range.endswith("d") and time_range[:-1].isdigit():
+        sessions = np.unique((times + B3_UTC_OFFSET) // 86400)
+        first = sessions[-min(int(time_range[:-1]), len(sessions))]
+        lo = int(np.searchsorted(times, first * 86400 - B3_UTC_OFFSET, side="left"))
+    else:
+        now = pd.Timestamp(now if now is not None else datetime.now(timezone.utc))
+        if time_range == "ytd":
+            start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        elif time_range in RANGE_DAYS:
+            start = now - pd.Timedelta(days=RANGE_DAYS[time_range])
+        else:
+            return candles
+        lo = int(np.searchsorted(times, int(start.timestamp()), side="left"))
+    return {col: arr[lo:] for col, arr in candles.items()}
+
+
+def dividend_factors(close, dividends):
+    """
+    Backward dividend adjustment multiplier of each bar, as Yahoo's "Adj Close":
+    the product, over every later ex-date j, of 1 - dividend_j / close_{j-1}.
+    Stored prices are split-adjusted already (the store keeps auto_adjust=False bars).
+    """
+    close = np.asarray(close, dtype=float)
+    dividends = np.nan_to_num(np.asarray(dividends, dtype=float))
+    prev = np.concatenate([[np.nan], close[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        step = 1.0 - dividends / prev
+    step = np.where((dividends > 0) & np.isfinite(step) & (step > 0), step, 1.0)
+    after = np.cumprod(step[::-1])[::-1]     # product over j >= i
+    return np.append(after[1:], 1.0)
+
+
+def read_frame(ticker, interval="1d", start=None, end=None, root=None):
+    """read_candles() as a DataFrame (naive UTC DatetimeIndex, yfinance column names) for pandas code."""
+    candles = read_candles(ticker, interval, start, end, root)
+    index = pd.DatetimeIndex(candles["time"].astype("datetime64[s]"))
+    return pd.DataFrame({col.capitalize(): np.array(arr) for col, arr in candles.items() if col != "time"},
+                        index=index)
+
+
+def stack_field(tickers, field="close", bars=252, interval="1d", root=None):
+    """
+    Last `bars` values of one column for many tickers as a (tickers, bars)
+    matrix, right-aligned (latest bar in the last column) and NaN-padded.
+    """
+    out = np.full((len(tickers), bars), np.nan)
+    for i, t in enumerate(tickers):
+        values = read_candles(t, interval, root=root)[field][-bars:]
+        if len(values):
+            out[i, bars - len(values):] = values
+    return out
+
+
+def _unix_index(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def append_candles(ticker, interval, frame, root=None, replace_all=False):
+    """
+    Writes bars from a DataFrame (DatetimeIndex; Open/High/Low/Close/Volume/
+    Dividends/Stock Splits columns as returned by yfinance). Bars at or after
+    the first new timestamp are replaced, older ones are kept (all of them are
+    dropped with replace_all); the series is swapped in as new files, see
+    column_files. Replacing a stored history as a whole bumps its generation.
+    Returns the number of bars written.
+    """
+    if frame is None or frame.empty:
+        return 0
+    frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+    new = {"time": _unix_index(frame.index)}
+    for col in ("open", "high", "low", "close", "volume", "dividends"):
+        name = col.capitalize()
+        new[col] = frame[name].to_numpy(dtype=float) if name in frame.columns else np.zeros(len(frame))
+    new["dividends"] = np.nan_to_num(new["dividends"])
+    new["splits"] = (np.nan_to_num(frame["Stock Splits"].to_numpy(dtype=float))
+                     if "Stock Splits" in frame.columns else np.zeros(len(frame)))
+
+    # Bars without a close are not candles (halted days, partial downloads)
+    keep = np.isfinite(new["close"]) & (new["close"] > 0)
+    if not keep.any():
+        return 0
+    new = {col: values[keep] for col, values in new.items()}
+
+    with write_lock(_series_dir(ticker, interval, root)):
+        # All columns: a series missing one (e.g. stored before "splits" existed) is rewritten
+        times = read_columns(_paths(ticker, interval, root), COLUMNS, "time")["time"]
+        keep = 0 if replace_all else int(np.searchsorted(times, new["time"][0], side="left"))
+        rewritten = keep == 0 and len(times) > 0
+        del times
+        replace_columns(_paths(ticker, interval, root), COLUMNS, "time", keep, new)
+        if rewritten:
+            _bump_generation(ticker, interval, root)
+    return len(new["time"])
+
+
+def _download(symbols, interval, start=None, period=None):
+    """One yfinance call for several symbols -> {symbol: DataFrame}."""
+    import yfinance as yf
+
+    kwargs = {"interval": interval, "progress": False, "auto_adjust": False,
+              "actions": True, "group_by": "ticker", "threads": True}
+    if start is not None:
+        kwargs["start"] = start
+    else:
+        kwargs["period"] = period
+    data = yf.download(symbols, **kwargs)
+    if data is None or data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        return {symbols[0]: data}
+    found = set(data.columns.get_level_values(0))
+    return {s: data[s].dropna(how="all") for s in symbols if s in found}
+
+
+def _new_split(ticker, interval, frame, root=None):
+    """True when a downloaded frame carries a split the stored series does not have yet."""
+    if frame is None or "Stock Splits" not in frame.columns:
+        return False
+    ratios = np.nan_to_num(frame["Stock Splits"].to_numpy(dtype=float))
+    hit = (ratios > 0) & (ratios != 1)
+    if not hit.any():
+        return False
+    times = _unix_index(frame.index[hit])
+    stored = read_candles(ticker, interval, start=int(times.min()), root=root)
+    known = set(stored["time"][stored["splits"] > 0].tolist())
+    return any(int(t) not in known for t in times)
+
+
+def _complete(ticker, interval, root=None):
+    return all(os.path.exists(p) for p in _paths(ticker, interval, root).values())
+
+
+def sync(tickers, interval="1d", root=None, force=False):
+    """
+    Brings the stored series up to date. Tickers are grouped by the date of
+    their last stored bar, so each group is a single download of only the
+    missing bars. Returns {ticker: bars written}.
+
+    Request handlers call this on cache misses: unless force, a ticker synced
+    (or being synced) by this process less than SYNC_FRESHNESS seconds ago is
+    skipped, so concurrent misses don't repeat the same download and rewrite.
+    """
+    now = time.time()
+    groups = {}
+    for t in dict.fromkeys(t.strip().upper() for t in tickers if t):
+        key = (root, interval, t)
+        if not force and now - _synced.get(key, 0.0) < SYNC_FRESHNESS:
+            continue
+        _synced[key] = now
+        n, last, _ = series_version(t, interval, root)
+        if n == 0 or not _complete(t, interval, root):
+            start = None    # new series, or stored before a column existed: full download
+        else:
+            start = datetime.fromtimestamp(last, tz=timezone.utc).date()
+        groups.setdefault(start, []).append(t)
+
+    written = {}
+    for start, group in groups.items():
+        symbols = [yf_symbol(t) for t in group]
+        try:
+            frames = _download(symbols, interval, start=start,
+                               period=None if start else INITIAL_PERIOD.get(interval, "max"))
+        except Exception as e:
+            print(f"[CANDLES] Download failed ({interval}, {len(group)} tickers): {e}")
+            for t in group:
+                _synced.pop((root, interval, t), None)
+            continue
+        for t, s in zip(group, symbols):
+            try:
+                if start is not None and _new_split(t, interval, frames.get(s), root):
+                    # Yahoo re-adjusted the whole history for the split: reload it
+                    print(f"[CANDLES] New split for {t} ({interval}): downloading the full series again.")
+                    full = _download([s], interval, period=INITIAL_PERIOD.get(interval, "max"))
+                    written[t] = append_candles(t, interval, full.get(s), root, replace_all=True)
+                    continue
+                written[t] = append_candles(t, interval, frames.get(s), root)
+            except Exception as e:
+                print(f"[CANDLES] Write failed {t}: {e}")
+    return written
+
+
+def stale_tickers(tickers, interval="1d", max_age=timedelta(days=1), root=None):
+    """Tickers with no stored bars or whose last bar is older than max_age."""
+    limit = (datetime.now(timezone.utc) - max_age).timestamp()
+    out = []
+    for t in tickers:
+        n, last, _ = series_version(t, interval, root)
+        if n == 0 or last < limit:
+            out.append(t)
+    return out
+
+
+def sync_stale(tickers, interval="1d", max_age=timedelta(days=1), root=None):
+    """sync() restricted to stale_tickers(): no download at all when everything is recent."""
+    stale = stale_tickers(tickers, interval, max_age, root)
+    return sync(stale, interval, root) if stale else {}
@@ -0,0 +1,234 @@
+"""
+Daily option-chain snapshot archive.
+
+Each ingested chain (the Opcoes tab rows plus spot, IV and Greeks) is stored as
+compressed Parquet, partitioned by snapshot date and underlying:
+
+    <ARCHIVE_DIR>/2026-10-19/PETR4.parquet
+
+Re-running the ingestion on the same day replaces that day's partition, so the
+archive holds one snapshot per underlying per day. Readers memory-map the files
+(pyarrow memory_map=True) and only decode the requested columns.
+"""
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services.bs_engine import bs_batch, implied_vol_batch
+
+_backend_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+ARCHIVE_DIR = os.environ.get('OPTION_ARCHIVE_DIR', os.path.join(_backend_dir, 'data', 'option_chains'))
+
+CHAIN_COLUMNS = ["subjacente", "vencimento", "ativo", "tipo", "modelo", "strike", "preco", "negocios", "volume"]
+COMPUTED_COLUMNS = ["spot", "dias_uteis", "iv", "delta", "gamma", "vega", "theta"]
+
+
+def _to_date(d):
+    if d is None:
+        return date.today()
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    return datetime.strptime(str(d)[:10], "%Y-%m-%d").date()
+
+
+def parse_expiries(vencimentos):
+    """Array of expiry strings ("2026-11-21" or "21/11/2026") -> datetime64[D] (NaT if invalid)."""
+    s = pd.Series(vencimentos, dtype="object").astype(str).str.strip()
+    iso = pd.to_datetime(s.where(s.str.contains("-")), format="%Y-%m-%d", errors="coerce")
+    br = pd.to_datetime(s.where(s.str.contains("/")), format="%d/%m/%Y", errors="coerce")
+    return iso.fillna(br).to_numpy(dtype="datetime64[D]")
+
+
+def business_days_between(start, expiries):
+    """Vectorized business days from start (date) to each expiry (datetime64[D]); -1 for NaT."""
+    expiries = np.asarray(expiries, dtype="datetime64[D]")
+    valid = ~np.isnat(expiries)
+    out = np.full(expiries.shape, -1, dtype=np.int64)
+    if valid.any():
+        out[valid] = np.busday_count(np.datetime64(_to_date(start), "D"), expiries[valid])
+    return out
+
+
+def enrich_chain(df, spots, r, snapshot_date=None):
+    """
+    Adds spot, business days, implied volatility and Greeks to a chain frame
+    (columns as produced by opcoes_to_sheets_rules.optionchaindate).
+    spots: {subjacente: price}. Rows without spot / expired get NaN metrics.
+    """
+    out = df[CHAIN_COLUMNS].copy().reset_index(drop=True)
+    out["spot"] = out["subjacente"].map(spots).astype(float)
+
+    bdays = business_days_between(snapshot_date, parse_expiries(out["vencimento"]))
+    out["dias_uteis"] = bdays
+
+    S = out["spot"].to_numpy(dtype=float)
+    K = pd.to_numeric(out["strike"], errors="coerce").to_numpy(dtype=float)
+    P = pd.to_numeric(out["preco"], errors="coerce").to_numpy(dtype=float)
+    T = np.where(bdays > 0, bdays / 252.0, 0.0)
+    is_call = out["tipo"].astype(str).str.upper().str.contains("CALL").to_numpy()
+
+    iv = implied_vol_batch(P, S, K, T, r, is_call)
+    greeks = bs_batch(S, K, T, r, np.nan_to_num(iv, nan=0.0), is_call)
+    has_iv = ~np.isnan(iv)
+
+    out["iv"] = iv
+    for g in ("delta", "gamma", "vega", "theta"):
+        out[g] = np.where(has_iv, greeks[g], np.nan)
+    return out
+
+
+def write_snapshot(enriched, snapshot_date=None, root=None):
+    """
+    Writes one Parquet file per underlying under <root>/<date>/, replacing the
+    day's partition: files of underlyings absent from this run are removed.
+    Returns the number of files written.
+    """
+    root = root or ARCHIVE_DIR
+    day_dir = os.path.join(root, _to_date(snapshot_date).isoformat())
+    os.makedirs(day_dir, exist_ok=True)
+
+    written = set()
+    for underlying, part in enriched.groupby("subjacente", sort=True):
+        table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+        path = os.path.join(day_dir, f"{underlying}.parquet")
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)  # Atomic: readers never see half-written files
+        written.add(os.path.basename(path))
+
+    # Underlyings that dropped out since the previous run of the day
+    for name in os.listdir(day_dir):
+        if name.endswith(".parquet") and name not in written:
+            os.remove(os.path.join(day_dir, name))
+    return len(written)
+
+
+def archive_chain(df, spots, r, snapshot_date=None, root=None):
+    """enrich_chain + write_snapshot. Returns the number of underlyings archived."""
+    if df is None or df.empty:
+        return 0
+    return write_snapshot(enrich_chain(df, spots, r, snapshot_date), snapshot_date, root)
+
+
+def list_archive_dates(root=None, start=None, end=None):
+    """Sorted snapshot dates (ISO strings) available in the archive, optionally bounded."""
+    root = root or ARCHIVE_DIR
+    if not os.path.isdir(root):
+        return []
+    lo = _to_date(start).isoformat() if start else None
+    hi = _to_date(end).isoformat() if end else None
+    dates = []
+    for name in os.listdir(root):
+        if len(name) != 10 or not os.path.isdir(os.path.join(root, name)):
+            continue
+        if (lo and name < lo) or (hi and name > hi):
+            continue
+        dates.append(name)
+    return sorted(dates)
+
+
+def list_archived_underlyings(root=None, start=None, end=None):
+    """Underlyings present in at least one snapshot of the range."""
+    root = root or ARCHIVE_DIR
+    found = set()
+    for d in list_archive_dates(root, start, end):
+        for name in os.listdir(os.path.join(root, d)):
+            if name.endswith(".parquet"):
+                found.add(name[:-len(".parquet")])
+    return sorted(found)
+
+
+def read_chain_range(underlying, start=None, end=None, columns=None, root=None, as_table=False):
+    """
+    Reads the archived chains of one underlying between start and end (inclusive).
+    Files are memory-mapped and only `columns` are decoded. A 'date' column
+    (snapshot date) is added. Returns a DataFrame, or a pyarrow Table (no pandas
+    conversion / copy) when as_table=True.
+    """
+    root = root or ARCHIVE_DIR
+    underlying = underlying.strip().upper()
+    tables = []
+    for d in list_archive_dates(root, start, end):
+        path = os.path.join(root, d, f"{underlying}.parquet")
+        if not os.path.exists(path):
+            continue
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        snapshot = pa.array(np.full(table.num_rows, np.datetime64(d, "D")))
+        tables.append(table.append_column("date", snapshot))
+
+    if not tables:
+        empty = pd.DataFrame(columns=(columns or CHAIN_COLUMNS + COMPUTED_COLUMNS) + ["date"])
+        return pa.Table.from_pandas(empty, preserve_index=False) if as_table else empty
+
+    combined = pa.concat_tables(tables, promote_options="default")
+    return combined if as_table else combined.to_pandas()
+
+
+# ============ BASE (stock) SNAPSHOTS ============
+# Valuation fields the CHEAP / EXPENSIVE rules depend on (falta, custo baixo/alto).
+# One small file per day, refreshed whenever the BASE sheet is re-read.
+
+STOCK_SNAPSHOT_DIR = os.environ.get('STOCK_SNAPSHOT_DIR', os.path.join(_backend_dir, 'data', 'stock_snapshots'))
+STOCK_COLUMNS = ["ticker", "price", "min_val", "max_val", "falta_val", "vol_ano"]
+
+
+def _falta(value):
+    """falta_val as float; -999.0 (unknown: never CHEAP) when missing, empty or unparseable."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return -999.0
+    return value if np.isfinite(value) else -999.0
+
+
+def write_stock_snapshot(stocks, snapshot_date=None, root=None):
+    """
+    Stores the parsed BASE rows (numeric valuation columns) for the day
+    (written by the ingestion script, scripts/opcoes_to_sheets_rules.py).
+    """
+    from services.sheets import parse_price, parse_volatility
+
+    root = root or STOCK_SNAPSHOT_DIR
+    os.makedirs(root, exist_ok=True)
+    frame = pd.DataFrame({
+        "ticker": [s.get('ticker', '').strip().upper() for s in stocks],
+        "price": [parse_price(s.get('price', 0.0)) for s in stocks],
+        "min_val": [parse_price(s.get('min_val', 0.0)) for s in stocks],
+        "max_val": [parse_price(s.get('max_val', 0.0)) for s in stocks],
+        "falta_val": [_falta(s.get('falta_val')) for s in stocks],
+        "vol_ano": [parse_volatility(s.get('vol_ano')) for s in stocks],
+    })
+    path = os.path.join(root, f"{_to_date(snapshot_date).isoformat()}.parquet")
+    tmp_path = path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return len(frame)
+
+
+def read_stock_snapshots(start=None, end=None, root=None):
+    """All BASE snapshots in the range as one frame with a 'date' column."""
+    root = root or STOCK_SNAPSHOT_DIR
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=STOCK_COLUMNS + ["date"])
+    lo = _to_date(start).isoformat() if start else None
+    hi = _to_date(end).isoformat() if end else None
+
+    frames = []
+    for name in sorted(os.listdir(root)):
+        if not name.endswith(".parquet"):
+            continue
+        d = name[:-len(".parquet")]
+        if (lo and d < lo) or (hi and d > hi):
+            continue
+        frame = pq.read_table(os.path.join(root, name), memory_map=True).to_pandas()
+        frame["date"] = np.datetime64(d, "D")
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=STOCK_COLUMNS + ["date"])
+    return pd.concat(frames, ignore_index=True)
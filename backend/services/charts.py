@@ -0,0 +1,276 @@
+"""
+OHLCV chart payloads for /api/chart/<ticker>.
+
+Bars come from the local candle store (services/candle_store.py): a cache miss
+syncs only the bars after the last stored one and slices the requested range
+out of the memmapped columns; intervals the store does not keep, and ranges
+older than its initial download (range=max of daily / weekly / monthly bars),
+fall back to a direct yfinance download. Payloads are cached per (ticker,
+range, interval) with a TTL that follows the interval (intraday bars refresh
+every minute during the session, weekly / monthly bars a few times a day).
+Candles are built column-wise (one mask, one round per column) and company
+names come from a persistent metadata cache instead of the slow yfinance
+`info` call.
+
+Price basis: split- and dividend-adjusted, as yfinance history() (the store
+keeps dividend-unadjusted bars and the dividends column; the factors are
+applied on read). With adjusted=False the candles are only split-adjusted,
+the basis the server-side indicators (services/indicators.py) are computed
+on. The payload says which one it carries in "adjusted".
+
+?max_points= downsamples the candles to the viewport width (OHLC buckets for
+candle charts, Largest-Triangle-Three-Buckets for line charts), so payload size
+follows the screen instead of the history length; each view is cached too.
+"""
+import os
+import threading
+
+import numpy as np
+
+from services.cache import cached, market_hours_ttl, PersistentValueCache
+
+_backend_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+METADATA_FILE = os.path.join(_backend_dir, 'data', 'metadata_cache.json')
+
+INTRADAY_SUFFIXES = ('m', 'h')
+CANDLE_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+MIN_POINTS = 10
+MAX_POINTS = 5000
+
+_metadata = None
+_metadata_lock = threading.Lock()
+
+
+def _metadata_cache():
+    global _metadata
+    with _metadata_lock:
+        if _metadata is None:
+            os.makedirs(os.path.dirname(METADATA_FILE), exist_ok=True)
+            _metadata = PersistentValueCache(persist_file=METADATA_FILE)
+        return _metadata
+
+
+def get_company_name(ticker, yf_ticker=None):
+    """
+    Display name of a ticker: BASE sheet 'company_name' when present, else the
+    persistent metadata cache, else ONE yfinance info lookup (then kept on disk).
+    """
+    from services.sheets import get_sheet_data
+
+    key = ticker.split('.')[0].strip().upper()
+    for s in get_sheet_data() or []:
+        if str(s.get('ticker', '')).strip().upper() == key:
+            name = str(s.get('company_name') or '').strip()
+            if name and name != key:
+                return _metadata_cache().get_or_update(key, 'name', name)
+            break
+
+    cache = _metadata_cache()
+    name = cache.get_or_update(key, 'name', None)
+    if name:
+        return name
+    try:
+        import yfinance as yf
+        info = yf.Ticker(yf_ticker or f"{key}.SA").info
+        name = info.get('longName') or info.get('shortName')
+    except Exception as e:
+        print(f"[CHART] Company name lookup failed for {key}: {e}")
+        name = None
+    return cache.get_or_update(key, 'name', name) if name else ticker
+
+
+def clean_columns(columns):
+    """
+    Chart columns from raw {time, open, high, low, close, volume} arrays, without
+    a per-row loop: prices rounded to cents, bars with a missing / non-positive
+    price dropped, missing volume as 0.
+    """
+    prices = {col: np.round(np.asarray(columns[col], dtype=float), 2) for col in ('open', 'high', 'low', 'close')}
+    keep = np.ones(len(prices['close']), dtype=bool)
+    for values in prices.values():
+        keep &= values > 0   # NaN compares False
+    return {
+        'time': np.asarray(columns['time'], dtype=np.int64)[keep],
+        **{col: values[keep] for col, values in prices.items()},
+        'volume': np.nan_to_num(np.asarray(columns['volume'], dtype=float))[keep].astype(np.int64),
+    }
+
+
+def candle_rows(columns):
+    """lightweight-charts candles ({time, open, high, low, close, volume} dicts) from clean columns."""
+    return [dict(zip(CANDLE_FIELDS, row)) for row in zip(*(columns[f].tolist() for f in CANDLE_FIELDS))]
+
+
+def frame_columns(df):
+    """Raw chart columns of a yfinance OHLCV DataFrame."""
+    index = df.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    columns = {col: df[col.capitalize()].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close', 'volume')}
+    columns['time'] = index.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return columns
+
+
+def _store_covers(time_range, interval):
+    """False when the range reaches further back than the store's initial download of the interval."""
+    from services.aggregates import base_interval
+    from services.candle_store import INITIAL_PERIOD, RANGE_DAYS
+
+    def days(period):   # "10y" -> 3653, "730d" -> 730, None when unknown
+        if period in RANGE_DAYS:
+            return RANGE_DAYS[period]
+        return int(period[:-1]) if period.endswith('d') and period[:-1].isdigit() else None
+
+    period = INITIAL_PERIOD.get(base_interval(interval), "max")
+    if period == "max":
+        return True
+    if time_range == "max":
+        return False
+    wanted, stored = days(time_range), days(period)
+    return wanted is None or stored is None or wanted <= stored
+
+
+def _store_columns(ticker, time_range, interval, adjust=True):
+    """
+    Raw columns of a (ticker, interval) from the local store, after an
+    incremental sync of its base interval (1wk / 1mo are built from 1d bars),
+    dividend-adjusted unless adjust=False.
+    """
+    from services.aggregates import base_interval, read_interval
+    from services.candle_store import dividend_factors, read_candles, slice_range, sync
+
+    base = base_interval(interval)
+    sync([ticker], base)   # failures are logged; stored bars are still served
+    candles = read_interval(ticker, interval)
+    if adjust and len(candles['time']):
+        # Factors from the base bars (the ex-date's previous close), taken at each bar's last base bar
+        base_bars = read_candles(ticker, base) if base != interval else candles
+        factors = dividend_factors(base_bars['close'], base_bars['dividends'])
+        if base != interval:
+            last = np.searchsorted(base_bars['time'], candles['time'][1:], side='left') - 1
+            factors = np.append(factors[last], factors[-1])
+        candles = dict(candles, **{col: candles[col] * factors for col in ('open', 'high', 'low', 'close')})
+    return slice_range(candles, time_range)
+
+
+# --- Downsampling (?max_points=) ---
+
+def ohlc_buckets(columns, max_points):
+    """
+    Candle mode: consecutive bars merged into max_points buckets of (almost)
+    equal size with reduceat: first open, max high, min low, last close,
+    summed volume; the bucket is stamped with its first bar's time.
+    """
+    n = len(columns['time'])
+    if n <= max_points:
+        return columns
+    starts = np.linspace(0, n, max_points + 1).astype(np.int64)[:-1]
+    ends = np.append(starts[1:], n) - 1
+    return {
+        'time': columns['time'][starts],
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(columns['volume'], starts),
+    }
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Line mode: indices kept by Largest-Triangle-Three-Buckets. First and last
+    points are kept; the n - 2 others are split into max_points - 2 buckets and
+    each bucket keeps the point forming the largest triangle with the previous
+    kept point and the next bucket's centroid. Bucket centroids come from one
+    cumsum; the remaining loop runs over buckets (<= max_points), not bars,
+    because each bucket depends on the point kept in the previous one.
+    """
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)   # max_points - 2 buckets
+    counts = np.diff(edges)
+    cx, cy = (np.concatenate([[0.0], np.cumsum(v)]) for v in (x, y))
+    mean_x = (cx[edges[1:]] - cx[edges[:-1]]) / counts
+    mean_y = (cy[edges[1:]] - cy[edges[:-1]]) / counts
+    # Third vertex of bucket b: centroid of bucket b + 1 (the last point for the last bucket)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(max_points - 2):
+        s, e = edges[b], edges[b + 1]
+        area = np.abs((x[a] - next_x[b]) * (y[s:e] - y[a]) - (x[a] - x[s:e]) * (next_y[b] - y[a]))
+        a = s + int(np.argmax(area))
+        keep[b + 1] = a
+    return keep
+
+
+def downsample(columns, max_points, mode='candle'):
+    """At most max_points bars: OHLC buckets ('candle') or LTTB on the close ('line')."""
+    if mode == 'candle':
+        return ohlc_buckets(columns, max_points)
+    if mode == 'line':
+        keep = lttb_indices(columns['time'], columns['close'], max_points)
+        return {col: values[keep] for col, values in columns.items()}
+    raise ValueError("mode must be 'candle' or 'line'")
+
+
+def _chart_ttl(payload):
+    interval = payload.get('interval', '1d')
+    if interval.endswith(INTRADAY_SUFFIXES):
+        return market_hours_ttl(60, 900)
+    if interval in ('1d', '5d'):
+        return market_hours_ttl(300, 3600)
+    return 6 * 3600
+
+
+@cached(ttl_seconds=_chart_ttl)
+def get_chart_columns(ticker, time_range='1mo', interval='1d', adjust=True):
+    """Full-resolution chart {ticker, name, currency, interval, adjusted, columns}, or None when there are no bars."""
+    from services.aggregates import DERIVED_INTERVALS
+    from services.candle_store import INITIAL_PERIOD, yf_symbol
+
+    yf_ticker = yf_symbol(ticker)
+    if (interval in INITIAL_PERIOD or interval in DERIVED_INTERVALS) and _store_covers(time_range, interval):
+        # Stored under the B3 code (PETR4.SA -> PETR4), as the other store readers do
+        key = ticker[:-3] if ticker.upper().endswith('.SA') else ticker
+        columns = clean_columns(_store_columns(key, time_range, interval, adjust))
+    else:
+        import yfinance as yf
+        df = yf.Ticker(yf_ticker).history(period=time_range, interval=interval, auto_adjust=adjust)
+        columns = clean_columns(frame_columns(df)) if not df.empty else None
+    if columns is None or len(columns['time']) == 0:
+        return None
+    return {
+        'ticker': ticker,
+        'name': get_company_name(ticker, yf_ticker),
+        'currency': 'BRL',
+        'interval': interval,
+        'adjusted': bool(adjust),
+        'columns': columns
+    }
+
+
+@cached(ttl_seconds=_chart_ttl)
+def get_chart(ticker, time_range='1mo', interval='1d', max_points=None, mode='candle', adjust=True):
+    """
+    Chart payload {ticker, name, currency, interval, adjusted, candles}, or None
+    when there are no bars. With max_points the candles are downsampled (see
+    downsample) and the payload reports the original bar count in "bars".
+    """
+    chart = get_chart_columns(ticker, time_range, interval, adjust)
+    if chart is None:
+        return None
+    columns = chart['columns']
+    payload = {key: value for key, value in chart.items() if key != 'columns'}
+    if max_points:
+        payload['bars'] = int(len(columns['time']))
+        payload['mode'] = mode
+        columns = downsample(columns, max(MIN_POINTS, min(int(max_points), MAX_POINTS)), mode)
+    payload['candles'] = candle_rows(columns)
+    return payload
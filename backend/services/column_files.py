@@ -0,0 +1,109 @@
+"""
+Column files shared by the local stores (candle_store, sgs_store).
+
+A series is a directory with one raw little-endian file per column. Readers
+get read-only np.memmap views, so a file that may be mapped is NEVER modified
+in place (shrinking a mapped file makes the next access of a page past the new
+EOF fail with SIGBUS, killing the process). A write builds each column as a
+new temp file in the same directory (kept prefix + new values) and swaps it in
+with os.replace: mappings of the old file keep the old inode, new readers see
+the new one.
+
+Columns are swapped in order with the key column (e.g. "time") LAST and read
+with it FIRST, so a reader that sees the new key column also sees the new
+values; one that sees the old key column only differs on the replaced tail.
+Each file's length comes from the opened descriptor, so a swap between sizing
+and mapping can't raise. Writers hold a thread lock plus an flock on the
+directory (when available), which also serializes separate processes such as
+scripts/sync_candles.py.
+
+On Windows a mapped file can't be replaced, so there columns are read into
+memory (np.fromfile) instead of mapped.
+"""
+import contextlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows: writers only serialized within the process
+    fcntl = None
+
+USE_MMAP = os.name != "nt"
+LOCK_FILE = ".lock"
+
+_thread_lock = threading.RLock()
+
+
+@contextlib.contextmanager
+def write_lock(directory):
+    """Exclusive writer lock of a series directory (threads and processes)."""
+    os.makedirs(directory, exist_ok=True)
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _ordered(columns, key):
+    return [key] + [col for col in columns if col != key]
+
+
+def read_columns(paths, dtypes, key):
+    """
+    {column: read-only array} of a series (memmap views where supported), all
+    cut to the shortest column. paths / dtypes: {column: path / np.dtype};
+    the key column is opened first. Empty arrays when a column is missing.
+    """
+    files = {}
+    try:
+        for col in _ordered(paths, key):
+            try:
+                files[col] = open(paths[col], "rb")
+            except FileNotFoundError:
+                return {col: np.empty(0, dtype=dtypes[col]) for col in paths}
+        n = min(os.fstat(f.fileno()).st_size // dtypes[col].itemsize for col, f in files.items())
+        if n == 0:
+            return {col: np.empty(0, dtype=dtypes[col]) for col in paths}
+        if USE_MMAP:
+            return {col: np.memmap(files[col], dtype=dtypes[col], mode="r", shape=(n,)) for col in paths}
+        return {col: np.fromfile(files[col], dtype=dtypes[col], count=n) for col in paths}
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def replace_columns(paths, dtypes, key, keep, new):
+    """
+    Rewrites a series as its first `keep` stored values followed by `new`
+    ({column: array}), through temp files + os.replace (key column last).
+    Call under write_lock(). Returns the new length.
+    """
+    stored = read_columns(paths, dtypes, key)
+    keep = min(keep, len(stored[key]))
+    temps = {}
+    try:
+        for col in paths:
+            directory = os.path.dirname(paths[col])
+            fd, tmp = tempfile.mkstemp(prefix=f".{col}.", suffix=".tmp", dir=directory)
+            temps[col] = tmp
+            with os.fdopen(fd, "wb") as f:
+                f.write(np.ascontiguousarray(stored[col][:keep], dtype=dtypes[col]).tobytes())
+                f.write(np.ascontiguousarray(new[col], dtype=dtypes[col]).tobytes())
+        del stored
+        for col in _ordered(paths, key)[::-1]:
+            os.replace(temps.pop(col), paths[col])
+    finally:
+        for tmp in temps.values():
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+    return keep + len(new[key])
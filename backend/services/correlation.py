@@ -0,0 +1,258 @@
+"""
+Correlation / covariance of daily log returns across the ticker universe.
+
+Returns come from the local candle store (services/candle_store.py), aligned
+by B3 trading day; a ticker without a bar on a day has no return that day and
+pairs use their common days only (pairwise-complete observations).
+
+One CorrelationBook per window keeps, for the whole universe, the last window
+returns R (days x tickers, 0 where missing), the presence mask M and the
+running sums RR = R'R, RM = R'M, SM = (R*R)'M and MM = M'M. New days are
+rolling-window updates (add the new rows' products, subtract the dropped
+ones), so a refresh costs O(new days x tickers^2) and any subset is read
+off the sums in O(k^2). As in services/volatility.py the newest day is not
+committed (its bars may still be replaced); it is added on top at query time.
+"""
+import threading
+
+import numpy as np
+
+from services.candle_store import read_candles, series_version
+
+DEFAULT_WINDOW = 126
+MIN_WINDOW = 21
+MAX_WINDOW = 756
+MIN_OBS = 20
+DAY = 86400
+B3_UTC_OFFSET = -3 * 3600
+
+
+def _days(times):
+    return (np.asarray(times, dtype=np.int64) + B3_UTC_OFFSET) // DAY
+
+
+def _ticker_returns(ticker, after_day=None, bars=None, root=None):
+    """(days, log returns) of a ticker's daily bars, for days > after_day (or the last `bars`)."""
+    start = None if after_day is None else int((after_day - 10) * DAY - B3_UTC_OFFSET)
+    candles = read_candles(ticker, "1d", start=start, root=root)
+    close = np.asarray(candles["close"], dtype=float)
+    if bars is not None:
+        close, times = close[-(bars + 1):], candles["time"][-(bars + 1):]
+    else:
+        times = candles["time"]
+    if len(close) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.log(close[1:] / close[:-1])
+    days = _days(times[1:])
+    keep = np.isfinite(ret) if after_day is None else np.isfinite(ret) & (days > after_day)
+    return days[keep], ret[keep]
+
+
+def _grid(series, n_tickers):
+    """{col: (days, returns)} -> (sorted days, R zero-filled, M presence) over the union of days."""
+    all_days = np.unique(np.concatenate([d for d, _ in series.values()])) if series else np.empty(0, np.int64)
+    R = np.zeros((len(all_days), n_tickers))
+    M = np.zeros((len(all_days), n_tickers))
+    for col, (days, ret) in series.items():
+        rows = np.searchsorted(all_days, days)
+        R[rows, col] = ret
+        M[rows, col] = 1.0
+    return all_days, R, M
+
+
+def aligned_returns(tickers, bars=None, root=None):
+    """
+    Daily log returns of several tickers on their union of trading days, as
+    (days, R, M): R is days x tickers with 0 where a ticker has no return that
+    day, M the matching presence mask. bars: only each ticker's last `bars` returns.
+    """
+    return _grid({i: _ticker_returns(t, bars=bars, root=root) for i, t in enumerate(tickers)}, len(tickers))
+
+
+class CorrelationBook:
+    """Rolling-window return sums for one window over one ticker universe."""
+
+    def __init__(self, window, root=None):
+        self.window = window
+        self.root = root
+        self.tickers = []
+        self.pos = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+        self._reset(0)
+
+    def _reset(self, n):
+        self.days = np.empty(0, dtype=np.int64)   # committed days (at most window - 1)
+        self.R = np.zeros((0, n))
+        self.M = np.zeros((0, n))
+        self.sums = {k: np.zeros((n, n)) for k in ("RR", "RM", "SM", "MM")}
+        self.newest = (None, np.zeros(n), np.zeros(n))  # (day, returns, presence)
+        self.updates = 0
+
+    def _add(self, R, M, sign=1.0):
+        self.sums["RR"] += sign * (R.T @ R)
+        self.sums["RM"] += sign * (R.T @ M)
+        self.sums["SM"] += sign * ((R * R).T @ M)
+        self.sums["MM"] += sign * (M.T @ M)
+
+    def _commit(self, days, R, M):
+        """Appends committed days and drops the oldest beyond window - 1."""
+        if len(days) == 0:
+            return
+        self.days = np.concatenate([self.days, days])
+        self.R = np.vstack([self.R, R])
+        self.M = np.vstack([self.M, M])
+        self._add(R, M)
+        drop = len(self.days) - (self.window - 1)
+        if drop > 0:
+            self._add(self.R[:drop], self.M[:drop], sign=-1.0)
+            self.days, self.R, self.M = self.days[drop:], self.R[drop:], self.M[drop:]
+        self.updates += len(days)
+        if self.updates >= self.window:
+            # Rolling subtraction accumulates rounding error: resum from the window rows
+            self.sums = {k: np.zeros_like(v) for k, v in self.sums.items()}
+            self._add(self.R, self.M)
+            self.updates = 0
+
+    def _ingest(self, series):
+        """Commits every day before the newest one; keeps the newest day aside."""
+        days, R, M = _grid(series, len(self.tickers))
+        if len(days) == 0:
+            return
+        last_day = max(days[-1], self.newest[0] if self.newest[0] is not None else days[-1])
+        committed = days < last_day
+        self._commit(days[committed], R[committed], M[committed])
+        if days[-1] == last_day:
+            self.newest = (last_day, R[-1], M[-1])
+
+    def _rebuild(self, tickers):
+        """Universe (re)load from the last window bars of every ticker."""
+        self.tickers = tickers
+        self.pos = {t: i for i, t in enumerate(tickers)}
+        self._reset(len(tickers))
+        self._ingest({i: _ticker_returns(t, bars=self.window + 5, root=self.root)
+                      for i, t in enumerate(tickers)})
+
+    def refresh(self, tickers):
+        tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t))
+        versions = {t: series_version(t, "1d", self.root) for t in tickers}
+        with self.lock:
+            changed = [t for t in tickers if versions[t] != self.versions.get(t)]
+            if tickers != self.tickers:
+                self._rebuild(tickers)
+            elif changed:
+                after = self.days[-1] if len(self.days) else None
+                # A ticker catching up on days already committed (late sync, new
+                # listing) or whose history was rewritten (split reload, new
+                # generation) would need rows rewritten in place: reload instead
+                behind = after is not None and any(
+                    not self.versions.get(t) or self.versions[t][0] == 0 or _days(self.versions[t][1]) < after
+                    or versions[t][2] != self.versions[t][2]
+                    for t in changed)
+                if behind:
+                    self._rebuild(tickers)
+                else:
+                    series = {self.pos[t]: _ticker_returns(t, after_day=after, root=self.root)
+                              for t in tickers}
+                    self.newest = (None, np.zeros(len(tickers)), np.zeros(len(tickers)))
+                    self._ingest(series)
+            self.versions = versions
+
+    def statistics(self, subset):
+        """(cov, corr, observations) for a list of tickers of the universe (k x k arrays)."""
+        idx = np.array([self.pos[t] for t in subset], dtype=np.int64)
+        with self.lock:
+            ix = np.ix_(idx, idx)
+            RR, RM, SM, MM = (self.sums[k][ix].copy() for k in ("RR", "RM", "SM", "MM"))
+            day, r, m = self.newest
+            if day is not None:
+                r, m = r[idx], m[idx]
+                RR += np.outer(r, r)
+                RM += np.outer(r, m)
+                SM += np.outer(r * r, m)
+                MM += np.outer(m, m)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Pairwise over common days: sum_i|j = RM[i, j], sum_j|i = RM[j, i]
+            cov = (RR - RM * RM.T / MM) / (MM - 1.0)
+            var_i = (SM - RM ** 2 / MM) / (MM - 1.0)
+            corr = cov / np.sqrt(var_i * var_i.T)
+        short = MM < MIN_OBS
+        cov[short] = np.nan
+        corr[short] = np.nan
+        np.fill_diagonal(corr, np.where(np.diag(MM) >= MIN_OBS, 1.0, np.nan))
+        return cov, np.clip(corr, -1.0, 1.0), MM.astype(np.int64)
+
+    def as_of(self):
+        day = self.newest[0] if self.newest[0] is not None else (self.days[-1] if len(self.days) else None)
+        return None if day is None else np.datetime_as_string(np.datetime64(int(day), "D"))
+
+
+def cluster_order(corr):
+    """Leaf order of an average-linkage clustering on the distance sqrt((1 - corr) / 2)."""
+    n = len(corr)
+    if n < 3:
+        return np.arange(n)
+    from scipy.cluster.hierarchy import linkage, leaves_list
+    from scipy.spatial.distance import squareform
+
+    dist = np.sqrt(np.clip((1.0 - np.nan_to_num(corr, nan=0.0)) / 2.0, 0.0, 1.0))
+    np.fill_diagonal(dist, 0.0)
+    return leaves_list(linkage(squareform(dist, checks=False), method="average", optimal_ordering=True))
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def _book(window, universe):
+    with _books_lock:
+        book = _books.get(window)
+        if book is None:
+            if len(_books) >= 8:
+                _books.pop(next(iter(_books)))
+            book = _books[window] = CorrelationBook(window)
+    book.refresh(universe)
+    return book
+
+
+def correlation_matrix(universe, tickers=None, window=DEFAULT_WINDOW, kind="corr", cluster=False):
+    """
+    Correlation ('corr') or daily log-return covariance ('cov') of `tickers`
+    (default: the whole universe) over the last `window` trading days.
+    Tickers outside the universe or without stored history are reported in
+    "missing". With cluster, tickers and matrix follow the clustered order.
+    """
+    if kind not in ("corr", "cov"):
+        raise ValueError("kind must be 'corr' or 'cov'")
+    window = max(MIN_WINDOW, min(int(window), MAX_WINDOW))
+    universe = [t.strip().upper() for t in universe if t]
+    book = _book(window, universe)
+
+    wanted = [t.strip().upper() for t in (tickers or universe) if t.strip()]
+    subset = [t for t in dict.fromkeys(wanted) if t in book.pos]
+    missing = [t for t in dict.fromkeys(wanted) if t not in book.pos]
+    cov, corr, obs = book.statistics(subset)
+    # Tickers without enough history have no diagonal
+    keep = np.flatnonzero(np.diag(obs) >= MIN_OBS) if len(subset) else np.empty(0, dtype=np.int64)
+    missing += [subset[i] for i in range(len(subset)) if i not in set(keep.tolist())]
+    subset = [subset[i] for i in keep]
+    cov, corr = cov[np.ix_(keep, keep)], corr[np.ix_(keep, keep)]
+
+    if cluster and len(subset):
+        order = cluster_order(corr)
+        subset = [subset[i] for i in order]
+        cov, corr = cov[np.ix_(order, order)], corr[np.ix_(order, order)]
+
+    values = corr if kind == "corr" else cov
+    matrix = [[None if not np.isfinite(v) else round(float(v), 6 if kind == "corr" else 10) for v in row]
+              for row in values]
+    return {
+        "kind": kind,
+        "window": window,
+        "as_of": book.as_of(),
+        "tickers": subset,
+        "matrix": matrix,
+        "missing": missing,
+    }
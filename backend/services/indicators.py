@@ -0,0 +1,338 @@
+"""
+Technical indicators over the local candle store (services/candle_store.py;
+weekly / monthly bars come from services/aggregates.py).
+
+Indicators:
+    sma:N             simple moving average of the close
+    ema:N             exponential moving average (seeded with the SMA of the first N)
+    rsi:N             Wilder RSI
+    macd:F:S:G        MACD line, signal and histogram
+    bb:N:K            Bollinger bands (SMA +/- K population std)
+    atr:N             Wilder average true range
+    vwap[:N]          session VWAP on intraday bars, rolling N-bar VWAP otherwise
+
+Every indicator is a step function (state, new bars) -> (outputs, state):
+recursive ones carry their last smoothed value (EMA recursions run through
+scipy.signal.lfilter with that value as initial condition), windowed ones the
+last N-1 inputs. The book keeps per (ticker, interval, spec) the outputs and
+state of the committed bars and, on refresh, only steps over the bars appended
+since. As in services/volatility.py the newest stored bar may still be replaced
+by the next sync, so it is computed on top of the committed state, never into it.
+"""
+import threading
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+from services.aggregates import interval_version, read_interval
+
+DEFAULTS = {
+    "sma": (20,), "ema": (9,), "rsi": (14,), "macd": (12, 26, 9),
+    "bb": (20, 2), "atr": (14,), "vwap": (20,),
+}
+MAX_PERIOD = 500
+INTRADAY = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+B3_UTC_OFFSET = -3 * 3600
+
+
+# --- Building blocks -----------------------------------------------------------
+
+def _ema_run(x, alpha, n, prev, seed):
+    """
+    Exponential smoothing of x continuing from `prev` (last smoothed value,
+    NaN while still seeding) and `seed` (finite inputs collected so far).
+    The first value is the mean of the first n finite inputs; NaN inputs
+    before that are skipped. Returns (out, prev, seed).
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full(len(x), np.nan)
+    start = 0
+    if np.isnan(prev):
+        finite = np.flatnonzero(np.isfinite(x))
+        need = n - len(seed)
+        if len(finite) < need:
+            return out, prev, np.concatenate([seed, x[finite]])
+        pos = finite[need - 1]
+        prev = float(np.mean(np.concatenate([seed, x[finite[:need]]])))
+        out[pos] = prev
+        seed = np.empty(0)
+        start = pos + 1
+    if start < len(x):
+        y, _ = lfilter([alpha], [1.0, alpha - 1.0], x[start:], zi=[(1.0 - alpha) * prev])
+        out[start:] = y
+        prev = float(y[-1])
+    return out, prev, seed
+
+
+def _windows(tail, x, n):
+    """
+    (len(x), n) windows ending at each new input (NaN-padded before n inputs
+    exist) and the new tail: the last n-1 inputs.
+    """
+    full = np.concatenate([np.full(max(n - 1 - len(tail), 0), np.nan), tail, x])
+    windows = sliding_window_view(full, n)[len(full) - n + 1 - len(x):]
+    return windows, full[len(full) - n + 1:]
+
+
+def _prev_closes(prev_close, close):
+    return np.concatenate([[prev_close], close[:-1]])
+
+
+# --- Indicators: init(params) -> state; step(params, state, bars) -> (outputs, state) ---
+
+def _sma(params, state, bars):
+    (n,) = params
+    win, tail = _windows(state["tail"], bars["close"], n)
+    return {"value": win.mean(axis=1)}, {"tail": tail}
+
+
+def _ema(params, state, bars):
+    (n,) = params
+    out, prev, seed = _ema_run(bars["close"], 2.0 / (n + 1), n, state["prev"], state["seed"])
+    return {"value": out}, {"prev": prev, "seed": seed}
+
+
+def _rsi(params, state, bars):
+    (n,) = params
+    close = bars["close"]
+    diff = close - _prev_closes(state["prev_close"], close)
+    gain, g_prev, g_seed = _ema_run(np.where(np.isnan(diff), np.nan, np.maximum(diff, 0.0)),
+                                    1.0 / n, n, state["gain"], state["gain_seed"])
+    loss, l_prev, l_seed = _ema_run(np.where(np.isnan(diff), np.nan, np.maximum(-diff, 0.0)),
+                                    1.0 / n, n, state["loss"], state["loss_seed"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(loss > 0, 100.0 - 100.0 / (1.0 + gain / loss), np.where(np.isfinite(loss), 100.0, np.nan))
+    new_state = {"prev_close": close[-1] if len(close) else state["prev_close"],
+                 "gain": g_prev, "gain_seed": g_seed, "loss": l_prev, "loss_seed": l_seed}
+    return {"value": rsi}, new_state
+
+
+def _macd(params, state, bars):
+    fast_n, slow_n, signal_n = params
+    close = bars["close"]
+    fast, f_prev, f_seed = _ema_run(close, 2.0 / (fast_n + 1), fast_n, state["fast"], state["fast_seed"])
+    slow, s_prev, s_seed = _ema_run(close, 2.0 / (slow_n + 1), slow_n, state["slow"], state["slow_seed"])
+    line = fast - slow
+    signal, g_prev, g_seed = _ema_run(line, 2.0 / (signal_n + 1), signal_n, state["signal"], state["signal_seed"])
+    new_state = {"fast": f_prev, "fast_seed": f_seed, "slow": s_prev, "slow_seed": s_seed,
+                 "signal": g_prev, "signal_seed": g_seed}
+    return {"macd": line, "signal": signal, "hist": line - signal}, new_state
+
+
+def _bb(params, state, bars):
+    n, k = params
+    win, tail = _windows(state["tail"], bars["close"], int(n))
+    mid = win.mean(axis=1)
+    std = win.std(axis=1)
+    return {"middle": mid, "upper": mid + k * std, "lower": mid - k * std}, {"tail": tail}
+
+
+def _atr(params, state, bars):
+    (n,) = params
+    high, low, close = bars["high"], bars["low"], bars["close"]
+    prev = _prev_closes(state["prev_close"], close)
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev), np.abs(low - prev)))  # NaN on the first bar
+    out, prev_atr, seed = _ema_run(tr, 1.0 / n, n, state["prev"], state["seed"])
+    new_state = {"prev_close": close[-1] if len(close) else state["prev_close"], "prev": prev_atr, "seed": seed}
+    return {"value": out}, new_state
+
+
+def _vwap(params, state, bars):
+    (n,) = params
+    typical = (bars["high"] + bars["low"] + bars["close"]) / 3.0
+    pv, vol = typical * bars["volume"], bars["volume"]
+    if state["intraday"]:
+        # Cumulative sums reset at each B3 session (day in UTC-3)
+        session = (bars["time"] + B3_UTC_OFFSET) // 86400
+        keys = np.concatenate([[state["session"]], session])
+        new_session = keys[1:] != keys[:-1]
+        cum_pv, cum_v = np.empty(len(pv)), np.empty(len(pv))
+        acc_pv, acc_v = state["cum_pv"], state["cum_v"]
+        starts = np.flatnonzero(np.r_[True, new_session[1:]]) if len(pv) else np.empty(0, dtype=int)
+        bounds = np.r_[starts, len(pv)]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if new_session[a]:
+                acc_pv, acc_v = 0.0, 0.0
+            cum_pv[a:b] = acc_pv + np.cumsum(pv[a:b])
+            cum_v[a:b] = acc_v + np.cumsum(vol[a:b])
+            acc_pv, acc_v = cum_pv[b - 1], cum_v[b - 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = np.where(cum_v > 0, cum_pv / cum_v, typical)
+        new_state = dict(state, session=int(keys[-1]), cum_pv=acc_pv, cum_v=acc_v)
+        return {"value": out}, new_state
+
+    pv_win, pv_tail = _windows(state["pv_tail"], pv, n)
+    v_win, v_tail = _windows(state["v_tail"], vol, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sum_v = v_win.sum(axis=1)
+        out = np.where(sum_v > 0, pv_win.sum(axis=1) / sum_v, np.nan)
+    return {"value": out}, dict(state, pv_tail=pv_tail, v_tail=v_tail)
+
+
+def _init_state(name, params, interval):
+    empty = np.empty(0)
+    if name in ("sma", "bb"):
+        return {"tail": empty}
+    if name == "ema":
+        return {"prev": np.nan, "seed": empty}
+    if name == "rsi":
+        return {"prev_close": np.nan, "gain": np.nan, "gain_seed": empty, "loss": np.nan, "loss_seed": empty}
+    if name == "macd":
+        return {k: np.nan for k in ("fast", "slow", "signal")} | {k + "_seed": empty for k in ("fast", "slow", "signal")}
+    if name == "atr":
+        return {"prev_close": np.nan, "prev": np.nan, "seed": empty}
+    # vwap
+    return {"intraday": interval in INTRADAY, "session": -1, "cum_pv": 0.0, "cum_v": 0.0,
+            "pv_tail": empty, "v_tail": empty}
+
+
+STEPS = {"sma": _sma, "ema": _ema, "rsi": _rsi, "macd": _macd, "bb": _bb, "atr": _atr, "vwap": _vwap}
+
+
+def parse_spec(text):
+    """
+    'sma:20,ema:9,rsi,macd:12:26:9,bb:20:2' -> [(key, name, params), ...]
+    (key like 'sma_20'); missing params take DEFAULTS. Raises ValueError.
+    """
+    specs = []
+    for part in (text or "").split(","):
+        tokens = [t.strip() for t in part.strip().lower().split(":")]
+        if not tokens or not tokens[0]:
+            continue
+        name, args = tokens[0], tokens[1:]
+        if name not in STEPS:
+            raise ValueError(f"Unknown indicator: {name} (use {', '.join(STEPS)})")
+        defaults = DEFAULTS[name]
+        if len(args) > len(defaults):
+            raise ValueError(f"Too many parameters for {name}")
+        try:
+            params = tuple(float(a) if name == "bb" and i == 1 else int(a) for i, a in enumerate(args))
+        except ValueError:
+            raise ValueError(f"Invalid parameters for {name}: {part.strip()}")
+        params = params + defaults[len(params):]
+        periods = params if name != "bb" else params[:1]
+        if any(p < 1 or p > MAX_PERIOD for p in periods) or (name == "bb" and params[1] <= 0):
+            raise ValueError(f"Parameters out of range for {name}: {part.strip()}")
+        key = "_".join([name] + [f"{p:g}" for p in params])
+        specs.append((key, name, params))
+    return specs
+
+
+def compute(name, params, bars, interval="1d"):
+    """One-shot indicator over full arrays (no state carried); {output: array}."""
+    out, _ = STEPS[name](params, _init_state(name, params, interval), bars)
+    return out
+
+
+# --- Incremental book ----------------------------------------------------------
+
+def _bars(candles, lo, hi):
+    return {c: np.asarray(candles[c][lo:hi], dtype=float) if c != "time" else np.asarray(candles[c][lo:hi])
+            for c in ("time", "open", "high", "low", "close", "volume")}
+
+
+class _SeriesState:
+    __slots__ = ("committed", "state", "outputs", "version")
+
+    def __init__(self, state):
+        self.committed = 0
+        self.state = state
+        self.outputs = None
+        self.version = None
+
+
+class IndicatorBook:
+    """Committed indicator outputs and step state per (ticker, interval, spec key)."""
+
+    def __init__(self, root=None, max_series=2048):
+        self.root = root
+        self.max_series = max_series
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def _series(self, ticker, interval, key, name, params, candles, version):
+        """Brings one indicator up to date with all bars but the newest; returns its _SeriesState."""
+        skey = (ticker, interval, key)
+        n = version[0]
+        entry = self.series.get(skey)
+        if entry is None or n < entry.committed or (entry.version and (
+                version[1] < entry.version[1] or version[2] != entry.version[2])):
+            # New series, or bars already stepped over were rewritten (shorter, older, new generation)
+            entry = _SeriesState(_init_state(name, params, interval))
+            if len(self.series) >= self.max_series:
+                self.series.pop(next(iter(self.series)))
+            self.series[skey] = entry
+
+        if entry.version != version:
+            hi = max(n - 1, 0)
+            if hi > entry.committed:
+                out, entry.state = STEPS[name](params, entry.state, _bars(candles, entry.committed, hi))
+                entry.outputs = out if entry.outputs is None else {
+                    k: np.concatenate([entry.outputs[k], v]) for k, v in out.items()}
+                entry.committed = hi
+            entry.version = version
+        return entry
+
+    def indicators(self, ticker, specs, interval="1d", start=None):
+        """
+        {"time": array, key: {output: array}} for the stored series of a ticker,
+        aligned bar by bar, from `start` (unix seconds) on.
+        """
+        ticker = ticker.strip().upper()
+        version = interval_version(ticker, interval, self.root)
+        candles = read_interval(ticker, interval, root=self.root)
+        n = len(candles["close"])
+        times = np.asarray(candles["time"])
+        lo = 0 if start is None else int(np.searchsorted(times, int(start), side="left"))
+        result = {"time": times[lo:]}
+        if n == 0:
+            return result
+
+        with self.lock:
+            for key, name, params in specs:
+                entry = self._series(ticker, interval, key, name, params, candles, version)
+                committed = entry.outputs or {}
+                # Newest bar: stepped from the committed state (step functions never mutate it)
+                last, _ = STEPS[name](params, entry.state, _bars(candles, entry.committed, n))
+                result[key] = {k: np.concatenate([committed.get(k, np.empty(0)), v])[lo:] for k, v in last.items()}
+        return result
+
+
+_book = IndicatorBook()
+
+
+def get_indicators(ticker, spec, interval="1d", start=None, sample=None, buckets=False):
+    """
+    Indicators of `spec` (see parse_spec) for a ticker from the candle store,
+    as {key: {output: [{"time", "value"}, ...]}} (lightweight-charts series;
+    warm-up bars omitted). `sample` (ascending unix seconds, e.g. the times of
+    downsampled candles) keeps one value per sample time: the value at that
+    bar, or with buckets=True the last value before the next sample time
+    (the bucket's close), stamped with the sample time.
+    """
+    specs = parse_spec(spec)
+    data = _book.indicators(ticker, specs, interval, start)
+    times = np.asarray(data["time"])
+    pick = None
+    if sample is not None and len(times):
+        sample = np.asarray(sample, dtype=np.int64)
+        if buckets:
+            bounds = np.append(sample[1:], np.iinfo(np.int64).max)
+            pick = np.searchsorted(times, bounds, side="left") - 1
+        else:
+            pick = np.searchsorted(times, sample, side="right") - 1
+        valid = pick >= 0
+        pick, times = pick[valid], sample[valid]
+    times = times.tolist()
+    out = {}
+    for key, _, _ in specs:
+        if key not in data:
+            out[key] = {}
+            continue
+        out[key] = {
+            name: [{"time": t, "value": round(float(v), 4)}
+                   for t, v in zip(times, (values if pick is None else values[pick]).tolist()) if v == v]
+            for name, values in data[key].items()
+        }
+    return out
@@ -1,6 +1,6 @@
-import requests
 import re
 from services.cache import cached
+from services import sgs_client
 
 @cached(ttl_seconds=3600) # 1 Hour Cache
 def get_economic_indices():
@@ -15,15 +15,10 @@ def get_economic_indices():
         "poupanca": "N/A" # Ensure key exists
     }
     
-    # 1. Selic Meta (BCB API)
-    # https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json
+    # 1. Selic Meta (BCB SGS 432, shared client)
     try:
-        url_selic = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json"
-        r = requests.get(url_selic, timeout=5)
-        if r.status_code == 200:
-             # [{"data":"01/02/2026","valor":"10.75"}]
-             val = r.json()[0]['valor']
-             indices["selic"] = f"{val}%"
+        val = sgs_client.latest(sgs_client.SELIC_META, 1)[-1][1]
+        indices["selic"] = f"{val:g}%"
     except Exception as e:
         print(f"Error fetching Selic: {e}")
 
@@ -51,33 +46,25 @@ def get_economic_indices():
     # 3. Poupanca (BCB Serie 195 - % a.m.) -> Accumulate last 12 months for Annual Yield
     try:
          # Fetch last 12 months
-         url_poup = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.195/dados/ultimos/12?formato=json"
-         r = requests.get(url_poup, timeout=5)
-         if r.status_code == 200:
-             data = r.json()
-             if len(data) >= 12:
-                 acc = 1.0
-                 for item in data:
-                     val_str = item['valor']
-                     val = float(val_str)
-                     acc *= (1 + val/100)
-                 
-                 final_yield = (acc - 1) * 100
-                 indices["poupanca"] = f"{final_yield:.2f}%"
-             else:
-                 # Fallback if less than 12 months (e.g. API error or new series)
-                 indices["poupanca"] = "6.17% + TR"
+         data = sgs_client.latest(sgs_client.POUPANCA_MONTH, 12)
+         if len(data) >= 12:
+             acc = 1.0
+             for _, val in data:
+                 acc *= (1 + val/100)
+             
+             final_yield = (acc - 1) * 100
+             indices["poupanca"] = f"{final_yield:.2f}%"
+         else:
+             # Fallback if less than 12 months (e.g. API error or new series)
+             indices["poupanca"] = "6.17% + TR"
     except Exception as e:
          print(f"Error fetching Poupanca: {e}")
          indices["poupanca"] = "6.17% + TR"
 
     # 4. IPCA 12 Meses (BCB Serie 13522)
     try:
-         url_ipca = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.13522/dados/ultimos/1?formato=json"
-         r = requests.get(url_ipca, timeout=5)
-         if r.status_code == 200:
-             val = r.json()[0]['valor']
-             indices["ipca"] = f"{val}%"
+         val = sgs_client.latest(sgs_client.IPCA_12M, 1)[-1][1]
+         indices["ipca"] = f"{val:g}%"
     except Exception as e:
         print(f"Error fetching IPCA: {e}")
         
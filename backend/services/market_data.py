@@ -1,10 +1,18 @@
-import yfinance as yf
-import requests
+import os
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-import xml.etree.ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from services.cache import cached
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from services import news_feed, sgs_client
+from services.cache import cached, market_hours_ttl, PersistentValueCache
+from services.candle_store import last_write, read_candles, read_frame, sync
+from services.sgs_store import accumulated_index, sync_series
+
+# Comparative chart series: name -> SGS code (accumulated into a base-100 index)
+COMPARATIVE_SGS = {"selic": 11, "poupanca": 196}
+
 
 @cached(ttl_seconds=1800)  # 30 min cache — data is monthly, no need for real-time
 def get_comparative_data(years=5):
@@ -12,153 +20,67 @@ def get_comparative_data(years=5):
     Returns comparative data for the last 'years' (default 5).
     Base 100 for all series.
     Returns None if any of the required series (IBOV, Selic, Poupanca) fails to load.
+
+    IBOV comes from the candle store and Selic / Poupança from the SGS store
+    (services/sgs_store.py): a refresh only downloads what was published since
+    the last one, and the accumulated rate indexes are already stored.
     """
     end_date = datetime.now()
     start_date = end_date - timedelta(days=years*365)
-    
-    # --- Helper fetch functions ---
-    def fetch_ibov():
-        try:
-            print(f"Fetching IBOV from {start_date} to {end_date}")
-            ibov = yf.download("^BVSP", start=start_date, end=end_date, progress=False)
-            if not ibov.empty:
-                # Handle MultiIndex columns (yfinance > 0.2)
-                if isinstance(ibov.columns, pd.MultiIndex):
-                    ibov.columns = ibov.columns.get_level_values(0)
-                
-                col_name = 'Adj Close' if 'Adj Close' in ibov.columns else 'Close'
-                if col_name in ibov.columns:
-                    # Resample to monthly, normalize to 100
-                    monthly = ibov[col_name].resample('ME').last().ffill()
-                    if monthly.empty: return None
-                    first_val = monthly.iloc[0]
-                    
-                    # Normalize
-                    normalized = (monthly / first_val) * 100
-                    return ('IBOV', normalized)
-        except Exception as e:
-            print(f"Error fetching IBOV: {e}")
-        return None
 
-    def fetch_selic():
-        try:
-            print("Fetching Selic...")
-            # Using sgs code 11 (Daily Selic Rate)
-            url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados?formato=json&dataInicial={start_date.strftime('%d/%m/%Y')}&dataFinal={end_date.strftime('%d/%m/%Y')}"
-            r = requests.get(url, timeout=10) # 10s timeout
-            if r.status_code == 200:
-                data = r.json()
-                df = pd.DataFrame(data)
-                df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y')
-                df['valor'] = pd.to_numeric(df['valor'])
-                df = df.set_index('data').sort_index()
-                df = df[df.index >= start_date]
-                
-                # Accumulate: (1 + rate/100).cumprod()
-                # Daily rate is %, so /100.
-                factor = 1 + (df['valor'] / 100)
-                accumulated = 100 * factor.cumprod()
-                
-                # Resample to monthly end
-                resampled = accumulated.resample('ME').last()
-                return ('Selic', resampled)
-        except Exception as e:
-            print(f"Error fetching Selic: {e}")
-        return None
-
-    def fetch_poupanca():
-        try:
-            print("Fetching Poupanca...")
-            # BCB Code 196 = Poupança - rendimento mês
-            url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.196/dados?formato=json&dataInicial={start_date.strftime('%d/%m/%Y')}&dataFinal={end_date.strftime('%d/%m/%Y')}"
-            r = requests.get(url, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                df = pd.DataFrame(data)
-                df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y')
-                df['valor'] = pd.to_numeric(df['valor'])
-                df = df.set_index('data').sort_index()
-                df = df[df.index >= start_date]
-                
-                # Accumulate monthly yield
-                monthly_rates = df['valor'].resample('MS').first().ffill()
-                factor = 1 + (monthly_rates / 100)
-                accumulated = 100 * factor.cumprod()
-                
-                resampled = accumulated.resample('ME').last()
-                return ('Poupanca', resampled)
-        except Exception as e:
-            print(f"Error fetching Poupanca: {e}")
-        return None
-
-    # --- Parallel execution ---
-    data_frames = {}
+    # Incremental syncs (in parallel: each may be one HTTP round trip)
     with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = [
-            executor.submit(fetch_ibov),
-            executor.submit(fetch_selic),
-            executor.submit(fetch_poupanca),
-        ]
-        for future in as_completed(futures):
+        jobs = [executor.submit(sync, ["^BVSP"], "1d")]
+        jobs += [executor.submit(sync_series, code) for code in COMPARATIVE_SGS.values()]
+        for job in jobs:
             try:
-                result = future.result()
-                if result:
-                    name, series = result
-                    data_frames[name] = series
+                job.result()
             except Exception as e:
-                print(f"Error in future result: {e}")
-
-    # STRICT validation: Ensure ALL 3 are present
-    required_series = ['IBOV', 'Selic', 'Poupanca']
-    keys_present = list(data_frames.keys())
-    print(f"Comparative Data Keys Present: {keys_present}")
-    
-    if not all(k in data_frames for k in required_series):
-        print(f"Missing comparative data. Got: {keys_present}")
-        return None # Return None implies partial data is not accepted
+                print(f"Error syncing comparative series: {e}")
 
-    # Merge DataFrames
+    series = {}
     try:
-        merged = pd.DataFrame(data_frames)
-        print(f"Merged Shape: {merged.shape}")
-        merged = merged.ffill().dropna()
-        merged.index.name = 'Date'
-        merged.reset_index(inplace=True)
-        merged['date'] = merged['Date'].dt.strftime('%Y-%m')
+        ibov = read_frame("^BVSP", "1d", start=start_date, end=end_date)['Close']
+        if not ibov.empty:
+            monthly = ibov.resample('ME').last().ffill()
+            series['ibov'] = monthly / monthly.iloc[0] * 100
     except Exception as e:
-        print(f"Error merging frames: {e}")
-        return None
-
-    result = []
-    for _, row in merged.iterrows():
-        item = {
-            "date": row['date'],
-            "ibov": round(row.get('IBOV', 0), 2),
-            "selic": round(row.get('Selic', 0), 2),
-            "poupanca": round(row.get('Poupanca', 0), 2)
-        }
-        result.append(item)
+        print(f"Error reading IBOV: {e}")
+    for name, code in COMPARATIVE_SGS.items():
+        try:
+            index = accumulated_index(code, start_date, end_date)
+            if not index.empty:
+                series[name] = index.resample('ME').last()
+        except Exception as e:
+            print(f"Error reading SGS {code}: {e}")
 
-    return result
+    # STRICT validation: Ensure ALL 3 are present
+    if len(series) < 1 + len(COMPARATIVE_SGS):
+        print(f"Missing comparative data. Got: {list(series)}")
+        return None # Return None implies partial data is not accepted
+
+    merged = pd.DataFrame(series).ffill().dropna().round(2)
+    merged.insert(0, 'date', merged.index.strftime('%Y-%m'))
+    return merged[['date', 'ibov', 'selic', 'poupanca']].to_dict('records')
 
 @cached(ttl_seconds=1800)  # 30 min cache
 def get_treasury_etfs():
     """
-    Fetches real-time(ish) data for LFTS11 and LFTB11 using yfinance.
+    Real-time(ish) data for LFTS11 and LFTB11 from the local candle store (synced from yfinance).
     Returns: Price, Yield (12m or inception), Min Investment.
     """
     tickers = ["LFTS11.SA", "LFTB11.SA"]
     data = []
+    sync([t.split('.')[0] for t in tickers], "1d")
     
     for t in tickers:
         name = t.split('.')[0] # LFTS11, Default name
         try:
-            ticker = yf.Ticker(t)
-            hist = ticker.history(period="1y")
+            hist = read_frame(name, "1d", start=datetime.now() - timedelta(days=365))
             
             # Fallback for new funds
             if hist.empty:
-               hist = ticker.history(period="max")
+               hist = read_frame(name, "1d")
             
             if not hist.empty:
                 current_price = hist['Close'].iloc[-1]
@@ -234,225 +156,235 @@ def get_treasury_etfs():
             
     return data
 
-def get_market_indicators():
-    """
-    Fetches major market indicators: Selic, IPCA, Dollar, Bitcoin.
-    """
-    indicators = {
-        "selic": None,
-        "ipca": None,
-        "dollar": None,
-        "bitcoin": None
-    }
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+INDICATORS_DEADLINE = 3.0   # seconds the dashboard waits for all indicators together
+INDICATORS_TTL = 300
+INDICATORS_STALE_TTL = 30   # retry soon when some value is stale / missing
+INDICATORS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'data', 'indicators_cache.json')
 
-    # 1. Selic (Meta) - BCB Series 432
-    try:
-        url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados?formato=json"
-        r = requests.get(url, headers=headers, timeout=2) # Reduced timeout
-        if r.status_code == 200:
-            data = r.json()
-            if data:
-                indicators["selic"] = float(data[-1]['valor'])
-    except Exception as e:
-        print(f"Error fetching Selic: {e}")
-        indicators["selic"] = 12.25 # Fallback
+DOLLAR_SYNC_WAIT = 2.0      # seconds the dollar lookup waits for its own BRL=X sync
 
-    # 2. IPCA (12 Months) - BCB Series 13522
-    try:
-        url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.13522/dados?formato=json"
-        r = requests.get(url, headers=headers, timeout=2) # Reduced timeout
-        if r.status_code == 200:
-            data = r.json()
-            if data:
-                indicators["ipca"] = float(data[-1]['valor'])
-    except Exception as e:
-        print(f"Error fetching IPCA: {e}")
-        if not indicators["ipca"]: indicators["ipca"] = 4.50
+_indicator_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="indicators")
+_last_good = None           # PersistentValueCache of the last successfully fetched values (stale-if-error)
+_last_good_lock = threading.Lock()
+_dollar_sync = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dollar-sync")
+_dollar_job = None
+_dollar_lock = threading.Lock()
 
-    # 3. Dollar (BRL=X)
-    try:
-        dollar_ticker = yf.Ticker("BRL=X")
-        # Use fast info or short history
-        dollar_hist = dollar_ticker.history(period="1d")
-        if not dollar_hist.empty:
-            indicators["dollar"] = round(float(dollar_hist['Close'].iloc[-1]), 2)
-    except Exception as e:
-        print(f"Error fetching Dollar: {e}")
-        indicators["dollar"] = 5.00 # Fallback
 
-    # 4. Bitcoin (Removed per request)
-    indicators["bitcoin"] = None
+class StaleIndicator(Exception):
+    """Raised by a fetcher whose value (possibly None) is known to be out of date."""
 
-    return indicators
+    def __init__(self, value, reason):
+        super().__init__(reason)
+        self.value = value
+
+
+def _last_good_cache():
+    # On disk, so stale-if-error also covers a cold process while BCB / Yahoo are down
+    global _last_good
+    with _last_good_lock:
+        if _last_good is None:
+            os.makedirs(os.path.dirname(INDICATORS_FILE), exist_ok=True)
+            _last_good = PersistentValueCache(persist_file=INDICATORS_FILE)
+        return _last_good
+
+
+def _fetch_selic():
+    # Selic (Meta) - BCB Series 432, ultimos/1 through the shared SGS client
+    return sgs_client.latest(sgs_client.SELIC_META, 1, timeout=2, retries=1)[-1][1]
+
+
+def _fetch_ipca():
+    # IPCA (12 Months) - BCB Series 13522
+    return sgs_client.latest(sgs_client.IPCA_12M, 1, timeout=2, retries=1)[-1][1]
+
+
+def _dollar_age():
+    written = last_write("BRL=X", "1d")
+    return float("inf") if written is None else time.time() - written
+
+
+def _fetch_dollar():
+    # Dollar (BRL=X) from the candle store. When it was not synced within the quotes
+    # TTL, a sync runs on its own thread (one at a time) and is waited for at most
+    # DOLLAR_SYNC_WAIT, so a hung download never holds an indicators worker
+    global _dollar_job
+    max_age = _quotes_ttl([])
+    if _dollar_age() > max_age:
+        with _dollar_lock:
+            if _dollar_job is None or _dollar_job.done():
+                _dollar_job = _dollar_sync.submit(sync, ["BRL=X"], "1d")
+            job = _dollar_job
+        try:
+            job.result(timeout=DOLLAR_SYNC_WAIT)
+        except Exception as e:
+            print(f"[INDICATORS] BRL=X sync not finished: {e or 'timeout'}")
+
+    dollar_close = read_candles("BRL=X", "1d")["close"]
+    value = round(float(dollar_close[-1]), 2) if len(dollar_close) else None
+    age = _dollar_age()
+    if value is None or age > max_age:
+        raise StaleIndicator(value, "no BRL=X bars stored" if value is None else f"BRL=X last synced {age:.0f}s ago")
+    return value
 
-def get_rss_news(limit=20, topic='BRASIL'):
+
+INDICATOR_FETCHERS = {"selic": _fetch_selic, "ipca": _fetch_ipca, "dollar": _fetch_dollar}
+
+
+def _remember(name):
+    """Done-callback: keeps a successful value, even one that missed the deadline, for later requests."""
+    def callback(job):
+        if job.exception() is None and job.result() is not None:
+            _last_good_cache().get_or_update("indicators", name, job.result())
+    return callback
+
+
+def _indicators_ttl(indicators):
+    return INDICATORS_STALE_TTL if indicators.get("stale") else INDICATORS_TTL
+
+
+@cached(ttl_seconds=_indicators_ttl)
+def get_market_indicators(deadline=INDICATORS_DEADLINE):
     """
-    Fetches finance news from Google News RSS.
-    Topic: 'BRASIL' or 'MUNDO'
-    Uses 'when:7d' to restrict results to the last 7 days.
+    Fetches major market indicators: Selic, IPCA, Dollar (Bitcoin kept as None).
+    The lookups run concurrently under one overall deadline; an indicator that
+    fails or misses it is served from its last good value, persisted across
+    restarts (stale-if-error), and listed in "stale" (None only when it was
+    never fetched on this machine). A fetcher may also return an out-of-date
+    value (StaleIndicator, e.g. a dollar the quotes sync could not refresh):
+    it is served as is, and listed in "stale" too.
     """
-    news_items = []
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        
-        if topic == 'MUNDO':
-            # Focused query: world economy/finance + recency filter (scoring=n for newest)
-            url = "https://news.google.com/rss/search?q=economia+mundial+OR+mercados+internacionais+OR+wall+street+OR+fed+OR+bolsas+globais+when:7d&hl=pt-BR&gl=BR&ceid=BR:pt-419&scoring=n"
-        else:
-            # Brasil: focused on Brazilian financial market + recency filter (scoring=n for newest)
-            url = "https://news.google.com/rss/search?q=mercado+financeiro+brasil+OR+ibovespa+OR+selic+OR+bolsa+brasileira+when:7d&hl=pt-BR&gl=BR&ceid=BR:pt-419&scoring=n"
+    jobs = {}
+    for name, fetch in INDICATOR_FETCHERS.items():
+        jobs[name] = _indicator_pool.submit(fetch)
+        jobs[name].add_done_callback(_remember(name))
+    wait(jobs.values(), timeout=deadline)
 
-        r = requests.get(url, headers=headers, timeout=5)
-        if r.status_code == 200:
-            try:
-                root = ET.fromstring(r.content)
-            except:
-                root = ET.fromstring(r.text)
-
-            # Date cutoff: reject articles older than 7 days
-            from email.utils import parsedate_to_datetime
-            cutoff = datetime.now() - timedelta(days=7)
-
-            for item in root.findall('.//item'):
-                title = item.find('title').text if item.find('title') is not None else "Sem título"
-                link = item.find('link').text if item.find('link') is not None else "#"
-                pubDate = item.find('pubDate').text if item.find('pubDate') is not None else ""
-                source = item.find('source').text if item.find('source') is not None else "Google News"
-                
-                # Filter out old articles
-                if pubDate:
-                    try:
-                        article_date = parsedate_to_datetime(pubDate)
-                        if article_date.replace(tzinfo=None) < cutoff:
-                            continue  # Skip old articles
-                    except:
-                        pass  # If we can't parse date, include the article
-                
-                # Simple cleanup
-                if " - " in title:
-                    parts = title.rsplit(" - ", 1)
-                    title = parts[0]
-                
-                # Extract Image from description if available
-                image_url = None
-                description = item.find('description').text if item.find('description') is not None else ""
-                
-                if description:
-                    import re
-                    img_match = re.search(r'src="([^"]+)"', description)
-                    if img_match:
-                        image_url = img_match.group(1)
-                
-                news_items.append({
-                    "title": title,
-                    "link": link,
-                    "date": pubDate,
-                    "source": source,
-                    "image": image_url,
-                    "category": topic
-                })
+    indicators = {"selic": None, "ipca": None, "dollar": None, "bitcoin": None, "stale": []}
+    for name, job in jobs.items():
+        if job.done() and job.exception() is None:
+            indicators[name] = job.result()
+            continue
+        reason = job.exception() if job.done() else f"no answer in {deadline:g}s"
+        print(f"Error fetching {name}: {reason}")
+        if isinstance(reason, StaleIndicator) and reason.value is not None:
+            indicators[name] = reason.value
+        else:
+            indicators[name] = _last_good_cache().get_or_update("indicators", name, None)
+        indicators["stale"].append(name)
+    return indicators
 
-    except Exception as e:
-        print(f"Error fetching RSS ({topic}): {e}")
-    
-    # Sort by date, newest first
-    from email.utils import parsedate_to_datetime as _parse_date
-    def _sort_key(item):
-        try:
-            return _parse_date(item['date'])
-        except:
-            return datetime.min
-    news_items.sort(key=_sort_key, reverse=True)
-    
-    return news_items[:limit]
+def get_rss_news(limit=20, topic='BRASIL', since=None):
+    """
+    Finance news from Google News RSS (last 7 days), newest first.
+    Topic: 'BRASIL' or 'MUNDO'. Served from the buffers the background news
+    poller keeps (services/news_feed.py); with `since`, only newer items
+    (oldest first, so repeated polls never skip any).
+    """
+    items, _ = news_feed.get_news(topic, limit, since)
+    return items
 
 def get_home_news_highlights():
     """
-    Fetches 2 news from Brasil and 2 from Mundo for the Home screen.
+    Fetches 2 news from Brasil and 2 from Mundo for the Home screen
+    (sliced from the poller's buffers).
+    """
+    return get_rss_news(limit=2, topic='BRASIL') + get_rss_news(limit=2, topic='MUNDO')
+
+QUOTE_TICKERS = {
+    "^BVSP": "IBOV",
+    "BRL=X": "Dólar",
+    "BTC-USD": "Bitcoin",
+    "EURBRL=X": "Euro",
+    "GBPBRL=X": "Libra"
+}
+
+# Variation name -> bars back (1 week ~ 5 trading days, 1 month ~ 21)
+QUOTE_LAGS = {"change_1d": 1, "change_1w": 5, "change_1m": 21}
+
+
+def _stored_closes(tickers, days=100):
     """
-    brasil = get_rss_news(limit=2, topic='BRASIL')
-    mundo = get_rss_news(limit=2, topic='MUNDO')
-    return brasil + mundo
+    Close prices (dates x tickers) from the candle store. sync() groups the
+    tickers by last stored bar, so refreshing them is one batched Yahoo
+    download of the new bars only.
+    """
+    sync(list(tickers), "1d")
+    start = datetime.now() - timedelta(days=days)
+    closes = {t: read_frame(t, "1d", start=start)['Close'] for t in tickers}
+    return pd.DataFrame(closes).reindex(columns=list(tickers))
+
+
+def quote_variations(closes, lags=QUOTE_LAGS):
+    """
+    Last close and % variations per column of a (dates x tickers) close frame.
+    Columns trade on different calendars (BTC on weekends, IBOV not), so each
+    column's valid values are first pushed to the bottom; lag k then reads
+    row -1-k, or the column's first value when its history is shorter.
+    """
+    values = closes.to_numpy(dtype=float)
+    n_rows = len(values)
+    valid = np.isfinite(values)
+    counts = valid.sum(axis=0)
+    # Stable sort on the mask: NaNs first, valid values last in date order
+    packed = np.take_along_axis(values, np.argsort(valid, axis=0, kind='stable'), axis=0)
+
+    cols = np.arange(values.shape[1])
+    last = packed[-1] if n_rows else np.full(len(cols), np.nan)
+    result = {"price": np.where(counts > 0, last, np.nan)}
+    for name, k in lags.items():
+        back = np.minimum(k, np.maximum(counts - 1, 0))
+        base = packed[n_rows - 1 - back, cols] if n_rows else np.full(len(cols), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (last - base) / base * 100
+        result[name] = np.where(np.isfinite(change), change, 0.0)
+    return result
+
+
+def _quotes_ttl(quotes):
+    # Failed fetches are retried soon; otherwise 1 min in session, 15 min outside
+    if any(q.get('error') for q in quotes):
+        return 30
+    return market_hours_ttl(60, 900)
 
+
+@cached(ttl_seconds=_quotes_ttl)
 def get_general_quotes():
     """
     Fetches major market indicators: IBOV, Dollar, Bitcoin, Euro, Libra.
     Returns a list of dicts with price and variations (1D, 1W, 1M).
     """
-    quotes = []
-    
-    # Tickers mapping
-    tickers = {
-        "^BVSP": "IBOV",
-        "BRL=X": "Dólar",
-        "BTC-USD": "Bitcoin",
-        "EURBRL=X": "Euro",
-        "GBPBRL=X": "Libra"
-    }
-
     try:
-        for ticker, name in tickers.items():
-            try:
-                t = yf.Ticker(ticker)
-                # Fetch 3 months to ensure we have enough data for 1M variation
-                # 1 month ~ 21 trading days. 3mo is safe.
-                hist = t.history(period="3mo")
-                
-                if not hist.empty:
-                    current = hist['Close'].iloc[-1]
-                    
-                    # 1 Day Variation (Previous Close)
-                    price_1d = hist['Close'].iloc[-2] if len(hist) >= 2 else current
-                    change_1d = ((current - price_1d) / price_1d) * 100 if price_1d else 0.0
-                    
-                    # 1 Week Variation (approx 5 trading days)
-                    price_1w = hist['Close'].iloc[-6] if len(hist) >= 6 else (hist['Close'].iloc[0] if len(hist) > 0 else current)
-                    change_1w = ((current - price_1w) / price_1w) * 100 if price_1w else 0.0
-
-                    # 1 Month Variation (approx 21 trading days)
-                    price_1m = hist['Close'].iloc[-22] if len(hist) >= 22 else (hist['Close'].iloc[0] if len(hist) > 0 else current)
-                    change_1m = ((current - price_1m) / price_1m) * 100 if price_1m else 0.0
-                    
-                    quotes.append({
-                        "id": ticker,
-                        "name": name,
-                        "price": current,
-                        "change": change_1d,      # Backward compatibility / Default
-                        "change_1d": change_1d,
-                        "change_1w": change_1w,
-                        "change_1m": change_1m
-                    })
-                else:
-                    quotes.append({
-                        "id": ticker,
-                        "name": name,
-                        "price": 0.0,
-                        "change": 0.0,
-                        "change_1d": 0.0,
-                        "change_1w": 0.0,
-                        "change_1m": 0.0,
-                        "error": True
-                    })
-            except Exception as e:
-                print(f"Error fetching {ticker}: {e}")
-                quotes.append({
-                    "id": ticker,
-                    "name": name,
-                    "price": 0.0,
-                    "change": 0.0,
-                    "change_1d": 0.0,
-                    "change_1w": 0.0,
-                    "change_1m": 0.0,
-                    "error": True
-                })
-
+        closes = _stored_closes(QUOTE_TICKERS)
     except Exception as e:
         print(f"Error in get_general_quotes: {e}")
+        closes = pd.DataFrame(columns=list(QUOTE_TICKERS))
 
+    stats = quote_variations(closes)
+    quotes = []
+    for j, (ticker, name) in enumerate(QUOTE_TICKERS.items()):
+        price = stats["price"][j]
+        if not np.isfinite(price):
+            print(f"Error fetching {ticker}: no data")
+            quotes.append({
+                "id": ticker,
+                "name": name,
+                "price": 0.0,
+                "change": 0.0,
+                "change_1d": 0.0,
+                "change_1w": 0.0,
+                "change_1m": 0.0,
+                "error": True
+            })
+            continue
+        quotes.append({
+            "id": ticker,
+            "name": name,
+            "price": float(price),
+            "change": float(stats["change_1d"][j]),      # Backward compatibility / Default
+            "change_1d": float(stats["change_1d"][j]),
+            "change_1w": float(stats["change_1w"][j]),
+            "change_1m": float(stats["change_1m"][j])
+        })
     return quotes
@@ -0,0 +1,60 @@
+"""
+Market movers (biggest gainers / losers / dividend payers) of the BASE snapshot.
+
+Built from the typed screener table (services/screener.py), so percentages are
+parsed once per snapshot; each list is a heapq.nlargest / nsmallest over the
+parsed column (O(n log k)) and the payload is cached per snapshot and query,
+so serving it costs the same no matter how many clients ask.
+"""
+import heapq
+
+import numpy as np
+
+from services.cache import snapshot_cached
+from services.screener import get_stock_table
+
+MAX_N = 50
+
+# list name -> (column, largest first?)
+MOVER_LISTS = {
+    "highs": ("change_day", True),
+    "lows": ("change_day", False),
+    "dividends": ("dividend", True),
+    "month_highs": ("var_1m", True),
+    "month_lows": ("var_1m", False),
+    "year_highs": ("var_12m", True),
+    "year_lows": ("var_12m", False),
+}
+
+
+def _pick(values, rows, n, largest):
+    """Indices of the n largest / smallest finite values among rows."""
+    rows = [i for i in rows if np.isfinite(values[i])]
+    select = heapq.nlargest if largest else heapq.nsmallest
+    return select(n, rows, key=values.__getitem__)
+
+
+def _mover(table, i):
+    row = table.rows[i].copy()
+    # Percent numbers (2.5 = +2.5%), as the endpoint has always returned
+    row['var_val'] = round(float(np.nan_to_num(table.num['change_day'][i])) * 100, 4)
+    row['dy_val'] = round(float(np.nan_to_num(table.num['dividend'][i])) * 100, 4)
+    return row
+
+
+@snapshot_cached(get_stock_table, max_entries=64)
+def get_market_movers(table, n=5, sector=None):
+    """
+    {list name: top-n stocks} for MOVER_LISTS (day highs / lows, dividend
+    yield, 1-month and 12-month variation), optionally within one sector.
+    """
+    n = max(1, min(int(n), MAX_N))
+    rows = range(len(table))
+    if sector:
+        rows = np.flatnonzero(table.text['sector'] == sector.strip().upper()).tolist()
+
+    result = {}
+    for name, (column, largest) in MOVER_LISTS.items():
+        result[name] = [_mover(table, i) for i in _pick(table.num[column], rows, n, largest)]
+    print(f"[MOVERS] Top {n} over {len(rows)} stocks{f' ({sector})' if sector else ''}.")
+    return result
@@ -0,0 +1,334 @@
+"""
+Google News RSS ingestion for the news endpoints, refreshed in the background.
+
+Each topic (BRASIL, MUNDO, or a per-ticker query such as "TICKER:PETR4") keeps
+a fixed-size ring buffer of items. A background poller thread refreshes every
+topic when it is due (at most one request every FRESHNESS seconds per topic).
+Each refresh is a conditional GET: the feed's ETag / Last-Modified are sent
+back as If-None-Match / If-Modified-Since, so an unchanged feed costs a 304
+with no body. A changed feed is parsed with iterparse (items are cleared as
+soon as they are read), deduplicated by the hash of their link, and its new
+items are appended to the ring; items older than MAX_AGE are dropped.
+
+Items are stored ready to serve: image URL extracted from the description,
+pubDate parsed into "timestamp", and a global increasing "id". Request
+handlers never touch the network: they slice the newest-first view of the
+ring, or ask for the items after a `since` cursor (the largest id they have
+seen; those come oldest first, `limit` at a time, so none is skipped). A
+ticker topic is registered on its first read (served empty until the poller's
+first refresh, which is triggered right away) and dropped once nobody has read
+it for TOPIC_IDLE seconds.
+"""
+import hashlib
+import io
+import itertools
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote_plus
+
+import requests
+
+FEEDS = {
+    # Focused query: world economy/finance + recency filter (scoring=n for newest)
+    "MUNDO": "https://news.google.com/rss/search?q=economia+mundial+OR+mercados+internacionais+OR+wall+street+OR+fed+OR+bolsas+globais+when:7d&hl=pt-BR&gl=BR&ceid=BR:pt-419&scoring=n",
+    # Brasil: focused on Brazilian financial market + recency filter (scoring=n for newest)
+    "BRASIL": "https://news.google.com/rss/search?q=mercado+financeiro+brasil+OR+ibovespa+OR+selic+OR+bolsa+brasileira+when:7d&hl=pt-BR&gl=BR&ceid=BR:pt-419&scoring=n",
+}
+TICKER_FEED = "https://news.google.com/rss/search?q={query}+when:7d&hl=pt-BR&gl=BR&ceid=BR:pt-419&scoring=n"
+TICKER_PREFIX = "TICKER:"
+DEFAULT_TOPIC = "BRASIL"
+FRESHNESS = 300          # seconds between two requests of the same feed
+RETRY_AFTER_ERROR = 30   # seconds before retrying a feed whose last request failed
+MAX_AGE = 7 * 86400      # items older than this are dropped
+MAX_ITEMS = 100          # ring buffer size per topic
+MAX_TICKER_TOPICS = 50
+TOPIC_IDLE = 3600        # ticker topics unread this long stop being polled
+TIMEOUT = 5
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+_IMG_RE = re.compile(r'src="([^"]+)"')
+_TICKER_RE = re.compile(r'^[A-Z0-9]{4,6}$')
+_ids = itertools.count(1)   # item ids (the `since` cursor), increasing across topics
+
+
+class NewsFeedError(ValueError):
+    """Unknown topic / invalid ticker."""
+
+
+def link_hash(link):
+    return hashlib.sha1((link or "").encode("utf-8")).hexdigest()
+
+
+def _timestamp(pub_date):
+    """Unix time of an RSS pubDate, 0 when missing / unparseable (sorted last)."""
+    if not pub_date:
+        return 0
+    try:
+        return int(parsedate_to_datetime(pub_date).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_items(content, topic):
+    """
+    Item dicts of an RSS document, streamed with iterparse: each <item> is
+    turned into a dict (image and timestamp pre-extracted) and cleared right away.
+    """
+    items = []
+    for _, elem in ET.iterparse(io.BytesIO(content), events=("end",)):
+        if elem.tag != "item":
+            continue
+        title = elem.findtext("title") or "Sem título"
+        link = elem.findtext("link") or "#"
+        pub_date = elem.findtext("pubDate") or ""
+        source = elem.findtext("source") or "Google News"
+        description = elem.findtext("description") or ""
+        elem.clear()
+
+        # Simple cleanup: Google News appends " - <source>" to titles
+        if " - " in title:
+            title = title.rsplit(" - ", 1)[0]
+        img_match = _IMG_RE.search(description)
+        items.append({
+            "title": title,
+            "link": link,
+            "date": pub_date,
+            "timestamp": _timestamp(pub_date),
+            "source": source,
+            "image": img_match.group(1) if img_match else None,
+            "category": topic,
+        })
+    return items
+
+
+def topic_key(topic=None, ticker=None):
+    """Canonical topic: a configured feed name, or TICKER:<code> for a ticker."""
+    if ticker:
+        code = str(ticker).strip().upper()
+        if code.endswith(".SA"):
+            code = code[:-3]
+        if not _TICKER_RE.match(code):
+            raise NewsFeedError(f"Invalid ticker: {ticker}")
+        return TICKER_PREFIX + code
+    topic = str(topic or DEFAULT_TOPIC).strip().upper()
+    if topic.startswith(TICKER_PREFIX):
+        return topic_key(ticker=topic[len(TICKER_PREFIX):])
+    return topic if topic in FEEDS else DEFAULT_TOPIC
+
+
+def topic_url(topic):
+    if topic.startswith(TICKER_PREFIX):
+        code = topic[len(TICKER_PREFIX):]
+        return TICKER_FEED.format(query=quote_plus(f'"{code}" ações'))
+    return FEEDS[topic]
+
+
+class _Feed:
+    def __init__(self, topic, url):
+        self.topic = topic
+        self.url = url
+        self.etag = None
+        self.last_modified = None
+        self.next_check = 0.0
+        self.last_read = time.time()
+        self.ring = deque(maxlen=MAX_ITEMS)   # item dicts in arrival (id) order
+        self.seen = set()                     # link hashes in the ring
+        self.items = []                       # newest-first view of the ring (what readers slice)
+        self.lock = threading.Lock()
+
+
+class NewsFeedCache:
+    """Per-topic ring buffers refreshed with conditional GETs."""
+
+    def __init__(self, feeds=None, session=None):
+        self.feeds = {topic: _Feed(topic, url) for topic, url in (feeds or FEEDS).items()}
+        self.fixed = set(self.feeds)
+        self.session = session or requests.Session()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()          # set when a topic needs a refresh right away
+
+    def _feed(self, topic):
+        """Feed of a canonical topic, registering ticker topics on first use."""
+        feed = self.feeds.get(topic)
+        if feed is not None:
+            return feed
+        with self.lock:
+            feed = self.feeds.get(topic)
+            if feed is None:
+                tickers = [t for t in self.feeds if t not in self.fixed]
+                if len(tickers) >= MAX_TICKER_TOPICS:
+                    # Drop the least recently read ticker topic
+                    self.feeds.pop(min(tickers, key=lambda t: self.feeds[t].last_read))
+                feed = self.feeds[topic] = _Feed(topic, topic_url(topic))
+                self.wake.set()
+            return feed
+
+    def due_in(self):
+        """Seconds until the next topic is due (0 when one already is)."""
+        now = time.time()
+        return max(0.0, min((f.next_check for f in list(self.feeds.values())), default=now + FRESHNESS) - now)
+
+    def drop_idle(self):
+        now = time.time()
+        with self.lock:
+            for topic in [t for t, f in self.feeds.items() if t not in self.fixed and now - f.last_read > TOPIC_IDLE]:
+                del self.feeds[topic]
+
+    def refresh(self, topic, force=False):
+        """
+        Brings a topic's ring up to date (at most one request per FRESHNESS
+        unless force). Returns the number of new items; failures are logged and
+        the buffered items stay available.
+        """
+        feed = self._feed(topic)
+        with feed.lock:
+            now = time.time()
+            if not force and now < feed.next_check:
+                return 0
+            headers = dict(HEADERS)
+            if feed.etag:
+                headers['If-None-Match'] = feed.etag
+            if feed.last_modified:
+                headers['If-Modified-Since'] = feed.last_modified
+            try:
+                r = self.session.get(feed.url, headers=headers, timeout=TIMEOUT)
+                if r.status_code == 304:
+                    feed.next_check = now + FRESHNESS
+                    self._expire(feed, now)
+                    return 0
+                r.raise_for_status()
+                parsed = parse_items(r.content, feed.topic)
+            except Exception as e:
+                print(f"[NEWS] Error fetching RSS ({feed.topic}): {e}")
+                feed.next_check = now + RETRY_AFTER_ERROR
+                return 0
+
+            feed.etag = r.headers.get('ETag')
+            feed.last_modified = r.headers.get('Last-Modified')
+            feed.next_check = now + FRESHNESS
+            return self._merge(feed, parsed, now)
+
+    @staticmethod
+    def _merge(feed, parsed, now):
+        cutoff = now - MAX_AGE
+        fresh = {}
+        for item in parsed:
+            key = link_hash(item["link"])
+            if key in feed.seen or key in fresh:
+                continue
+            if item["timestamp"] and item["timestamp"] < cutoff:
+                continue    # old article (undated ones are kept, as before)
+            fresh[key] = item
+        # Oldest first, so ids follow publication order within a batch; only the
+        # newest MAX_ITEMS, none older than a full ring's oldest item (it would be
+        # evicted right away, and come back as "new" on every refresh)
+        batch = sorted(fresh.items(), key=lambda kv: kv[1]["timestamp"])[-MAX_ITEMS:]
+        if len(feed.ring) == feed.ring.maxlen:
+            floor = min(item["timestamp"] for item in feed.ring)
+            batch = [(key, item) for key, item in batch if item["timestamp"] >= floor]
+        for key, item in batch:
+            if len(feed.ring) == feed.ring.maxlen:
+                feed.seen.discard(link_hash(feed.ring[0]["link"]))
+            item["id"] = next(_ids)
+            feed.ring.append(item)
+            feed.seen.add(key)
+        NewsFeedCache._expire(feed, now)
+        return len(batch)
+
+    @staticmethod
+    def _expire(feed, now):
+        """Drops items older than MAX_AGE and rebuilds the newest-first view."""
+        cutoff = now - MAX_AGE
+        if any(item["timestamp"] and item["timestamp"] < cutoff for item in feed.ring):
+            kept = [item for item in feed.ring if not item["timestamp"] or item["timestamp"] >= cutoff]
+            feed.ring = deque(kept, maxlen=MAX_ITEMS)
+            feed.seen = {link_hash(item["link"]) for item in kept}
+        feed.items = sorted(feed.ring, key=lambda item: (item["timestamp"], item["id"]), reverse=True)
+
+    def items(self, topic, limit=20, since=None):
+        """
+        Buffered items of a canonical topic and the cursor to pass back as
+        `since`, as (items, cursor). Never hits the network. Without `since`,
+        the newest `limit` items, newest first. With `since`, the OLDEST `limit`
+        items whose id is greater than it, in ascending id order, so a client
+        that falls more than `limit` items behind catches up over several polls
+        instead of skipping the older ones. Both come from ONE read of the
+        newest-first view (replaced as a whole by each merge), so the cursor
+        never covers items this caller did not get.
+        """
+        feed = self._feed(topic)
+        feed.last_read = time.time()
+        view = feed.items
+        if since is not None:
+            view = sorted((item for item in view if item["id"] > since), key=lambda item: item["id"])
+        view = view[:limit]
+        cursor = max((item["id"] for item in view), default=since or 0)
+        return view, cursor
+
+
+class NewsPoller(threading.Thread):
+    """Daemon thread refreshing every topic of a NewsFeedCache when it is due."""
+
+    def __init__(self, cache):
+        super().__init__(name="news-poller", daemon=True)
+        self.cache = cache
+        self.stopped = threading.Event()
+
+    def run(self):
+        print("[NEWS] Poller started.")
+        while not self.stopped.is_set():
+            self.cache.drop_idle()
+            for topic in list(self.cache.feeds):
+                if self.stopped.is_set():
+                    break
+                try:
+                    self.cache.refresh(topic)
+                except Exception as e:
+                    print(f"[NEWS] Poller error ({topic}): {e}")
+            self.cache.wake.clear()
+            self.cache.wake.wait(self.cache.due_in())
+
+    def stop(self):
+        self.stopped.set()
+        self.cache.wake.set()
+
+
+_news = None
+_poller = None
+_news_lock = threading.Lock()
+
+
+def get_feed_cache():
+    global _news
+    with _news_lock:
+        if _news is None:
+            _news = NewsFeedCache()
+        return _news
+
+
+def start_poller():
+    """Starts the background news poller (once per process)."""
+    global _poller
+    cache = get_feed_cache()
+    with _news_lock:
+        if _poller is None or not _poller.is_alive():
+            _poller = NewsPoller(cache)
+            _poller.start()
+        return _poller
+
+
+def get_news(topic=DEFAULT_TOPIC, limit=20, since=None, ticker=None):
+    """
+    Newest buffered items of a topic ('BRASIL', 'MUNDO') or of a ticker (with
+    `since`: the oldest ones after it, see NewsFeedCache.items), and the
+    cursor for the next poll, as (items, cursor). Never touches the network: the poller
+    is started on first use and fills the buffers in the background.
+    """
+    start_poller()
+    return get_feed_cache().items(topic_key(topic, ticker), limit, since)
@@ -0,0 +1,297 @@
+"""
+Columnar, price-sorted view of the option chain (Opcoes tab).
+
+Built once per snapshot of the Opcoes / BASE sheets: every option row is parsed
+once, joined with its underlying (spot, sigma, valuation targets) and priced by
+the batch Black-Scholes engine. Arrays are sorted by market price, so scanners
+that need "price <= X" get their candidate set with a single bisect.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.cache import snapshot_cached
+from services.indices import get_economic_indices
+from services.bs_engine import bs_batch
+from services.volatility import resolve_sigmas
+from services.sheets import (
+    get_sheet_data, _fetch_all_raw_options, get_business_days,
+    smart_float, parse_price, parse_risk_free
+)
+
+
+class OptionChainIndex:
+    """
+    Parallel numpy arrays (one entry per option), sorted by market price.
+    `rows[i]` is the original (cached, do not mutate) option dict and
+    `stocks[stock_idx[i]]` its underlying stock (-1 when unknown).
+    """
+
+    def __init__(self, options, stocks, r):
+        self.r = r
+        self._lazy_lock = threading.Lock()   # the snapshot is shared by request threads
+        self._by_ticker = None
+        self._american = None
+        self.stocks = list(stocks or [])
+        stocks_map = {s['ticker'].strip().upper(): i for i, s in enumerate(self.stocks)}
+
+        # Per-stock parsed values (computed once per stock, not per option)
+        n_stocks = len(self.stocks)
+        stock_spot = np.zeros(n_stocks)
+        stock_cost = np.zeros(n_stocks)
+        stock_max = np.zeros(n_stocks)
+        stock_falta = np.full(n_stocks, -999.0)
+        stock_sigma = resolve_sigmas(self.stocks) if n_stocks else np.zeros(0)
+        for i, s in enumerate(self.stocks):
+            stock_spot[i] = parse_price(s.get('price', 0.0))
+            stock_cost[i] = parse_price(s.get('min_val', 0.0))
+            stock_max[i] = parse_price(s.get('max_val', 0.0))
+            try:
+                stock_falta[i] = float(s.get('falta_val', -999.0))
+            except (TypeError, ValueError):
+                pass
+
+        options = list(options or [])
+        n = len(options)
+        stock_idx = np.full(n, -1, dtype=np.int64)
+        price = np.zeros(n)
+        strike = np.zeros(n)
+        premium = np.zeros(n)
+        is_call = np.zeros(n, dtype=bool)
+        bdays = np.zeros(n, dtype=np.int64)
+        bdays_by_exp = {}
+
+        for i, opt in enumerate(options):
+            underlying = str(opt.get('underlying', '')).strip().upper()
+            ticker = str(opt.get('ticker', '')).strip().upper()
+            if underlying in stocks_map:
+                stock_idx[i] = stocks_map[underlying]
+            elif ticker[:4] in stocks_map:
+                stock_idx[i] = stocks_map[ticker[:4]]
+
+            try:
+                price[i] = float(opt.get('price_val', 0.0))
+            except (TypeError, ValueError):
+                price[i] = np.nan   # no usable quote: sorted last, never priceable
+            try:
+                premium[i] = float(opt.get('premium_val', 0.0))
+            except (TypeError, ValueError):
+                pass
+            strike[i] = smart_float(opt.get('strike', 0))
+            is_call[i] = 'CALL' in str(opt.get('type', '')).upper()
+
+            exp = opt.get('expiration', '')
+            if exp not in bdays_by_exp:
+                bdays_by_exp[exp] = get_business_days(exp)
+            bdays[i] = bdays_by_exp[exp]
+
+        # Sort every column by market price (stable keeps sheet order on ties, NaN goes last)
+        order = np.argsort(price, kind='stable')
+        self.rows = [options[i] for i in order]
+        self.sheet_pos = order  # original row order (tie-breaker for stable outputs)
+        self.price = price[order]
+        self.strike = strike[order]
+        self.premium = premium[order]
+        self.is_call = is_call[order]
+        self.bdays = bdays[order]
+        self.stock_idx = stock_idx[order]
+
+        has_stock = self.stock_idx >= 0
+        safe_idx = np.where(has_stock, self.stock_idx, 0)
+
+        def gather(arr, fill):
+            if n_stocks == 0:
+                return np.full(n, fill, dtype=float)
+            return np.where(has_stock, arr[safe_idx], fill)
+
+        self.spot = gather(stock_spot, 0.0)
+        self.sigma = gather(stock_sigma, 0.40)
+        self.cost_val = gather(stock_cost, 0.0)
+        self.max_val = gather(stock_max, 0.0)
+        self.falta_val = gather(stock_falta, -999.0)
+        self.T = self.bdays / 252.0
+
+        greeks = bs_batch(self.spot, self.strike, self.T, r, self.sigma, self.is_call)
+        self.bs_price = greeks['price']
+        self.delta = greeks['delta']
+        self.gamma = greeks['gamma']
+        self.vega = greeks['vega']
+        self.theta = greeks['theta']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.edge = np.where(self.bs_price > 0, (self.price - self.bs_price) / self.bs_price, 0.0)
+
+        # Rows that can be priced at all (known stock, live, quoted, positive inputs)
+        self.priceable = (has_stock & (self.bdays > 0) & (self.spot > 0) & (self.strike > 0)
+                          & np.isfinite(self.price))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upto_price(self, max_price):
+        """Number of rows with price <= max_price (rows [0:n] are the candidates)."""
+        return int(np.searchsorted(self.price, max_price, side='right'))
+
+    def find(self, ticker):
+        """Row index of an option ticker (e.g. 'PETRK300'), or -1."""
+        by_ticker = self._by_ticker
+        if by_ticker is None:
+            with self._lazy_lock:
+                if self._by_ticker is None:
+                    self._by_ticker = {str(opt.get('ticker', '')).strip().upper(): i
+                                       for i, opt in enumerate(self.rows)}
+                by_ticker = self._by_ticker
+        return by_ticker.get(str(ticker).strip().upper(), -1)
+
+    def _dividend_schedule(self):
+        """Projected dividends per row as zero-padded (n, m) (years, R$) arrays, or (None, None)."""
+        from datetime import date
+        from services.calendar_service import get_dividend_projections
+
+        tickers = [s['ticker'] for s in self.stocks]
+        try:
+            projections = get_dividend_projections(tickers)
+        except Exception as e:
+            print(f"[OPTION CHAIN] Dividend projections unavailable: {e}")
+            projections = {}
+        m = max((len(v) for v in projections.values()), default=0)
+        if m == 0:
+            return None, None
+
+        today = date.today()
+        stock_times = np.zeros((len(tickers) + 1, m))  # last row: options without a stock
+        stock_amounts = np.zeros((len(tickers) + 1, m))
+        for i, t in enumerate(tickers):
+            for j, (pay_date, amount) in enumerate(projections.get(t.strip().upper(), [])):
+                stock_times[i, j] = np.busday_count(today, pay_date) / 252.0
+                stock_amounts[i, j] = amount
+        return stock_times[self.stock_idx], stock_amounts[self.stock_idx]
+
+    def american_prices(self, rows=None):
+        """
+        American binomial fair value (with projected dividends) for the given
+        rows, or all rows. Computed lazily and kept per snapshot, so each row
+        is priced at most once no matter how many scanners ask for it.
+        """
+        from services.binomial import binomial_batch
+
+        if self._american is None:
+            with self._lazy_lock:
+                if self._american is None:
+                    # Dividend schedule first: _american is published last, once everything it needs exists
+                    self._div_times, self._div_amounts = self._dividend_schedule()
+                    self._american = np.full(len(self), np.nan)
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        todo = rows[np.isnan(self._american[rows])]
+        if len(todo):
+            div_times = div_amounts = None
+            if self._div_times is not None:
+                div_times, div_amounts = self._div_times[todo], self._div_amounts[todo]
+            self._american[todo] = binomial_batch(
+                self.spot[todo], self.strike[todo], self.T[todo], self.r, self.sigma[todo],
+                self.is_call[todo], div_times=div_times, div_amounts=div_amounts
+            )
+        return self._american[rows]
+
+    def model_prices(self, rows, strategy):
+        """Fair value of rows under the strategy's pricer (strategies.strategy_pricer)."""
+        from services.strategies import strategy_pricer
+        if strategy_pricer(strategy) == "binomial":
+            return self.american_prices(rows)
+        return self.bs_price[rows]
+
+    def model_edge(self, rows, strategy):
+        """(market - fair) / fair for rows under the strategy's pricer; 0 where fair <= 0."""
+        fair = self.model_prices(rows, strategy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(fair > 0, (self.price[rows] - fair) / fair, 0.0)
+
+    def decorate(self, i):
+        """Copy of row i with the UI-formatted metrics used across the app."""
+        opt = self.rows[i].copy()
+        delta = float(self.delta[i])
+        opt['delta_val'] = f"{delta:.3f}"
+        opt['bs_price_val'] = f"R$ {float(self.bs_price[i]):.2f}"
+        opt['edge_formatted'] = f"{float(self.edge[i]) * 100:.1f}%"
+        opt['sigma'] = f"{float(self.sigma[i]) * 100:.1f}%"
+        return opt
+
+
+def prefetch_chain_sources():
+    """Warms the three sources in parallel (no-op cost when already cached)."""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        for f in [executor.submit(get_sheet_data),
+                  executor.submit(_fetch_all_raw_options),
+                  executor.submit(get_economic_indices)]:
+            try:
+                f.result()
+            except Exception as e:
+                print(f"[OPTION CHAIN] Prefetch error: {e}")
+
+
+@snapshot_cached(_fetch_all_raw_options, get_sheet_data, get_economic_indices, max_entries=1)
+def get_option_chain(options, stocks, indices):
+    """Returns the OptionChainIndex for the current snapshot (rebuilt only when it changes)."""
+    r = parse_risk_free(indices or {})
+    chain = OptionChainIndex(options, stocks, r)
+    print(f"[OPTION CHAIN] Indexed {len(chain)} options (r={r}).")
+
+    # Pozinho alerts: options that entered the rule since the previous chain
+    try:
+        from services.alerts import on_chain_snapshot
+        on_chain_snapshot(chain)
+    except Exception as e:
+        print(f"[OPTION CHAIN] Could not evaluate alerts: {e}")
+    return chain
+
+
+@snapshot_cached(get_option_chain, max_entries=256)
+def scan_pozinho(chain, max_price=0.05, min_delta=0.01, min_bdays=None, max_bdays=None, option_type=None):
+    """
+    Pozinho scanner: cheap options (price <= max_price) with |delta| >= min_delta,
+    optional business-day window and type filter (CALL / PUT).
+    Grouped by underlying (sorted by ticker), options sorted by strike;
+    {} when the snapshot has no stocks or no options, as the sheet scanner did.
+    """
+    if len(chain) == 0 or not chain.stocks:
+        return {}
+    hi = chain.upto_price(max_price)
+    mask = chain.priceable[:hi] & (np.abs(chain.delta[:hi]) >= min_delta)
+    if min_bdays is not None:
+        mask &= chain.bdays[:hi] >= min_bdays
+    if max_bdays is not None:
+        mask &= chain.bdays[:hi] <= max_bdays
+    if option_type:
+        want_call = option_type.strip().upper() == 'CALL'
+        mask &= chain.is_call[:hi] == want_call
+
+    candidates = np.flatnonzero(mask)
+
+    # Buyer's probability of profit: Monte Carlo, |delta| where it could not be simulated
+    from services.monte_carlo import chain_probabilities
+    mc = chain_probabilities(chain)
+    prob = np.where(np.isfinite(mc['prob_profit']), mc['prob_profit'], np.abs(chain.delta))
+
+    groups = {}
+    for i in candidates:
+        opt = chain.decorate(i)
+        opt['prob_success'] = f"{float(prob[i]) * 100:.1f}%"
+        if np.isfinite(mc['expected_pnl'][i]):
+            opt['expected_pnl'] = f"R$ {float(mc['expected_pnl'][i]):.2f}"
+            opt['prob_touch'] = f"{float(mc['prob_touch'][i]) * 100:.1f}%"
+
+        stock = chain.stocks[chain.stock_idx[i]]
+        group = groups.setdefault(stock['ticker'], {"stock": stock, "options": []})
+        group['options'].append(((chain.strike[i], chain.sheet_pos[i]), opt))
+
+    result_list = []
+    for ticker in sorted(groups):
+        group = groups[ticker]
+        group['options'].sort(key=lambda x: x[0])
+        group['options'] = [opt for _, opt in group['options']]
+        result_list.append(group)
+
+    print(f"[POZINHO] {len(candidates)} options in {len(result_list)} companies "
+          f"(price<={max_price}, |delta|>={min_delta}, scanned {hi}/{len(chain)}).")
+    return result_list
@@ -0,0 +1,201 @@
+"""
+Multi-leg payoff and scenario grid engine.
+
+A position is a list of legs on one underlying: options (from the chain, or
+described by strike/type/expiration) and stock. The P&L of every leg is
+evaluated over a spot x date grid in ONE broadcasted Black-Scholes call with
+shape (legs, dates, spots); the last date row is the first expiry, from which
+breakevens and max gain / loss are derived.
+"""
+from datetime import date, datetime
+
+import numpy as np
+
+from services.bs_engine import bs_batch
+from services.sheets import get_business_days, parse_price
+from services.volatility import resolve_sigma
+
+
+class PayoffError(ValueError):
+    """Invalid position (unknown option, mixed underlyings, no legs...)."""
+
+
+def _number(value, field):
+    """float() of a request field, as a PayoffError (400) when it is not a number."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise PayoffError(f"Invalid {field}: {value!r}")
+    if number != number or number in (float('inf'), float('-inf')):
+        raise PayoffError(f"Invalid {field}: {value!r}")
+    return number
+
+
+def _business_days(expiration):
+    """Business days to a manual leg's expiration ('DD/MM/YYYY' or 'YYYY-MM-DD'), PayoffError if unparseable."""
+    text = str(expiration).strip()
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return get_business_days(text)
+    raise PayoffError(f"Invalid expiration: {expiration!r}")
+
+
+def resolve_legs(legs, chain, underlying=None):
+    """
+    Normalizes request legs into numpy-ready parameters.
+    Option legs: {"ticker": "PETRK300"} (looked up in the chain) or
+                 {"type": "CALL"/"PUT", "strike", "expiration", "premium"}.
+    Stock legs:  {"type": "STOCK", "price": optional}.
+    Common: "side" ("buy"/"sell", default buy), "quantity" (default 1).
+    """
+    resolved = []
+    und = underlying.strip().upper() if underlying else None
+    stocks_map = {s['ticker'].strip().upper(): s for s in chain.stocks}
+
+    for leg in legs:
+        side = str(leg.get('side', 'buy')).lower()
+        if side not in ('buy', 'sell'):
+            raise PayoffError(f"Invalid side: {leg.get('side')}")
+        qty = _number(leg.get('quantity', 1), 'quantity') * (1.0 if side == 'buy' else -1.0)
+        kind = str(leg.get('type', '')).strip().upper()
+
+        if kind == 'STOCK':
+            ticker = str(leg.get('ticker', und or '')).strip().upper()
+            resolved.append({"kind": "STOCK", "ticker": ticker, "qty": qty, "entry": leg.get('price'),
+                             "underlying": ticker})
+            continue
+
+        i = chain.find(leg['ticker']) if leg.get('ticker') else -1
+        if i >= 0:
+            stock = chain.stocks[chain.stock_idx[i]] if chain.stock_idx[i] >= 0 else None
+            resolved.append({
+                "kind": "CALL" if chain.is_call[i] else "PUT",
+                "ticker": chain.rows[i].get('ticker', ''),
+                "qty": qty,
+                "strike": float(chain.strike[i]),
+                "bdays": int(chain.bdays[i]),
+                "expiration": chain.rows[i].get('expiration', ''),
+                "entry": _number(leg['premium'], 'premium') if leg.get('premium') is not None else float(chain.price[i]),
+                "underlying": stock['ticker'].strip().upper() if stock else None,
+            })
+        elif kind in ('CALL', 'PUT') and leg.get('strike') is not None and leg.get('expiration'):
+            resolved.append({
+                "kind": kind,
+                "ticker": leg.get('ticker', ''),
+                "qty": qty,
+                "strike": _number(leg['strike'], 'strike'),
+                "bdays": _business_days(leg['expiration']),
+                "expiration": leg['expiration'],
+                "entry": _number(leg.get('premium', 0.0), 'premium'),
+                "underlying": und,
+            })
+        else:
+            raise PayoffError(f"Option not found in chain: {leg.get('ticker')}")
+
+    if not resolved:
+        raise PayoffError("Position has no legs")
+
+    underlyings = {l['underlying'] for l in resolved if l['underlying']}
+    if und:
+        underlyings.add(und)
+    if len(underlyings) != 1:
+        raise PayoffError(f"All legs must share one underlying (got {sorted(underlyings) or 'none'})")
+    und = underlyings.pop()
+
+    stock = stocks_map.get(und)
+    if not stock:
+        raise PayoffError(f"Underlying not found: {und}")
+    for l in resolved:
+        if l['kind'] != 'STOCK' and (l['bdays'] <= 0 or l['strike'] <= 0):
+            raise PayoffError(f"Expired or invalid option: {l['ticker']}")
+    return und, stock, resolved
+
+
+def compute_payoff(legs, chain, underlying=None, spot_points=200, date_points=30,
+                   spot_range=0.30, sigma=None, r=None):
+    """
+    P&L grid for a multi-leg position.
+    Spot axis: spot_points prices in [S0*(1-spot_range), S0*(1+spot_range)].
+    Date axis: date_points business days from today to the first option expiry.
+    """
+    und, stock, resolved = resolve_legs(legs, chain, underlying)
+
+    S0 = parse_price(stock.get('price', 0.0))
+    if S0 <= 0:
+        raise PayoffError(f"No spot price for {und}")
+    sigma = _number(sigma, 'sigma') if sigma else resolve_sigma(stock)
+    r = _number(r, 'r') if r is not None else chain.r
+
+    spot_points = int(min(max(_number(spot_points, 'spot_points'), 2), 2000))
+    date_points = int(min(max(_number(date_points, 'date_points'), 1), 500))
+    spot_range = _number(spot_range, 'spot_range')
+    spots = np.linspace(S0 * max(1.0 - spot_range, 0.0), S0 * (1.0 + spot_range), spot_points)
+
+    is_option = np.array([l['kind'] in ('CALL', 'PUT') for l in resolved])
+    is_call = np.array([l['kind'] == 'CALL' for l in resolved])
+    qty = np.array([l['qty'] for l in resolved])
+    strike = np.array([l.get('strike', 0.0) for l in resolved])
+    bdays = np.array([l.get('bdays', 0) for l in resolved], dtype=float)
+    for l in resolved:
+        if l['kind'] == 'STOCK':
+            l['entry'] = S0 if l['entry'] is None else _number(l['entry'], 'price')
+    entry = np.array([l['entry'] for l in resolved])
+
+    # Date axis (business days elapsed); last row = first option expiry
+    horizon = int(bdays[is_option].min()) if is_option.any() else 0
+    elapsed = np.unique(np.linspace(0, horizon, date_points + 1).round().astype(int)) if horizon > 0 else np.array([0])
+
+    # Shapes: legs (L,1,1) x dates (1,D,1) x spots (1,1,N)
+    T = np.maximum(bdays[:, None, None] - elapsed[None, :, None], 0.0) / 252.0
+    values = bs_batch(spots[None, None, :], strike[:, None, None], T, r, sigma, is_call[:, None, None])['price']
+    values = np.where(is_option[:, None, None], values, spots[None, None, :])
+    pnl_legs = qty[:, None, None] * (values - entry[:, None, None])
+    grid = pnl_legs.sum(axis=0)               # (dates, spots)
+    at_expiry = grid[-1]
+
+    # Breakevens: sign changes of the expiry curve (linear interpolation)
+    s = np.sign(at_expiry)
+    cross = np.flatnonzero(s[:-1] * s[1:] < 0)
+    x0, x1 = spots[cross], spots[cross + 1]
+    y0, y1 = at_expiry[cross], at_expiry[cross + 1]
+    breakevens = (x0 - y0 * (x1 - x0) / (y1 - y0)).tolist()
+    breakevens += spots[at_expiry == 0].tolist()
+
+    # Unbounded upside/downside: P&L slope for S -> inf (calls & stock move 1:1)
+    slope_up = float(np.sum(qty[~is_option]) + np.sum(qty[is_option & is_call]))
+    # Extremes are not limited to the displayed grid: the expiry curve bends only at
+    # the strikes, so it is also evaluated at S=0, at every strike and beyond the largest
+    T_h = np.maximum(bdays - horizon, 0.0) / 252.0
+    top = max(float(strike.max()), S0)
+    probe = np.unique(np.concatenate([[1e-12], strike[is_option], [top * 2.0]]))
+    probe_values = bs_batch(probe[None, :], strike[:, None], T_h[:, None], r, sigma, is_call[:, None])['price']
+    probe_values = np.where(is_option[:, None], probe_values, probe[None, :])
+    at_probe = qty @ (probe_values - entry[:, None])
+
+    max_gain = max(float(at_expiry.max()), float(at_probe.max()))
+    max_loss = min(float(at_expiry.min()), float(at_probe.min()))
+
+    today = np.datetime64(date.today(), 'D')
+    dates = [str(np.busday_offset(today, int(k), roll='forward')) for k in elapsed]
+
+    return {
+        "underlying": und,
+        "spot": S0,
+        "sigma": sigma,
+        "r": r,
+        "legs": resolved,
+        "net_premium": float(-np.sum(qty[is_option] * entry[is_option])),
+        "spots": np.round(spots, 4).tolist(),
+        "dates": dates,
+        "days": elapsed.tolist(),
+        "pnl_grid": np.round(grid, 4).tolist(),
+        "expiry": {"date": dates[-1], "pnl": np.round(at_expiry, 4).tolist()},
+        "breakevens": sorted(round(b, 4) for b in breakevens),
+        "max_gain": None if slope_up > 0 else round(max_gain, 4),
+        "max_loss": None if slope_up < 0 else round(max_loss, 4),
+        "max_gain_unbounded": slope_up > 0,
+        "max_loss_unbounded": slope_up < 0,
+    }
@@ -0,0 +1,144 @@
+"""
+Top-K ranking of the option chain.
+
+Candidates come from the strategy entry rules (services/strategies.py) applied
+as one mask over the columnar OptionChainIndex; the best K are picked with
+np.argpartition (O(n)) and only those K are sorted and formatted, so a query
+returns K rows instead of every valid option.
+"""
+import numpy as np
+
+from services.cache import snapshot_cached
+from services.option_chain import get_option_chain
+from services.strategies import STRATEGIES, rule_mask, strategy_pricer
+
+METRICS = ("edge", "yield", "probability", "score")
+MAX_K = 500
+
+
+def strategy_mask(chain, strategy):
+    """Rows of the chain that pass the strategy's entry rules."""
+    return chain.priceable & rule_mask(
+        strategy, chain.price, chain.strike, chain.spot, chain.bdays, chain.is_call,
+        chain.premium, delta=chain.delta,
+        falta=chain.falta_val, cost_val=chain.cost_val, max_val=chain.max_val
+    )
+
+
+def _side_probability(chain, sell):
+    """Probability of profit for the side (Monte Carlo, delta where not simulated)."""
+    from services.monte_carlo import chain_probabilities
+    mc = chain_probabilities(chain)
+    buy = np.where(np.isfinite(mc["prob_profit"]), mc["prob_profit"], np.abs(chain.delta))
+    return 1.0 - buy if sell else buy
+
+
+def metric_values(chain, metric, strategy, rows=None):
+    """
+    Ranking key per row, oriented so that higher is always better for the
+    strategy's side (sellers want rich premium / positive edge, buyers cheap).
+    The edge is taken against the strategy's pricer; when that is the
+    (costlier) binomial lattice only `rows` are priced and the rest are NaN.
+    """
+    spec = STRATEGIES[strategy]
+    sell = spec["side"] == "sell"
+
+    if metric == "edge":
+        if strategy_pricer(strategy) == "binomial":
+            edge = np.full(len(chain), np.nan)
+            rows = np.arange(len(chain)) if rows is None else rows
+            edge[rows] = chain.model_edge(rows, strategy)
+        else:
+            edge = chain.edge
+        return edge if sell else -edge
+    if metric == "yield":
+        return chain.premium if sell else -chain.premium
+    if metric == "probability":
+        return _side_probability(chain, sell)
+    if metric == "score":
+        # Monte Carlo expected P&L per unit of capital at risk
+        from services.monte_carlo import chain_probabilities
+        pnl = chain_probabilities(chain)["expected_pnl"]
+        pnl = -pnl if sell else pnl
+        capital = {"premium": chain.price, "strike": chain.strike, "spot": chain.spot}[spec["capital"]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(capital > 0, pnl / capital, np.nan)
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def top_k(values, candidates, k):
+    """Indices (into the chain) of the k best candidates, best first. NaN never ranks."""
+    candidates = candidates[np.isfinite(values[candidates])]
+    if len(candidates) == 0 or k <= 0:
+        return candidates[:0]
+    keys = -values[candidates]
+    if len(candidates) > k:
+        part = np.argpartition(keys, k - 1)[:k]
+        candidates, keys = candidates[part], keys[part]
+    return candidates[np.argsort(keys, kind="stable")]
+
+
+def top_k_per_group(values, candidates, groups, k):
+    """{group: indices of its k best candidates, best first}."""
+    candidates = candidates[np.isfinite(values[candidates])]
+    if len(candidates) == 0 or k <= 0:
+        return {}
+    g = groups[candidates]
+    order = np.lexsort((-values[candidates], g))
+    candidates, g = candidates[order], g[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    rank = np.arange(len(g)) - np.repeat(starts, np.diff(np.r_[starts, len(g)]))
+    keep = rank < k
+    result = {}
+    for gid, i in zip(g[keep], candidates[keep]):
+        result.setdefault(int(gid), []).append(int(i))
+    return result
+
+
+def _row(chain, i, metric, value, prob, strategy):
+    opt = chain.decorate(i)
+    if strategy_pricer(strategy) == "binomial":
+        fair = float(chain.american_prices([i])[0])
+        opt['american_price_val'] = f"R$ {fair:.2f}"
+        opt['edge_formatted'] = f"{float(chain.model_edge([i], strategy)[0]) * 100:.1f}%"
+    opt['stock_ticker'] = chain.stocks[chain.stock_idx[i]]['ticker']
+    opt['metric'] = metric
+    opt['metric_value'] = round(float(value), 6)
+    opt['prob_success'] = f"{float(prob) * 100:.1f}%"
+    return opt
+
+
+@snapshot_cached(get_option_chain, max_entries=128)
+def rank_opportunities(chain, strategy, metric="edge", k=20, per_stock=None):
+    """
+    Best k options of the chain for a strategy by metric (edge / yield /
+    probability / score); with per_stock, also the best per_stock per underlying.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    k = max(1, min(int(k), MAX_K))
+
+    candidates = np.flatnonzero(strategy_mask(chain, strategy))
+    values = metric_values(chain, metric, strategy, rows=candidates)
+    prob = _side_probability(chain, STRATEGIES[strategy]["side"] == "sell")
+
+    result = {
+        "strategy": strategy,
+        "metric": metric,
+        "pricer": strategy_pricer(strategy),
+        "k": k,
+        "candidates": int(len(candidates)),
+        "top": [_row(chain, i, metric, values[i], prob[i], strategy) for i in top_k(values, candidates, k)],
+    }
+    if per_stock:
+        per_stock = max(1, min(int(per_stock), MAX_K))
+        groups = top_k_per_group(values, candidates, chain.stock_idx, per_stock)
+        result["by_stock"] = {
+            chain.stocks[gid]['ticker']: [_row(chain, i, metric, values[i], prob[i], strategy) for i in rows]
+            for gid, rows in sorted(groups.items(), key=lambda kv: chain.stocks[kv[0]]['ticker'])
+        }
+
+    print(f"[RANKING] {strategy}/{metric}: top {len(result['top'])} of {len(candidates)} candidates.")
+    return result
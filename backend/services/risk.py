@@ -0,0 +1,190 @@
+"""
+Portfolio Greeks and historical-simulation VaR / expected shortfall.
+
+Positions are stocks and options of the chain (same leg format as the payoff
+endpoint, any number of underlyings). Greeks come from the batch Black-Scholes
+engine at today's spot. For VaR, the daily log returns of every underlying
+over the last `history` stored days (services/candle_store.py, aligned by
+trading day) are the scenarios; h-day scenarios are the overlapping h-day sums.
+All scenarios of all horizons are revalued in ONE broadcast bs_price_batch call
+with shape (scenarios, positions): spot shocked by the underlying's return,
+time to expiry reduced by the horizon, volatility and rate kept.
+"""
+import numpy as np
+
+from services.bs_engine import bs_batch, bs_price_batch
+from services.correlation import aligned_returns
+from services.payoff import PayoffError, resolve_legs
+from services.sheets import parse_price
+from services.volatility import resolve_sigmas
+
+HORIZONS = (1, 10)
+CONFIDENCE = (0.95, 0.99)
+DEFAULT_HISTORY = 500
+MAX_HISTORY = 2500
+MIN_SCENARIOS = 50
+MIN_COVERAGE = 0.90     # share of the window's days an underlying must have a return on
+
+
+class RiskError(ValueError):
+    """Invalid portfolio (unknown ticker, no history...)."""
+
+
+def _resolve_positions(positions, chain):
+    """Leg dicts (see payoff.resolve_legs) for a multi-underlying portfolio."""
+    stocks_map = {s['ticker'].strip().upper(): s for s in chain.stocks}
+    resolved = []
+    for pos in positions:
+        pos = dict(pos)
+        ticker = str(pos.get('ticker', '')).strip().upper()
+        # A BASE ticker that is not an option is a stock position
+        if not pos.get('type') and ticker in stocks_map and chain.find(ticker) < 0:
+            pos['type'] = 'STOCK'
+        try:
+            und, _, legs = resolve_legs([pos], chain, underlying=pos.get('underlying') or (
+                ticker if str(pos.get('type', '')).upper() == 'STOCK' else None))
+        except PayoffError as e:
+            raise RiskError(str(e))
+        except (TypeError, ValueError, KeyError):
+            raise RiskError(f"Invalid position: {pos}")
+        legs[0]['underlying'] = und
+        resolved.extend(legs)
+    if not resolved:
+        raise RiskError("Portfolio has no positions")
+    return resolved, stocks_map
+
+
+def _number(value, field):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RiskError(f"Invalid {field}: {value!r}")
+    if not np.isfinite(number):
+        raise RiskError(f"Invalid {field}: {value!r}")
+    return number
+
+
+def scenario_returns(tickers, history=DEFAULT_HISTORY, horizons=HORIZONS):
+    """
+    ({h: (scenarios, tickers) log returns}, days, coverage) from the last
+    `history` trading days of the union; missing days count as 0 return, and
+    coverage is the share of those days each ticker has a return on. h-day
+    rows are overlapping h-day sums.
+    """
+    days, R, M = aligned_returns(tickers, bars=history)
+    R, M = R[-history:], M[-history:]
+    out = {}
+    cum = np.vstack([np.zeros((1, len(tickers))), np.cumsum(R, axis=0)])
+    for h in horizons:
+        out[h] = cum[h:] - cum[:-h] if len(R) >= h else np.zeros((0, len(tickers)))
+    coverage = M.mean(axis=0) if len(M) else np.zeros(len(tickers))
+    return out, days[-history:], coverage
+
+
+def _var_es(pnl, confidence):
+    """Historical VaR and expected shortfall (positive numbers = losses)."""
+    var = -float(np.quantile(pnl, 1.0 - confidence, method="lower"))
+    tail = pnl[pnl <= -var]
+    return round(var, 2), round(-float(tail.mean()) if len(tail) else var, 2)
+
+
+def portfolio_risk(positions, chain, history=DEFAULT_HISTORY, r=None):
+    """
+    Greeks per position and in total, plus 1-day / 10-day historical VaR and
+    ES at 95% / 99%. Quantities are in units (shares / options), negative or
+    side='sell' for short positions.
+    """
+    legs, stocks_map = _resolve_positions(positions, chain)
+    history = max(MIN_SCENARIOS, min(int(_number(history, 'history')), MAX_HISTORY))
+    r = _number(r, 'r') if r is not None else chain.r
+
+    underlyings = list(dict.fromkeys(l['underlying'] for l in legs))
+    missing = [u for u in underlyings if u not in stocks_map]
+    if missing:
+        raise RiskError(f"Underlying not found: {', '.join(missing)}")
+    und_stocks = [stocks_map[u] for u in underlyings]
+    spot_u = np.array([parse_price(s.get('price', 0.0)) for s in und_stocks])
+    if (spot_u <= 0).any():
+        raise RiskError(f"No spot price for {underlyings[int(np.argmax(spot_u <= 0))]}")
+    sigma_u = resolve_sigmas(und_stocks)
+
+    u_idx = np.array([underlyings.index(l['underlying']) for l in legs])
+    is_option = np.array([l['kind'] in ('CALL', 'PUT') for l in legs])
+    is_call = np.array([l['kind'] == 'CALL' for l in legs])
+    qty = np.array([l['qty'] for l in legs])
+    strike = np.array([l.get('strike', 0.0) for l in legs])
+    bdays = np.array([l.get('bdays', 0) for l in legs], dtype=float)
+    spot, sigma = spot_u[u_idx], sigma_u[u_idx]
+
+    # Greeks at today's spot (stock: delta 1, no other Greeks)
+    g = bs_batch(spot, strike, bdays / 252.0, r, sigma, is_call)
+    value = np.where(is_option, g['price'], spot)
+    delta = np.where(is_option, g['delta'], 1.0) * qty
+    gamma = np.where(is_option, g['gamma'], 0.0) * qty
+    vega = np.where(is_option, g['vega'], 0.0) * qty / 100.0     # per vol point
+    theta = np.where(is_option, g['theta'], 0.0) * qty / 252.0   # per business day
+
+    # Historical scenarios, every horizon in one (scenarios, positions) revaluation
+    scen, days, coverage = scenario_returns(underlyings, history)
+    n_scen = {h: len(scen[h]) for h in HORIZONS}
+    if min(n_scen.values()) < MIN_SCENARIOS:
+        raise RiskError(f"Not enough stored price history ({len(days)} days) for VaR")
+    # An underlying without returns on part of the window would count as flat there
+    # and silently drop out of VaR / ES
+    short = [f"{u} ({coverage[k]:.0%})" for k, u in enumerate(underlyings) if coverage[k] < MIN_COVERAGE]
+    if short:
+        raise RiskError(f"Not enough stored price history over the last {len(days)} days for: "
+                        f"{', '.join(short)}; lower 'history' or sync their candles")
+    shocks = np.vstack([scen[h] for h in HORIZONS])[:, u_idx]                        # (S, P)
+    elapsed = np.concatenate([np.full(n_scen[h], h, dtype=float) for h in HORIZONS])  # (S,)
+    S_scen = spot[None, :] * np.exp(shocks)
+    T_scen = np.maximum(bdays[None, :] - elapsed[:, None], 0.0) / 252.0
+    revalued = np.where(is_option[None, :], bs_price_batch(S_scen, strike, T_scen, r, sigma, is_call), S_scen)
+    pnl = (revalued - value[None, :]) @ qty                                           # (S,)
+
+    var = {}
+    start = 0
+    for h in HORIZONS:
+        block = pnl[start:start + n_scen[h]]
+        start += n_scen[h]
+        var[f"{h}d"] = {}
+        for c in CONFIDENCE:
+            v, es = _var_es(block, c)
+            var[f"{h}d"][f"{int(c * 100)}"] = {"var": v, "es": es}
+
+    rows = []
+    for i, l in enumerate(legs):
+        rows.append({
+            "ticker": l['ticker'], "underlying": l['underlying'], "kind": l['kind'], "quantity": float(qty[i]),
+            "price": round(float(value[i]), 4), "market_value": round(float(value[i] * qty[i]), 2),
+            "delta": round(float(delta[i]), 4), "gamma": round(float(gamma[i]), 6),
+            "vega": round(float(vega[i]), 4), "theta": round(float(theta[i]), 4),
+        })
+    by_underlying = {}
+    for k, u in enumerate(underlyings):
+        m = u_idx == k
+        by_underlying[u] = {
+            "spot": float(spot_u[k]), "sigma": round(float(sigma_u[k]), 4),
+            "delta": round(float(delta[m].sum()), 4),
+            "delta_cash": round(float(delta[m].sum() * spot_u[k]), 2),
+            "gamma": round(float(gamma[m].sum()), 6),
+            "history_coverage": round(float(coverage[k]), 4),
+        }
+
+    return {
+        "positions": rows,
+        "by_underlying": by_underlying,
+        "totals": {
+            "market_value": round(float(value @ qty), 2),
+            "delta_cash": round(float(delta @ spot), 2),
+            "gamma_cash": round(float(gamma @ (spot ** 2) / 100.0), 2),  # delta_cash change for a 1% move
+            "vega": round(float(vega.sum()), 2),
+            "theta": round(float(theta.sum()), 2),
+        },
+        "var": var,
+        "scenarios": n_scen,
+        "history": {"days": int(len(days)),
+                    "from": str(np.datetime64(int(days[0]), "D")) if len(days) else None,
+                    "to": str(np.datetime64(int(days[-1]), "D")) if len(days) else None},
+        "r": r,
+    }
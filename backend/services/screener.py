@@ -0,0 +1,301 @@
+"""
+Server-side stock screener over the BASE snapshot.
+
+The BASE rows are strings formatted for display ("12,5%", "R$ 30,50"), so they
+are parsed ONCE per snapshot into a typed table (one float column per numeric
+field, percentages as fractions, missing values as NaN). Filter expressions
+such as
+
+    roe_val > 0.15 and div_ebit < 2 and falta_val > -15
+
+are parsed with `ast` against a whitelist (field names, numbers, strings,
+comparisons, and / or / not, + - * /) and evaluated as numpy masks over the
+whole table. Common sort columns keep a pre-sorted index, so a single-key
+sort is a filter over that order instead of a new sort.
+"""
+import ast
+import functools
+
+import numpy as np
+
+from services.cache import snapshot_cached
+from services.sheets import get_sheet_data
+
+# BASE fields parsed as numbers ('%' strings become fractions: "12,5%" -> 0.125)
+NUMERIC_FIELDS = (
+    "price", "min_12m", "max_12m", "min_val", "max_val", "falta_val",
+    "dividend", "payout", "change_day", "vol_ano", "last_close",
+    "cagr_luc", "cagr_pat", "cagr_roe", "var_12m", "var_1m",
+    "div_ebit", "div_pl", "roe_val", "roa_val", "roic_val",
+)
+TEXT_FIELDS = ("ticker", "company_name", "sector")
+# Columns with a pre-sorted index (the StockList sort options)
+INDEXED_FIELDS = ("price", "falta_val", "dividend", "change_day", "var_12m", "var_1m",
+                  "roe_val", "div_ebit", "vol_ano")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Caps on user expressions: parsing and evaluation recurse once per nesting level
+MAX_EXPRESSION_LENGTH = 1000
+MAX_EXPRESSION_DEPTH = 32
+
+
+class ScreenerError(ValueError):
+    """Invalid query (unknown field, unsupported syntax, bad sort key...)."""
+
+
+def parse_number(value):
+    """BASE cell -> float ('%' values as fractions); NaN when empty or invalid."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value if value is not None else "").strip()
+    is_pct = "%" in text
+    clean = text.replace("R$", "").replace(" ", "").replace("%", "")
+    if "," in clean and "." in clean:
+        clean = clean.replace(".", "").replace(",", ".")
+    else:
+        clean = clean.replace(",", ".")
+    try:
+        number = float(clean)
+    except ValueError:
+        return np.nan
+    return number / 100.0 if is_pct else number
+
+
+class StockTable:
+    """
+    Typed, columnar view of the BASE rows: `num[field]` float arrays,
+    `text[field]` upper-cased object arrays and `order[field]` ascending
+    argsort (NaN last) for the INDEXED_FIELDS.
+    """
+
+    def __init__(self, stocks):
+        self.rows = list(stocks or [])
+        n = len(self.rows)
+        self.num = {f: np.array([parse_number(s.get(f)) for s in self.rows], dtype=float).reshape(n)
+                    for f in NUMERIC_FIELDS}
+        self.text = {f: np.array([str(s.get(f, "")).strip().upper() for s in self.rows], dtype=object)
+                     for f in TEXT_FIELDS}
+        self.order = {f: np.argsort(self.num[f], kind="stable") for f in INDEXED_FIELDS}
+        self.finite = {f: int(np.isfinite(self.num[f]).sum()) for f in INDEXED_FIELDS}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, field):
+        if field in self.num:
+            return self.num[field]
+        if field in self.text:
+            return self.text[field]
+        raise ScreenerError(f"Unknown field: {field}")
+
+    def sorted_order(self, field, descending):
+        """Pre-sorted row order of an indexed field, NaN rows always last."""
+        order, k = self.order[field], self.finite[field]
+        return np.concatenate([order[:k][::-1], order[k:]]) if descending else order
+
+
+@snapshot_cached(get_sheet_data, max_entries=1)
+def get_stock_table(stocks):
+    """StockTable of the current BASE snapshot (parsed once per snapshot)."""
+    table = StockTable(stocks)
+    print(f"[SCREENER] Indexed {len(table)} stocks.")
+    return table
+
+
+# --- Expressions --------------------------------------------------------------
+
+_COMPARE = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_ARITH = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expr):
+    """Parses and validates a filter expression (cached per expression string)."""
+    if len(expr) > MAX_EXPRESSION_LENGTH:
+        raise ScreenerError("Expression too long")
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise ScreenerError(f"Invalid expression: {e.msg}")
+    except (RecursionError, MemoryError):
+        raise ScreenerError("Expression too deeply nested")
+    if _depth(tree.body) > MAX_EXPRESSION_DEPTH:
+        raise ScreenerError(f"Expression too deeply nested (max {MAX_EXPRESSION_DEPTH} levels)")
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not,
+                             ast.USub, ast.UAdd, ast.Compare, ast.BinOp, ast.Name, ast.Load,
+                             ast.List, ast.Tuple, ast.In, ast.NotIn)):
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)) \
+                and not isinstance(node.value, bool):
+            continue
+        if type(node) in _COMPARE or type(node) in _ARITH:
+            continue
+        raise ScreenerError(f"Unsupported syntax: {type(node).__name__}")
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in NUMERIC_FIELDS and node.id not in TEXT_FIELDS:
+            raise ScreenerError(f"Unknown field: {node.id}")
+    return tree.body
+
+
+def _depth(node):
+    """Nesting depth of an expression tree (iterative: the tree may be deeper than the recursion limit)."""
+    deepest, stack = 0, [(node, 1)]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        stack.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+    return deepest
+
+
+def _evaluate(node, table):
+    """numpy value of a validated expression node over the table."""
+    if isinstance(node, ast.Name):
+        return table.column(node.id)
+    if isinstance(node, ast.Constant):
+        return node.value.strip().upper() if isinstance(node.value, str) else float(node.value)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate(e, table) for e in node.elts]
+    if isinstance(node, ast.BoolOp):
+        masks = [_as_mask(_evaluate(v, table), len(table)) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return functools.reduce(combine, masks)
+    if isinstance(node, ast.UnaryOp):
+        value = _evaluate(node.operand, table)
+        if isinstance(node.op, ast.Not):
+            return ~_as_mask(value, len(table))
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        left, right = _evaluate(node.left, table), _evaluate(node.right, table)
+        if _is_text(left) or _is_text(right) or isinstance(left, list) or isinstance(right, list):
+            raise ScreenerError("Arithmetic needs numeric fields")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return _ARITH[type(node.op)](left, right)
+    if isinstance(node, ast.Compare):
+        # Chained comparisons: a < b < c -> (a < b) & (b < c)
+        mask = np.ones(len(table), dtype=bool)
+        left = _evaluate(node.left, table)
+        for op, right_node in zip(node.ops, node.comparators):
+            right = _evaluate(right_node, table)
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(right, list):
+                    raise ScreenerError("'in' needs a list, e.g. sector in ['BANCOS', 'ENERGIA']")
+                result = np.isin(left, np.array(right, dtype=object))
+                if isinstance(op, ast.NotIn):
+                    result = ~result
+            else:
+                if _is_text(left) != _is_text(right):
+                    raise ScreenerError("Text fields can only be compared with strings")
+                with np.errstate(invalid="ignore"):
+                    result = _COMPARE[type(op)](left, right)
+            mask &= _as_mask(result, len(table))
+            left = right
+        return mask
+    raise ScreenerError(f"Unsupported syntax: {type(node).__name__}")
+
+
+def _is_text(value):
+    return isinstance(value, str) or isinstance(value, np.ndarray) and value.dtype == object
+
+
+def _as_mask(value, n):
+    if isinstance(value, np.ndarray) and value.dtype == bool:
+        return value
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return np.isfinite(value) & (value != 0)
+    raise ScreenerError("Expression must be a condition (e.g. roe_val > 0.15)")
+
+
+def filter_mask(table, where):
+    """Boolean mask of the rows matching `where` (all rows when empty)."""
+    if not where or not where.strip():
+        return np.ones(len(table), dtype=bool)
+    node = compile_expression(where.strip())
+    try:
+        return _as_mask(_evaluate(node, table), len(table))
+    except RecursionError:
+        raise ScreenerError("Expression too deeply nested")
+
+
+def parse_sort(sort):
+    """'roe_val desc, ticker' / '-roe_val,ticker' -> [(field, descending), ...]."""
+    keys = []
+    for part in (sort or "").split(","):
+        tokens = part.split()
+        if not tokens:
+            continue
+        field, descending = tokens[0], False
+        if field.startswith("-"):
+            field, descending = field[1:], True
+        if len(tokens) > 1:
+            direction = tokens[1].lower()
+            if direction not in ("asc", "desc") or len(tokens) > 2:
+                raise ScreenerError(f"Invalid sort key: {part.strip()}")
+            descending = direction == "desc"
+        if field not in NUMERIC_FIELDS and field not in TEXT_FIELDS:
+            raise ScreenerError(f"Unknown sort field: {field}")
+        keys.append((field, descending))
+    return keys
+
+
+def _order_rows(table, mask, keys):
+    """Matching row indices in sort order (sheet order when no keys)."""
+    if not keys:
+        return np.flatnonzero(mask)
+    if len(keys) == 1 and keys[0][0] in table.order:
+        order = table.sorted_order(*keys[0])
+        return order[mask[order]]
+
+    rows = np.flatnonzero(mask)
+    sort_keys = []
+    for field, descending in reversed(keys):  # lexsort: last key is the primary
+        values = table.column(field)[rows]
+        if values.dtype == object:
+            # Rank strings, then flip the rank for descending order
+            _, rank = np.unique(values.astype(str), return_inverse=True)
+            sort_keys.append(-rank if descending else rank)
+        else:
+            missing = ~np.isfinite(values)
+            key = np.where(missing, 0.0, -values if descending else values)
+            sort_keys.extend([key, missing])  # NaN last regardless of direction
+    return rows[np.lexsort(sort_keys)]
+
+
+def _project(row, fields):
+    if not fields:
+        return row
+    return {f: row.get(f) for f in fields}
+
+
+@snapshot_cached(get_stock_table, max_entries=256)
+def screen_stocks(table, where=None, sort=None, fields=None, limit=DEFAULT_LIMIT, offset=0):
+    """
+    Runs a screener query over the current BASE snapshot.
+    where: filter expression; sort: 'field [asc|desc], ...' or '-field';
+    fields: comma-separated projection (all fields when empty).
+    Returns {"total", "offset", "count", "rows"}.
+    """
+    projection = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    known = set(table.rows[0]) if table.rows else set(NUMERIC_FIELDS) | set(TEXT_FIELDS)
+    unknown = [f for f in projection if f not in known]
+    if unknown:
+        raise ScreenerError(f"Unknown field: {', '.join(unknown)}")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    offset = max(0, int(offset))
+
+    mask = filter_mask(table, where)
+    order = _order_rows(table, mask, parse_sort(sort))
+    page = order[offset:offset + limit]
+
+    print(f"[SCREENER] {len(order)} of {len(table)} stocks match '{where or ''}' (returning {len(page)}).")
+    return {
+        "total": int(len(order)),
+        "offset": offset,
+        "count": int(len(page)),
+        "rows": [_project(table.rows[i], projection) for i in page],
+    }
@@ -0,0 +1,169 @@
+"""
+Shared client for the BCB SGS API (api.bcb.gov.br/dados/serie/bcdata.sgs.<code>).
+
+Every BCB consumer (indices, market data, the SGS store, scripts) goes through
+here, so:
+  - one pooled keep-alive requests.Session is reused for all calls;
+  - responses are cached per (series, selection) for a freshness window, and
+    a cached `ultimos/M` also answers `ultimos/N` for N <= M;
+  - concurrent callers asking for the same thing share one in-flight request;
+  - transient failures (timeouts, connection errors, 429, 5xx) are retried
+    with exponential backoff and full jitter.
+
+Selections: last N observations (`ultimos/N`, the cheap endpoint for "current
+value" lookups) or a date range (`dataInicial` / `dataFinal`).
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados"
+DEFAULT_TTL = 3600          # seconds a response is reused
+TIMEOUT = 10
+RETRIES = 3
+BACKOFF_BASE = 0.5          # seconds; attempt k sleeps uniform(0, min(BACKOFF_CAP, BASE * 2**k))
+BACKOFF_CAP = 8.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Commonly used series
+SELIC_META = 432
+SELIC_DAILY = 11
+IPCA_12M = 13522
+POUPANCA_MONTH = 195
+POUPANCA_DAILY = 196
+
+
+class SGSError(RuntimeError):
+    """SGS request that failed after all retries (or returned an unusable payload)."""
+
+
+_session = None
+_session_lock = threading.Lock()
+_cache = {}                 # key -> (expiry, observations)
+_inflight = {}              # key -> threading.Event
+_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            s.mount("https://", adapter)
+            s.headers.update({"Accept": "application/json", "User-Agent": "WiseFinan/1.0"})
+            _session = s
+        return _session
+
+
+def _request(code, path, params, timeout, retries):
+    url = BASE_URL.format(code=int(code)) + path
+    last_error = None
+    for attempt in range(retries + 1):
+        try:
+            r = _get_session().get(url, params=dict(params, formato="json"), timeout=timeout)
+            if r.status_code == 200:
+                data = r.json()
+                if not isinstance(data, list):
+                    raise SGSError(f"SGS {code}: unexpected payload")
+                return data
+            if r.status_code == 404:
+                return []   # no observations in the requested window
+            last_error = SGSError(f"SGS {code}: HTTP {r.status_code}")
+            if r.status_code not in RETRY_STATUS:
+                break
+        except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+            last_error = e
+        if attempt < retries:
+            time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+    raise SGSError(f"SGS {code} failed after {retries + 1} attempts: {last_error}")
+
+
+def _cached_last(code, n, now):
+    """Fresh cached ultimos/M (M >= n) of a series, sliced to its last n observations."""
+    for (c, kind, arg), (expiry, data) in _cache.items():
+        if c == code and kind == "last" and arg >= n and expiry > now:
+            return data[-n:] if n else []
+    return None
+
+
+def _fetch(key, path, params, ttl, timeout, retries):
+    code, kind, arg = key
+    while True:
+        with _lock:
+            now = time.time()
+            hit = _cache.get(key)
+            if hit is not None and hit[0] > now:
+                return hit[1]
+            if kind == "last":
+                sliced = _cached_last(code, arg, now)
+                if sliced is not None:
+                    return sliced
+            event = _inflight.get(key)
+            if event is None:
+                event = _inflight[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # Same request already running: wait for it, then read its result from the cache
+            event.wait(timeout * (retries + 1) + BACKOFF_CAP * retries)
+            with _lock:
+                hit = _cache.get(key)
+            if hit is not None:
+                return hit[1]
+            continue    # the owner failed: try ourselves
+        try:
+            data = _request(code, path, params, timeout, retries)
+            with _lock:
+                _cache[key] = (time.time() + ttl, data)
+            return data
+        finally:
+            with _lock:
+                _inflight.pop(key, None)
+            event.set()
+
+
+def _parse(data):
+    out = []
+    for item in data:
+        try:
+            day = datetime.strptime(item["data"], "%d/%m/%Y").date()
+            value = float(str(item["valor"]).replace(",", "."))
+        except (KeyError, TypeError, ValueError):
+            continue
+        out.append((day, value))
+    return out
+
+
+def latest(code, n=1, ttl=DEFAULT_TTL, timeout=TIMEOUT, retries=RETRIES):
+    """Last n observations of a series as [(date, value)] (ultimos/N endpoint). Raises SGSError."""
+    n = int(n)
+    return _parse(_fetch((int(code), "last", n), f"/ultimos/{n}", {}, ttl, timeout, retries))
+
+
+def latest_value(code, ttl=DEFAULT_TTL, default=None):
+    """Most recent value of a series, or `default` when the request fails."""
+    try:
+        obs = latest(code, 1, ttl=ttl)
+    except SGSError as e:
+        print(f"[SGS] {e}")
+        return default
+    return obs[-1][1] if obs else default
+
+
+def series(code, start, end=None, ttl=DEFAULT_TTL, timeout=TIMEOUT, retries=RETRIES):
+    """Observations between two dates (inclusive) as [(date, value)]. Raises SGSError."""
+    end = end or datetime.now().date()
+    params = {"dataInicial": start.strftime("%d/%m/%Y"), "dataFinal": end.strftime("%d/%m/%Y")}
+    key = (int(code), "range", (params["dataInicial"], params["dataFinal"]))
+    return _parse(_fetch(key, "", params, ttl, timeout, retries))
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
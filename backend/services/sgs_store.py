@@ -0,0 +1,163 @@
+"""
+Local store of BCB SGS series (api.bcb.gov.br/dados/serie/bcdata.sgs.<code>).
+
+Same layout as the candle store: one directory per series with one raw
+little-endian file per column, read back with np.memmap and rewritten through
+temp files + os.replace, never in place (services/column_files.py):
+
+    <SGS_DIR>/11/date.i8     (days since 1970-01-01, ascending)
+    <SGS_DIR>/11/value.f8    (observation, as published: % for rate series)
+    <SGS_DIR>/11/acc.f8      (accumulated index of the rates, see below)
+
+sync_series() only asks the BCB for observations from the last stored date on
+(the last one is re-fetched and replaced, it may still be revised). `acc` is
+the running product of (1 + value / 100) over the compounding observations of
+the series (every observation for daily rates, the first one of each month for
+Poupança), extended from the last stored acc on each append, so a base-100
+index over any window is acc / acc[day before the window] with no cumprod.
+"""
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services import sgs_client
+from services.column_files import read_columns, replace_columns, write_lock
+
+_backend_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SGS_DIR = os.environ.get('SGS_STORE_DIR', os.path.join(_backend_dir, 'data', 'sgs'))
+
+COLUMNS = {
+    "date": np.dtype("<i8"),
+    "value": np.dtype("<f8"),
+    "acc": np.dtype("<f8"),
+}
+
+# How each series compounds into `acc`: every observation, or the first one of each month
+COMPOUNDING = {11: "each", 12: "each", 196: "month", 195: "month"}
+INITIAL_YEARS = 10      # BCB caps date-range queries of daily series at 10 years
+FRESHNESS = 3600        # seconds between two BCB checks of the same series
+
+_checked = {}
+
+
+def _series_dir(code, root=None):
+    return os.path.join(root or SGS_DIR, str(int(code)))
+
+
+def _column_path(code, column, root=None):
+    return os.path.join(_series_dir(code, root), f"{column}.{COLUMNS[column].str[1:]}")
+
+
+def _paths(code, root=None, columns=COLUMNS):
+    return {col: _column_path(code, col, root) for col in columns}
+
+
+def _day(value):
+    return int(np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64))
+
+
+def read_series(code, start=None, end=None, root=None):
+    """Columns of a stored series as {column: read-only memmap view}, sliced to [start, end] (dates)."""
+    cols = read_columns(_paths(code, root), COLUMNS, "date")
+    n = len(cols["date"])
+    if n == 0:
+        return cols
+    lo = 0 if start is None else int(np.searchsorted(cols["date"], _day(start), side="left"))
+    hi = n if end is None else int(np.searchsorted(cols["date"], _day(end), side="right"))
+    return {col: arr[lo:hi] for col, arr in cols.items()}
+
+
+def append_observations(code, days, values, root=None):
+    """
+    Writes observations (days since epoch, values); stored ones at or after the
+    first new date are replaced. acc continues from the last kept observation.
+    Returns the number of observations written.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values)
+    days, values = days[keep], values[keep]
+    if len(days) == 0:
+        return 0
+    order = np.argsort(days, kind="stable")
+    days, values = days[order], values[order]
+
+    with write_lock(_series_dir(code, root)):
+        stored = read_series(code, root=root)
+        n = int(np.searchsorted(stored["date"], days[0], side="left"))
+        prev_day = int(stored["date"][n - 1]) if n else None
+        prev_acc = float(stored["acc"][n - 1]) if n else 1.0
+        del stored
+
+        if COMPOUNDING.get(int(code), "each") == "month":
+            months = days.astype("datetime64[D]").astype("datetime64[M]")
+            prev_month = np.datetime64(prev_day, "D").astype("datetime64[M]") if prev_day is not None else None
+            counts = np.concatenate([[prev_month is None or months[0] != prev_month], months[1:] != months[:-1]])
+        else:
+            counts = np.ones(len(days), dtype=bool)
+        acc = prev_acc * np.cumprod(np.where(counts, 1.0 + values / 100.0, 1.0))
+
+        # New files swapped in with os.replace: memmap views held by readers stay valid
+        replace_columns(_paths(code, root), COLUMNS, "date", n, {"date": days, "value": values, "acc": acc})
+    return len(days)
+
+
+def _fetch(code, start, end):
+    """Observations of a series between two dates from the BCB API (shared SGS client) as (days, values)."""
+    obs = sgs_client.series(code, start, end, ttl=FRESHNESS)
+    if not obs:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    days = np.array([d for d, _ in obs], dtype='datetime64[D]').astype(np.int64)
+    return days, np.array([v for _, v in obs], dtype=float)
+
+
+def sync_series(code, force=False, root=None):
+    """
+    Brings a stored series up to date (at most one BCB request per FRESHNESS
+    unless force). Returns the number of observations written; failures are
+    logged and the stored observations stay available.
+    """
+    key = (int(code), root)
+    now = time.time()
+    if not force and now - _checked.get(key, 0.0) < FRESHNESS:
+        return 0
+    _checked[key] = now
+
+    stored = read_series(code, root=root)
+    today = date.today()
+    if len(stored["date"]):
+        start = pd.Timestamp(int(stored["date"][-1]), unit="D").date()
+    else:
+        start = today.replace(year=today.year - INITIAL_YEARS) + timedelta(days=1)
+    try:
+        days, values = _fetch(code, start, today)
+    except Exception as e:
+        print(f"[SGS] Fetch failed for series {code}: {e}")
+        _checked.pop(key, None)
+        return 0
+    written = append_observations(code, days, values, root)
+    if written:
+        print(f"[SGS] Series {code}: {written} observations since {start}.")
+    return written
+
+
+def accumulated_index(code, start, end=None, root=None):
+    """
+    Base-100 accumulated index of a rate series from `start`: 100 at the day
+    before the window (before its month for monthly-compounding series, so the
+    first month's rate counts), compounding every stored rate inside it.
+    pd.Series indexed by date (empty when nothing is stored for the window).
+    """
+    cut = pd.Timestamp(start).normalize()
+    if COMPOUNDING.get(int(code), "each") == "month":
+        cut = cut.replace(day=1)
+    n_before = read_series(code, end=cut - pd.Timedelta(days=1), root=root)
+    window = read_series(code, start=start, end=end, root=root)
+    if len(window["date"]) == 0:
+        return pd.Series(dtype=float)
+    base = float(n_before["acc"][-1]) if len(n_before["acc"]) else 1.0
+    index = pd.DatetimeIndex(window["date"].astype("datetime64[D]"))
+    return pd.Series(100.0 * np.asarray(window["acc"]) / base, index=index)
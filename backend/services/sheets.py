@@ -5,7 +5,7 @@ from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
 from google.auth.transport.requests import Request
-from services.cache import cached, get_cached_value
+from services.cache import cached, get_cached_value, FragmentCache
 from services.indices import get_economic_indices
 import numpy as np
 from scipy.stats import norm
@@ -209,7 +209,14 @@ def get_sheet_data():
             "roa_val": get_val(idx_roa),
             "roic_val": get_val(idx_roic)
         })
-        
+
+    # Price / valuation alerts: only thresholds crossed since the last snapshot fire
+    try:
+        from services.alerts import on_stocks_snapshot
+        on_stocks_snapshot(stocks)
+    except Exception as e:
+        print(f"Warning: Could not evaluate alerts: {e}")
+
     return stocks
 
 # get_stock_history moved to below with yfinance implementation
@@ -342,6 +349,22 @@ def get_options_data(ticker_filter=None):
     except:
         pass
 
+    chain = None
+    sigma = 0.40
+    if stock_ref and HAS_BS_LIBS:
+        try:
+            from services.option_chain import get_option_chain
+            chain = get_option_chain()
+        except Exception as e:
+            print(f"[OPTIONS] Option chain unavailable, using delta probabilities: {e}")
+
+        # Volatility: VOL ANO or realized volatility from the candle store
+        try:
+            from services.volatility import resolve_sigma
+            sigma = resolve_sigma(stock_ref)
+        except Exception as e:
+            print(f"[OPTIONS] Volatility unavailable, using 40%: {e}")
+
     for opt in all_options:
         # Check Ticker or Underlying matches
         if opt['underlying'].upper() == tf or opt['ticker'].upper() == tf:
@@ -356,14 +379,6 @@ def get_options_data(ticker_filter=None):
                     stock_price = parse_price(stock_ref.get('price', 0.0))
                     strike = smart_float(opt_copy.get('strike', 0))
                     
-                    # Volatility
-                    vol_str = str(stock_ref.get('vol_ano', '0')).replace('%', '').replace(',', '.')
-                    try:
-                       sigma = float(vol_str) / 100.0
-                       if sigma <= 0: sigma = 0.40
-                    except:
-                       sigma = 0.40
-                       
                     exp = opt_copy.get('expiration', '')
                     bdays = get_business_days(exp)
                     
@@ -374,8 +389,6 @@ def get_options_data(ticker_filter=None):
                         delta = calculate_delta(stock_price, strike, T, r, sigma, bs_type)
                         bs_price = black_scholes_price(stock_price, strike, T, r, sigma, bs_type)
                         
-                        # Prob Success (Approx)
-                        prob_success = abs(delta) # Standard approximation
                         
                         # Edge
                         market_price = opt_copy.get('price_val', 0.0)
@@ -385,7 +398,7 @@ def get_options_data(ticker_filter=None):
                             
                         opt_copy['delta_val'] = f"{delta:.3f}"
                         opt_copy['bs_price_val'] = f"R$ {bs_price:.2f}"
-                        opt_copy['prob_success'] = f"{prob_success*100:.1f}%"
+                        _set_prob_success(opt_copy, delta, False, chain)
                         opt_copy['edge_formatted'] = f"{edge_pct:.1f}%"
                         opt_copy['sigma'] = f"{sigma*100:.1f}%"
                 except:
@@ -413,6 +426,27 @@ def smart_float(v):
 def parse_price(val):
     return smart_float(val)
 
+def parse_volatility(vol_ano, default=0.40):
+    """
+    Parses the BASE 'VOL ANO' column ("32,5%" / "32.5") into a decimal sigma.
+    Falls back to default (40%) when missing or invalid.
+    """
+    vol_str = str(vol_ano if vol_ano is not None else '0').replace('%', '').replace(',', '.')
+    try:
+        sigma = float(vol_str) / 100.0
+        if sigma <= 0 or sigma != sigma: sigma = default
+    except:
+        sigma = default
+    return sigma
+
+def parse_risk_free(indices, default=0.1075):
+    """Selic string from get_economic_indices ("10.75%") -> 0.1075."""
+    try:
+        selic_str = indices.get('selic', '10.75').replace('%', '').replace(',', '.')
+        return float(selic_str) / 100.0
+    except:
+        return default
+
 def get_business_days(expiry_str):
     from datetime import datetime
     import numpy as np
@@ -482,6 +516,262 @@ def calculate_delta(S, K, T, r, sigma, option_type='call'):
     else:
         return norm.cdf(d1) - 1.0
 
+def _set_prob_success(opt, delta, sell, chain=None):
+    """
+    Probability of profit from the buyer's (sell=False) or seller's side.
+    Monte Carlo (premium-aware, see services/monte_carlo.py) when the option is
+    in the chain index; otherwise |delta| (buyer) / 1 - |delta| (seller).
+    """
+    mc = None
+    if chain is not None:
+        try:
+            from services.monte_carlo import option_metrics
+            mc = option_metrics(chain, chain.find(opt.get('ticker', '')), sell)
+        except Exception as e:
+            print(f"[MONTE CARLO] Fallback to delta: {e}")
+
+    if mc:
+        opt['prob_success'] = f"{mc['prob_profit']*100:.1f}%"
+        opt['expected_pnl'] = f"R$ {mc['expected_pnl']:.2f}"
+        opt['prob_touch'] = f"{mc['prob_touch']*100:.1f}%"
+    else:
+        prob_success = 1 - abs(delta) if sell else abs(delta)
+        opt['prob_success'] = f"{prob_success*100:.1f}%"
+
+
+def _set_model_edge(opt, strategy, bs_price, market_price, chain=None):
+    """
+    Fair value and edge under the strategy's pricer (services.strategies.strategy_pricer):
+    Black-Scholes, or the American binomial price (projected dividends) from the
+    chain index; falls back to Black-Scholes when the option is not in the chain.
+    """
+    fair, model = bs_price, "bs"
+    if chain is not None:
+        try:
+            from services.strategies import strategy_pricer
+            i = chain.find(opt.get('ticker', ''))
+            if i >= 0 and strategy_pricer(strategy) == "binomial":
+                fair, model = float(chain.american_prices([i])[0]), "binomial"
+                opt['american_price_val'] = f"R$ {fair:.2f}"
+        except Exception as e:
+            print(f"[BINOMIAL] Fallback to Black-Scholes: {e}")
+
+    opt['bs_price_val'] = f"R$ {bs_price:.2f}"
+    opt['pricing_model'] = model
+    edge_pct = ((market_price - fair) / fair) * 100 if fair > 0 else 0.0
+    opt['edge_formatted'] = f"{edge_pct:.1f}%"
+
+
+# Per-underlying opportunity fragments, reused across snapshots while inputs are unchanged
+_opportunity_fragments = FragmentCache()
+
+def _opportunity_signature(stock, stock_opts, r, today_key, sigma=None):
+    """
+    Everything a fragment depends on: the BASE row (price, vol, min/max, falta...),
+    its chain rows, the risk-free rate, the pricing sigma and the date
+    (business days to expiry).
+    """
+    return (
+        today_key,
+        r,
+        sigma,
+        tuple(sorted(stock.items())),
+        tuple(tuple(sorted(opt.items())) for opt in stock_opts)
+    )
+
+def _stock_opportunity(stock, stock_opts, r, chain=None, sigma=None):
+    """
+    Applies the CHEAP / EXPENSIVE rules to one underlying and its options.
+    `chain` (OptionChainIndex of the same snapshot) enables Monte Carlo prob_success;
+    `sigma` is the pricing volatility (services.volatility.resolve_sigmas).
+    Returns the {"stock", "options", "category", "distance_cost"} fragment,
+    or None when the stock (or none of its options) qualifies.
+    """
+    falta_val = stock.get('falta_val', -999.0)
+
+    # Category Logic
+    is_cheap = falta_val >= -15.0
+    is_expensive = falta_val <= -50.0
+
+    if not is_cheap and not is_expensive:
+        return None
+
+    stock_price = parse_price(stock.get('price', 0.0))
+    cost_val = parse_price(stock.get('min_val', 0.0))
+    max_val = parse_price(stock.get('max_val', 0.0))
+
+    # Volatility: resolved by the caller (VOL ANO / realized), else VOL ANO or 40%
+    if not sigma:
+        sigma = parse_volatility(stock.get('vol_ano'))
+
+    # --- FILTER FIX: Don't show stocks with invalid targets ---
+    if cost_val <= 0 and max_val <= 0:
+        return None
+
+
+    valid_puts = []
+    valid_calls = []
+
+    for opt in stock_opts:
+        try:
+            # COPY TO AVOID MODIFYING CACHED OBJECTS
+            opt = opt.copy()
+
+            otype = opt.get('type', '').upper()
+            strike = smart_float(opt.get('strike', 0))
+            # prem_val IS THE YIELD (Premium / Stock Price), e.g. 0.01 = 1%
+            prem_yield = float(opt.get('premium_val', 0.0)) 
+            # market_price IS THE ACTUAL OPTION PRICE (R$)
+            market_price = float(opt.get('price_val', 0.0))
+
+            if strike <= 0: continue
+
+            exp = opt.get('expiration', '')
+            bdays = get_business_days(exp)
+
+            # Calculate T (Years)
+            if bdays <= 0: continue
+            T = bdays / 252.0
+
+            # Black-Scholes Calculation
+            bs_price = 0.0
+            delta = 0.0
+
+            if HAS_BS_LIBS:
+                is_call_opt = 'CALL' in otype or 'COMPRA' in otype
+                bs_type = 'call' if 'CALL' in otype else 'put'
+
+                try:
+                    bs_price = black_scholes_price(stock_price, strike, T, r, sigma, bs_type)
+                    delta = calculate_delta(stock_price, strike, T, r, sigma, bs_type)
+                except Exception as bs_e:
+                    print(f"BS Error: {bs_e}")
+                    bs_price = 0.0
+                    delta = 0.0
+
+            # Probability of Success: Monte Carlo probability of profit
+            # (premium included), falling back to 1 - |Delta| for sellers
+            # and |Delta| for buyers (see _set_prob_success)
+
+            # Edge (Vantagem): (Market - BS) / BS
+            # Positive Edge => Expensive Option (Good to Sell)
+            # Negative Edge => Cheap Option (Good to Buy)
+            edge_pct = 0.0
+            if bs_price > 0:
+                edge_pct = ((market_price - bs_price) / bs_price)
+
+            # Store Metrics
+            opt['delta'] = delta
+            opt['bs_price'] = bs_price
+            if HAS_BS_LIBS:
+                opt['edge_formatted'] = f"{edge_pct*100:.1f}%"
+            else:
+                opt['edge_formatted'] = None
+
+            # --- FILTERS ---
+
+            # --- CHEAP (DISCOUNTED) STRATEGY ---
+            if is_cheap:
+                if 'PUT' in otype or 'VENDA' in otype: # PUT SALE (Income)
+                    # Logic: Premium > 1%, Exp <= 40bd, Strike <= LowCost * 1.08
+                    if prem_yield <= 0.01: continue
+                    if bdays > 40: continue
+                    if strike > cost_val * 1.08: continue
+
+                    if HAS_BS_LIBS:
+                        _set_prob_success(opt, delta, True, chain)
+                    opt['yield_display'] = f"{prem_yield*100:.2f}%"
+                    opt['last_price'] = market_price
+                    # --- ADDED GREEKS FOR UI ---
+                    opt['sigma'] = f"{sigma*100:.1f}%"
+                    opt['delta_val'] = f"{delta:.3f}"
+                    _set_model_edge(opt, 'put_sale', bs_price, market_price, chain)
+
+                    valid_puts.append(opt)
+
+                elif 'CALL' in otype or 'COMPRA' in otype: # CALL BUY (Upside)
+                    # Logic: Premium <= 2%, Exp > 60bd, Strike > Price * 1.10
+                    if prem_yield > 0.02: continue
+                    if bdays <= 60: continue
+                    if strike <= stock_price * 1.10: continue
+
+                    if HAS_BS_LIBS:
+                        _set_prob_success(opt, delta, False, chain)
+                    opt['cost_display'] = f"{prem_yield*100:.2f}%"
+                    opt['last_price'] = market_price
+                    # --- ADDED GREEKS FOR UI ---
+                    opt['sigma'] = f"{sigma*100:.1f}%"
+                    opt['delta_val'] = f"{delta:.3f}"
+                    _set_model_edge(opt, 'call_buy', bs_price, market_price, chain)
+
+                    valid_calls.append(opt)
+
+            # --- EXPENSIVE STRATEGY ---
+            elif is_expensive:
+                # Calls (Venda Coberta)
+                if 'CALL' in otype or 'VENDA' in otype:
+                     # Logic: Premium > 1%, Exp <= 40bd, Strike > HighCost AND > Price
+                     if prem_yield <= 0.01: continue
+                     if bdays > 40: continue
+                     if strike <= max_val or strike <= stock_price: continue
+
+                     if HAS_BS_LIBS:
+                         _set_prob_success(opt, delta, True, chain)
+                     opt['yield_display'] = f"{prem_yield*100:.2f}%"
+                     opt['last_price'] = market_price
+                     # --- ADDED GREEKS FOR UI ---
+                     opt['sigma'] = f"{sigma*100:.1f}%"
+                     opt['delta_val'] = f"{delta:.3f}"
+                     _set_model_edge(opt, 'covered_call', bs_price, market_price, chain)
+
+                     valid_calls.append(opt)
+
+                # Puts (Compra a Seco)
+                elif 'PUT' in otype or 'COMPRA' in otype:
+                     # Logic: Premium <= 2%, Exp > 60bd, Strike < Price * 0.90
+                     if prem_yield > 0.02: continue
+                     if bdays <= 60: continue
+                     if strike >= stock_price * 0.90: continue
+
+                     if HAS_BS_LIBS:
+                         _set_prob_success(opt, delta, False, chain)
+                     opt['cost_display'] = f"{prem_yield*100:.2f}%"
+                     opt['last_price'] = market_price
+                     # --- ADDED GREEKS FOR UI ---
+                     opt['sigma'] = f"{sigma*100:.1f}%"
+                     opt['delta_val'] = f"{delta:.3f}"
+                     _set_model_edge(opt, 'put_buy', bs_price, market_price, chain)
+
+                     valid_puts.append(opt)
+
+        except Exception as loop_e:
+            # print(f"Loop error: {loop_e}")
+            continue
+
+    # Add count to stock object and Filter
+    if len(valid_puts) > 0 or len(valid_calls) > 0:
+        stock_copy = stock.copy()
+        stock_copy['puts_count'] = len(valid_puts)
+        stock_copy['calls_count'] = len(valid_calls)
+        stock_copy['max_val'] = max_val
+
+        # Helper for distance
+        dist = 0.0
+        if cost_val > 0:
+             dist = falta_val / 100.0
+
+        return {
+            "stock": stock_copy,
+            "options": {
+                "puts": valid_puts,
+                "calls": valid_calls
+            },
+            "category": "CHEAP" if is_cheap else "EXPENSIVE",
+            "distance_cost": dist
+        }
+
+    return None
+
 
 @cached(ttl_seconds=300)
 def get_filtered_opportunities():
@@ -582,236 +872,61 @@ def get_filtered_opportunities():
                 options_by_ticker[unk] = []
             options_by_ticker[unk].append(opt)
     
-    opportunities = []
-    today_date = datetime.now().date()
+    # Chain index of the same snapshot (Monte Carlo prob_success); optional
+    chain = None
+    try:
+        from services.option_chain import get_option_chain
+        chain = get_option_chain()
+    except Exception as e:
+        print(f"[OPPORTUNITIES] Option chain unavailable, using delta probabilities: {e}")
+
+    # American prices for every candidate of the binomial-priced strategies, in one batch
+    if chain is not None:
+        try:
+            from services.ranking import strategy_mask
+            from services.strategies import STRATEGIES, strategy_pricer
+            wanted = np.zeros(len(chain), dtype=bool)
+            for name in STRATEGIES:
+                if name != "pozinho" and strategy_pricer(name) == "binomial":
+                    wanted |= strategy_mask(chain, name)
+            chain.american_prices(np.flatnonzero(wanted))
+        except Exception as e:
+            print(f"[OPPORTUNITIES] Binomial pricing unavailable, using Black-Scholes: {e}")
+
+    # Pricing volatility per stock (VOL ANO / realized from the candle store)
+    try:
+        from services.volatility import resolve_sigmas
+        sigmas = dict(zip((s.get('ticker', '').strip().upper() for s in stocks), resolve_sigmas(stocks)))
+    except Exception as e:
+        print(f"[OPPORTUNITIES] Volatility service unavailable, using VOL ANO: {e}")
+        sigmas = {}
+
+    today_key = datetime.now().date().isoformat()
     filtered_results = []
+    live_tickers = set()
     
     # Process Filter Logic
     for stock in stocks:
         try:
             ticker = stock.get('ticker', 'UNKNOWN').strip().upper()
-            falta_val = stock.get('falta_val', -999.0)
-            
-            # Category Logic
-            is_cheap = falta_val >= -15.0
-            is_expensive = falta_val <= -50.0
-
-            if not is_cheap and not is_expensive:
-                continue
-                
-            stock_price = parse_price(stock.get('price', 0.0))
-            cost_val = parse_price(stock.get('min_val', 0.0))
-            max_val = parse_price(stock.get('max_val', 0.0))
-            
-            # Get Historical Volatility from Stock Data
-            vol_str = str(stock.get('vol_ano', '0')).replace('%', '').replace(',', '.')
-            try:
-               sigma = float(vol_str) / 100.0
-               if sigma <= 0: sigma = 0.40 # Default to 40% if missing
-            except:
-               sigma = 0.40
-
-            # --- FILTER FIX: Don't show stocks with invalid targets ---
-            if cost_val <= 0 and max_val <= 0:
-                continue
-
-            # Check Options
             stock_opts = options_by_ticker.get(ticker, [])
-            
-            valid_puts = []
-            valid_calls = []
+            live_tickers.add(ticker)
 
-            for opt in stock_opts:
-                try:
-                    # COPY TO AVOID MODIFYING CACHED OBJECTS
-                    opt = opt.copy()
-                    
-                    otype = opt.get('type', '').upper()
-                    strike = smart_float(opt.get('strike', 0))
-                    # prem_val IS THE YIELD (Premium / Stock Price), e.g. 0.01 = 1%
-                    prem_yield = float(opt.get('premium_val', 0.0)) 
-                    # market_price IS THE ACTUAL OPTION PRICE (R$)
-                    market_price = float(opt.get('price_val', 0.0))
-
-                    if strike <= 0: continue
-                    
-                    exp = opt.get('expiration', '')
-                    bdays = get_business_days(exp)
-                    
-                    # Calculate T (Years)
-                    if bdays <= 0: continue
-                    T = bdays / 252.0
-                    
-                    # Black-Scholes Calculation
-                    bs_price = 0.0
-                    delta = 0.0
-                    
-                    if HAS_BS_LIBS:
-                        is_call_opt = 'CALL' in otype or 'COMPRA' in otype
-                        bs_type = 'call' if 'CALL' in otype else 'put'
-                        
-                        try:
-                            bs_price = black_scholes_price(stock_price, strike, T, r, sigma, bs_type)
-                            delta = calculate_delta(stock_price, strike, T, r, sigma, bs_type)
-                        except Exception as bs_e:
-                            print(f"BS Error: {bs_e}")
-                            bs_price = 0.0
-                            delta = 0.0
-                    
-                    # Probability of Success (ITM/OTM probability roughly)
-                    # For Sellers: 1 - |Delta| (Probability of expiring OTM)
-                    # For Buyers: |Delta| (Probability of expiring ITM)
-                    prob_success = 0.0
-                    
-                    # Edge (Vantagem): (Market - BS) / BS
-                    # Positive Edge => Expensive Option (Good to Sell)
-                    # Negative Edge => Cheap Option (Good to Buy)
-                    edge_pct = 0.0
-                    if bs_price > 0:
-                        edge_pct = ((market_price - bs_price) / bs_price)
-                    
-                    # Store Metrics
-                    opt['delta'] = delta
-                    opt['bs_price'] = bs_price
-                    if HAS_BS_LIBS:
-                        opt['edge_formatted'] = f"{edge_pct*100:.1f}%"
-                    else:
-                        opt['edge_formatted'] = None
-                    
-                    # --- FILTERS ---
-
-                    # --- CHEAP (DISCOUNTED) STRATEGY ---
-                    if is_cheap:
-                        if 'PUT' in otype or 'VENDA' in otype: # PUT SALE (Income)
-                            # Logic: Premium > 1%, Exp <= 40bd, Strike <= LowCost * 1.08
-                            if prem_yield <= 0.01: continue
-                            if bdays > 40: continue
-                            if strike > cost_val * 1.08: continue
-
-                            if HAS_BS_LIBS:
-                                prob_success = 1 - abs(delta)
-                                opt['prob_success'] = f"{prob_success*100:.1f}%"
-                            opt['yield_display'] = f"{prem_yield*100:.2f}%"
-                            opt['last_price'] = market_price
-                            # --- ADDED GREEKS FOR UI ---
-                            opt['sigma'] = f"{sigma*100:.1f}%"
-                            opt['delta_val'] = f"{delta:.3f}"
-                            opt['bs_price_val'] = f"R$ {bs_price:.2f}"
-                            
-                            # Edge Calculation
-                            edge_pct = 0.0
-                            if bs_price > 0:
-                                edge_pct = ((market_price - bs_price) / bs_price) * 100
-                            opt['edge_formatted'] = f"{edge_pct:.1f}%"
-                            
-                            valid_puts.append(opt)
-
-                        elif 'CALL' in otype or 'COMPRA' in otype: # CALL BUY (Upside)
-                            # Logic: Premium <= 2%, Exp > 60bd, Strike > Price * 1.10
-                            if prem_yield > 0.02: continue
-                            if bdays <= 60: continue
-                            if strike <= stock_price * 1.10: continue
-
-                            if HAS_BS_LIBS:
-                                prob_success = abs(delta)
-                                opt['prob_success'] = f"{prob_success*100:.1f}%"
-                            opt['cost_display'] = f"{prem_yield*100:.2f}%"
-                            opt['last_price'] = market_price
-                            # --- ADDED GREEKS FOR UI ---
-                            opt['sigma'] = f"{sigma*100:.1f}%"
-                            opt['delta_val'] = f"{delta:.3f}"
-                            opt['bs_price_val'] = f"R$ {bs_price:.2f}"
-
-                            # Edge Calculation
-                            edge_pct = 0.0
-                            if bs_price > 0:
-                                edge_pct = ((market_price - bs_price) / bs_price) * 100
-                            opt['edge_formatted'] = f"{edge_pct:.1f}%"
-
-                            valid_calls.append(opt)
-
-                    # --- EXPENSIVE STRATEGY ---
-                    elif is_expensive:
-                        # Calls (Venda Coberta)
-                        if 'CALL' in otype or 'VENDA' in otype:
-                             # Logic: Premium > 1%, Exp <= 40bd, Strike > HighCost AND > Price
-                             if prem_yield <= 0.01: continue
-                             if bdays > 40: continue
-                             if strike <= max_val or strike <= stock_price: continue
-
-                             if HAS_BS_LIBS:
-                                 prob_success = 1 - abs(delta)
-                                 opt['prob_success'] = f"{prob_success*100:.1f}%"
-                             opt['yield_display'] = f"{prem_yield*100:.2f}%"
-                             opt['last_price'] = market_price
-                             # --- ADDED GREEKS FOR UI ---
-                             opt['sigma'] = f"{sigma*100:.1f}%"
-                             opt['delta_val'] = f"{delta:.3f}"
-                             opt['bs_price_val'] = f"R$ {bs_price:.2f}"
-                             
-                             # Edge Calculation
-                             edge_pct = 0.0
-                             if bs_price > 0:
-                                 edge_pct = ((market_price - bs_price) / bs_price) * 100
-                             opt['edge_formatted'] = f"{edge_pct:.1f}%"
-                             
-                             valid_calls.append(opt)
-
-                        # Puts (Compra a Seco)
-                        elif 'PUT' in otype or 'COMPRA' in otype:
-                             # Logic: Premium <= 2%, Exp > 60bd, Strike < Price * 0.90
-                             if prem_yield > 0.02: continue
-                             if bdays <= 60: continue
-                             if strike >= stock_price * 0.90: continue
-
-                             if HAS_BS_LIBS:
-                                 prob_success = abs(delta)
-                                 opt['prob_success'] = f"{prob_success*100:.1f}%"
-                             opt['cost_display'] = f"{prem_yield*100:.2f}%"
-                             opt['last_price'] = market_price
-                             # --- ADDED GREEKS FOR UI ---
-                             opt['sigma'] = f"{sigma*100:.1f}%"
-                             opt['delta_val'] = f"{delta:.3f}"
-                             opt['bs_price_val'] = f"R$ {bs_price:.2f}"
-
-                             # Edge Calculation
-                             edge_pct = 0.0
-                             if bs_price > 0:
-                                 edge_pct = ((market_price - bs_price) / bs_price) * 100
-                             opt['edge_formatted'] = f"{edge_pct:.1f}%"
-
-                             valid_puts.append(opt)
-
-                except Exception as loop_e:
-                    # print(f"Loop error: {loop_e}")
-                    continue
-
-            # Add count to stock object and Filter
-            if len(valid_puts) > 0 or len(valid_calls) > 0:
-                stock_copy = stock.copy()
-                stock_copy['puts_count'] = len(valid_puts)
-                stock_copy['calls_count'] = len(valid_calls)
-                stock_copy['max_val'] = max_val
-                
-                # Helper for distance
-                dist = 0.0
-                if cost_val > 0:
-                     dist = falta_val / 100.0
-
-                filtered_results.append({
-                    "stock": stock_copy,
-                    "options": {
-                        "puts": valid_puts,
-                        "calls": valid_calls
-                    },
-                    "category": "CHEAP" if is_cheap else "EXPENSIVE",
-                    "distance_cost": dist
-                })
+            # Dirty tracking: only underlyings whose inputs changed are recomputed
+            sigma = sigmas.get(ticker)
+            signature = _opportunity_signature(stock, stock_opts, r, today_key, sigma)
+            fragment = _opportunity_fragments.get_or_build(
+                ticker, signature, lambda: _stock_opportunity(stock, stock_opts, r, chain, sigma))
+            if fragment:
+                filtered_results.append(fragment)
 
         except Exception as e:
             print(f"Error processing stock {stock.get('ticker')}: {e}")
             continue
 
+    rebuilt = _opportunity_fragments.end_pass(live_tickers)
+    print(f"[OPPORTUNITIES] Recomputed {rebuilt} of {len(live_tickers)} underlyings (others reused).")
+
     # --- FIXED INCOME PROCESSING ---
     fixed_data = []
     try:
@@ -875,164 +990,18 @@ def get_filtered_opportunities():
         "guarantee": guarantee_data
     }
 
-@cached(ttl_seconds=300)
-def get_pozinho_options():
+def get_pozinho_options(max_price=0.05, min_delta=0.01, min_bdays=None, max_bdays=None, option_type=None):
     """
-    Returns options priced <= 0.05 (Calls and Puts) grouped by Ticker.
-    Calculates Greeks and Probabilities.
+    Returns cheap options (default: priced <= 0.05, |delta| >= 0.01) grouped by Ticker.
+    Optional business-day window (min_bdays / max_bdays) and option_type ('CALL'/'PUT').
+    Answers from the price-sorted option chain index: the candidate set is a
+    bisect on price and Greeks come from the batch engine, so each threshold
+    combination is a cheap slice of the same per-snapshot index.
     """
-    from datetime import datetime
-    import numpy as np
-    from concurrent.futures import ThreadPoolExecutor
-
-    # Helper functions for parallel execution (reused)
-    def fetch_stocks_data():
-        try:
-            return get_sheet_data()
-        except: return []
-
-    def fetch_all_options():
-        try:
-            return get_options_data(None)
-        except: return []
-        
-    def fetch_indices_data():
-        try:
-            return get_economic_indices()
-        except: return {}
-
-    print("[POZINHO] Starting parallel fetch...")
-    start_time = datetime.now()
-
-    stocks = []
-    all_options = []
-    indices = {}
-
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        future_stocks = executor.submit(fetch_stocks_data)
-        future_options = executor.submit(fetch_all_options)
-        future_indices = executor.submit(fetch_indices_data)
-
-        stocks = future_stocks.result()
-        all_options = future_options.result()
-        indices = future_indices.result()
-
-    end_time = datetime.now()
-    print(f"[POZINHO] Parallel fetch done in {(end_time - start_time).total_seconds():.2f}s")
+    from services.option_chain import prefetch_chain_sources, scan_pozinho
 
-    if not stocks or not all_options: return {}
-
-    # Map Stocks for price reference
-    stocks_map = {s['ticker']: s for s in stocks}
-
-    # Get Risk-Free Rate
-    try:
-        selic_str = indices.get('selic', '10.75').replace('%', '').replace(',', '.')
-        r = float(selic_str) / 100.0
-    except:
-        r = 0.1075
-
-    pozinho_groups = {}
-    
-    for opt in all_options:
-        try:
-            # COPY TO AVOID MUTATION ISSUES
-            opt = opt.copy()
-            
-            price_val = float(opt.get('price_val', 0.0))
-            
-            # Filter: Price <= 0.05
-            if price_val > 0.05: continue
-            
-            # Get Underlying Stock Data
-            ticker = opt.get('ticker', '')
-            underlying = opt.get('underlying', '')
-            
-            # Identify parent stock
-            parent_stock = None
-            if underlying and underlying in stocks_map:
-                parent_stock = stocks_map[underlying]
-            elif ticker[:4] in stocks_map: # Try prefix
-                 parent_stock = stocks_map[ticker[:4]]
-            
-            if not parent_stock: continue # Skip if we don't know the stock
-            
-            stock_price = parse_price(parent_stock.get('price', 0.0))
-            strike = smart_float(opt.get('strike', 0))
-            
-            if stock_price <= 0 or strike <= 0: continue
-
-            # Get Volatility
-            vol_str = str(parent_stock.get('vol_ano', '0')).replace('%', '').replace(',', '.')
-            try:
-               sigma = float(vol_str) / 100.0
-               if sigma <= 0: sigma = 0.40
-            except:
-               sigma = 0.40
-
-            # Calculate Greeks
-            exp = opt.get('expiration', '')
-            bdays = get_business_days(exp)
-            if bdays <= 0: continue
-            
-            T = bdays / 252.0
-            bs_type = 'call' if 'CALL' in opt.get('type', '').upper() else 'put'
-            
-            delta = 0.0
-            bs_price = 0.0
-            
-            if HAS_BS_LIBS:
-                try:
-                    delta = calculate_delta(stock_price, strike, T, r, sigma, bs_type)
-                    bs_price = black_scholes_price(stock_price, strike, T, r, sigma, bs_type)
-                except:
-                    pass
-            
-            # Filter: Delta > 0.01 (Avoid impossible options)
-            if abs(delta) < 0.01: continue
-            
-            # Calculate Probabilities & Edge
-            prob_success = 0.0
-            if HAS_BS_LIBS:
-                 # For Buy Strategy: Prob ITM = |Delta| roughly
-                 prob_success = abs(delta)
-            
-            edge_pct = 0.0
-            if bs_price > 0:
-                edge_pct = ((price_val - bs_price) / bs_price) * 100
-            
-            # Add Metrics to Option
-            opt['delta_val'] = f"{delta:.3f}"
-            opt['bs_price_val'] = f"R$ {bs_price:.2f}"
-            opt['prob_success'] = f"{prob_success*100:.1f}%"
-            opt['edge_formatted'] = f"{edge_pct:.1f}%"
-            opt['sigma'] = f"{sigma*100:.1f}%"
-            
-            # Grouping
-            group_key = parent_stock['ticker']
-            if group_key not in pozinho_groups:
-                pozinho_groups[group_key] = {
-                    "stock": parent_stock,
-                    "options": []
-                }
-            
-            pozinho_groups[group_key]['options'].append(opt)
-
-        except Exception as e:
-            continue
-
-    # Convert to list and sort by number of options
-    result_list = []
-    for k, v in pozinho_groups.items():
-        # Sort options by Strike
-        v['options'].sort(key=lambda x: smart_float(x.get('strike', 0)))
-        result_list.append(v)
-        
-    # Sort groups by ticker
-    result_list.sort(key=lambda x: x['stock']['ticker'])
-    
-    print(f"[POZINHO] Found {len(result_list)} companies with valid options.")
-    return result_list
+    prefetch_chain_sources()
+    return scan_pozinho(max_price, min_delta, min_bdays, max_bdays, option_type)
 
 @cached(ttl_seconds=1800)
 def get_stock_history(ticker_filter=None):
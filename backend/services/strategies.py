@@ -0,0 +1,59 @@
+"""
+Option entry rules shared by the live scanners, the ranking API and the backtest.
+
+Same thresholds as sheets.get_filtered_opportunities (CHEAP / EXPENSIVE
+underlyings) and the pozinho scanner, written as numpy masks over columns.
+"""
+import os
+
+import numpy as np
+
+# side: 'sell' collects the premium, 'buy' pays it.
+# capital: base for per-trade returns (premium paid, cash-secured strike, or stock held).
+# pricer: fair-value model behind the edge ('binomial' = American lattice with
+#         projected dividends, 'bs' = European Black-Scholes); env PRICER_<NAME> overrides.
+# covered: the option is sold against stock bought at entry (P&L includes the stock leg).
+STRATEGIES = {
+    "put_sale":     {"side": "sell", "capital": "strike", "valuation": True, "pricer": "binomial", "covered": False},   # CHEAP: venda de PUT
+    "call_buy":     {"side": "buy",  "capital": "premium", "valuation": True, "pricer": "bs", "covered": False},        # CHEAP: compra de CALL
+    "covered_call": {"side": "sell", "capital": "spot", "valuation": True, "pricer": "binomial", "covered": True},      # EXPENSIVE: venda coberta
+    "put_buy":      {"side": "buy",  "capital": "premium", "valuation": True, "pricer": "binomial", "covered": False},  # EXPENSIVE: compra a seco
+    "pozinho":      {"side": "buy",  "capital": "premium", "valuation": False, "pricer": "bs", "covered": False},       # preço <= 0.05
+}
+PRICERS = ("bs", "binomial")
+
+
+def strategy_pricer(strategy):
+    """Pricing model of a strategy ('bs' / 'binomial'), honoring PRICER_<STRATEGY>."""
+    pricer = os.getenv(f"PRICER_{strategy.upper()}", STRATEGIES[strategy]["pricer"]).strip().lower()
+    return pricer if pricer in PRICERS else STRATEGIES[strategy]["pricer"]
+
+
+def rule_mask(strategy, price, strike, spot, bdays, is_call, yld, delta=None,
+              falta=None, cost_val=None, max_val=None):
+    """
+    Boolean mask of the options that pass a strategy's entry rules.
+    yld is premium / spot; falta / cost_val / max_val are the underlying's
+    valuation columns (only needed by the valuation-based strategies).
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    is_put = ~is_call
+    base = (bdays > 0) & (spot > 0) & (strike > 0) & (price > 0)
+
+    if strategy == "pozinho":
+        return base & (price <= 0.05) & (np.abs(np.nan_to_num(delta)) >= 0.01)
+
+    has_targets = ~((cost_val <= 0) & (max_val <= 0))
+    is_cheap = falta >= -15.0
+    is_expensive = falta <= -50.0
+    base = base & has_targets
+
+    if strategy == "put_sale":
+        return base & is_cheap & is_put & (yld > 0.01) & (bdays <= 40) & (strike <= cost_val * 1.08)
+    if strategy == "call_buy":
+        return base & is_cheap & is_call & (yld <= 0.02) & (bdays > 60) & (strike > spot * 1.10)
+    if strategy == "covered_call":
+        return base & is_expensive & is_call & (yld > 0.01) & (bdays <= 40) & (strike > max_val) & (strike > spot)
+    # put_buy
+    return base & is_expensive & is_put & (yld <= 0.02) & (bdays > 60) & (strike < spot * 0.90)
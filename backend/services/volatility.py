@@ -0,0 +1,237 @@
+"""
+Realized volatility from the local daily candle store.
+
+Estimators (annualized, over the last VOL_WINDOW daily bars):
+    close_to_close  sample std of log close-to-close returns
+    ewma            RiskMetrics EWMA of squared returns (lambda = EWMA_LAMBDA)
+    parkinson       high / low range
+    garman_klass    open / high / low / close
+
+State is kept per ticker and advanced incrementally: a refresh only reads the
+bars appended since the last one (per-bar terms go into a fixed-size ring, the
+EWMA variance is carried forward). The last stored bar may still be replaced by
+the next sync, so it is applied on top of the committed state, never into it.
+Tickers seen for the first time are bootstrapped together as one
+(tickers x bars) block.
+"""
+import math
+import os
+import threading
+
+import numpy as np
+
+from services.candle_store import read_candles, series_version
+
+VOL_WINDOW = 63
+EWMA_LAMBDA = 0.94
+EWMA_WARMUP = 252
+MIN_BARS = 20
+ANNUALIZATION = 252
+
+# 'sheet': BASE VOL ANO first, realized as fallback; 'realized': the reverse
+SIGMA_SOURCE = os.getenv("SIGMA_SOURCE", "sheet")
+SIGMA_ESTIMATOR = os.getenv("SIGMA_ESTIMATOR", "ewma")
+
+ESTIMATORS = ("close_to_close", "ewma", "parkinson", "garman_klass")
+_GK_COEF = 2.0 * math.log(2.0) - 1.0
+
+
+def bar_terms(open_, high, low, close, prev_close):
+    """
+    Per-bar terms of every estimator (works on any array shape):
+    log return, squared log range ln(H/L)^2 and the Garman-Klass term.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.log(close / prev_close)
+        hl2 = np.log(high / low) ** 2
+        co2 = np.log(close / open_) ** 2
+    gk = 0.5 * hl2 - _GK_COEF * co2
+    clean = lambda x: np.where(np.isfinite(x), x, np.nan)
+    return clean(ret), clean(hl2), clean(gk)
+
+
+class _TickerState:
+    """Committed rings (chronological, NaN-padded) and EWMA variance of one ticker."""
+    __slots__ = ("committed", "prev_close", "ret", "hl2", "gk", "ewma_var", "version")
+
+    def __init__(self, window):
+        self.committed = 0           # bars folded into the state
+        self.prev_close = np.nan     # close of the last committed bar
+        self.ret = np.full(window, np.nan)
+        self.hl2 = np.full(window, np.nan)
+        self.gk = np.full(window, np.nan)
+        self.ewma_var = np.nan
+        self.version = None
+
+    def push(self, ret, hl2, gk, lam):
+        """Folds k new bars (1-D term arrays) into the rings and the EWMA."""
+        k = len(ret)
+        if k == 0:
+            return
+        window = len(self.ret)
+        self.ret = np.concatenate([self.ret, ret])[-window:]
+        self.hl2 = np.concatenate([self.hl2, hl2])[-window:]
+        self.gk = np.concatenate([self.gk, gk])[-window:]
+        for x in ret[np.isfinite(ret)]:
+            self.ewma_var = x * x if np.isnan(self.ewma_var) else lam * self.ewma_var + (1.0 - lam) * x * x
+
+
+class VolatilityBook:
+    """Incrementally maintained realized-volatility estimates per ticker."""
+
+    def __init__(self, window=VOL_WINDOW, lam=EWMA_LAMBDA, root=None):
+        self.window = window
+        self.lam = lam
+        self.root = root
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def _bootstrap(self, tickers, versions):
+        """First load: all tickers as one right-aligned (tickers, bars) block."""
+        depth = self.window + EWMA_WARMUP + 1
+        n = len(tickers)
+        block = {c: np.full((n, depth), np.nan) for c in ("open", "high", "low", "close")}
+        committed = np.zeros(n, dtype=np.int64)
+        for i, t in enumerate(tickers):
+            candles = read_candles(t, "1d", root=self.root)
+            m = min(len(candles["close"]), depth)
+            committed[i] = max(len(candles["close"]) - 1, 0)
+            for c in block:
+                block[c][i, depth - m:] = candles[c][-m:]
+
+        # Commit every bar but the last one (it may still be forming)
+        prev = np.concatenate([np.full((n, 1), np.nan), block["close"][:, :-1]], axis=1)
+        ret, hl2, gk = bar_terms(block["open"], block["high"], block["low"], block["close"], prev)
+        ret, hl2, gk = ret[:, :-1], hl2[:, :-1], gk[:, :-1]
+
+        # EWMA: recursion over bars, vectorized across tickers
+        ewma = np.full(n, np.nan)
+        for j in range(ret.shape[1]):
+            x = ret[:, j]
+            ok = np.isfinite(x)
+            seeded = ok & np.isnan(ewma)
+            ewma = np.where(seeded, x * x, ewma)
+            step = ok & ~seeded
+            ewma = np.where(step, self.lam * ewma + (1.0 - self.lam) * x * x, ewma)
+
+        for i, t in enumerate(tickers):
+            state = _TickerState(self.window)
+            state.committed = int(committed[i])
+            state.prev_close = block["close"][i, -2]
+            state.ret = ret[i, -self.window:].copy()
+            state.hl2 = hl2[i, -self.window:].copy()
+            state.gk = gk[i, -self.window:].copy()
+            state.ewma_var = ewma[i]
+            state.version = versions[t]
+            self.states[t] = state
+
+    def _advance(self, ticker, state, version):
+        """Folds the bars appended since the last refresh (all but the newest)."""
+        n = version[0]
+        if n - 1 > state.committed:
+            candles = read_candles(ticker, "1d", root=self.root)
+            lo, hi = state.committed, n - 1
+            close = np.asarray(candles["close"][lo:hi], dtype=float)
+            prev = np.concatenate([[state.prev_close], close[:-1]])
+            terms = bar_terms(np.asarray(candles["open"][lo:hi]), np.asarray(candles["high"][lo:hi]),
+                              np.asarray(candles["low"][lo:hi]), close, prev)
+            state.push(*terms, lam=self.lam)
+            state.committed = hi
+            state.prev_close = close[-1]
+        state.version = version
+
+    def refresh(self, tickers):
+        tickers = [t.strip().upper() for t in tickers]
+        versions = {t: series_version(t, "1d", self.root) for t in tickers}
+        with self.lock:
+            fresh = [t for t in tickers if t not in self.states and versions[t][0] > 0]
+            if fresh:
+                self._bootstrap(fresh, versions)
+            for t in tickers:
+                state = self.states.get(t)
+                if state is not None and state.version != versions[t]:
+                    if versions[t][0] < state.committed or versions[t][2] != state.version[2]:
+                        # Series was rebuilt (shorter, or history rewritten by a split reload): start over
+                        self._bootstrap([t], versions)
+                    else:
+                        self._advance(t, state, versions[t])
+
+    def _estimate(self, ticker, state):
+        """Committed state + the newest (uncommitted) bar -> annualized estimates."""
+        ret, hl2, gk, ewma_var = state.ret, state.hl2, state.gk, state.ewma_var
+        last = read_candles(ticker, "1d", root=self.root)
+        if len(last["close"]) > state.committed:
+            i = state.committed
+            r1, h1, g1 = bar_terms(last["open"][i], last["high"][i], last["low"][i], last["close"][i],
+                                   state.prev_close)
+            ret = np.append(ret[1:], r1)
+            hl2 = np.append(hl2[1:], h1)
+            gk = np.append(gk[1:], g1)
+            if np.isfinite(r1):
+                ewma_var = r1 * r1 if np.isnan(ewma_var) else self.lam * ewma_var + (1.0 - self.lam) * r1 * r1
+
+        bars = int(np.isfinite(ret).sum())
+        out = {"bars": bars, "as_of": state.version[1] if state.version else None}
+        if bars < MIN_BARS:
+            return dict(out, **{name: None for name in ESTIMATORS})
+
+        mean = lambda x: np.nanmean(x) if np.isfinite(x).any() else np.nan
+        values = {
+            "close_to_close": np.nanvar(ret, ddof=1),
+            "ewma": ewma_var,
+            "parkinson": mean(hl2) / (4.0 * math.log(2.0)),
+            "garman_klass": mean(gk),
+        }
+        for name, var in values.items():
+            out[name] = float(math.sqrt(var * ANNUALIZATION)) if np.isfinite(var) and var > 0 else None
+        return out
+
+    def estimates(self, tickers):
+        """{ticker: {estimator: annualized vol or None, "bars", "as_of"}} for stored tickers."""
+        self.refresh(tickers)
+        with self.lock:
+            return {t: self._estimate(t, self.states[t])
+                    for t in (x.strip().upper() for x in tickers) if t in self.states}
+
+
+_book = VolatilityBook()
+
+
+def realized_volatility(tickers):
+    """Realized-volatility estimates for the given tickers (only those in the candle store)."""
+    try:
+        return _book.estimates(list(tickers))
+    except Exception as e:
+        print(f"[VOLATILITY] Estimation failed: {e}")
+        return {}
+
+
+def resolve_sigmas(stocks, default=0.40, estimator=None, source=None):
+    """
+    Pricing sigma for each BASE row. With SIGMA_SOURCE='sheet' the VOL ANO column
+    wins and realized volatility only replaces missing / #N/A values; with
+    'realized' the order is reversed. `default` when neither is available.
+    """
+    from services.sheets import parse_volatility
+
+    estimator = estimator or SIGMA_ESTIMATOR
+    source = source or SIGMA_SOURCE
+    tickers = [str(s.get('ticker', '')).strip().upper() for s in stocks]
+    sheet = [parse_volatility(s.get('vol_ano'), default=None) for s in stocks]
+
+    need = [t for t, v in zip(tickers, sheet) if source == 'realized' or v is None]
+    realized = realized_volatility(need) if need else {}
+
+    sigmas = np.full(len(stocks), default, dtype=float)
+    for i, (t, v) in enumerate(zip(tickers, sheet)):
+        rv = (realized.get(t) or {}).get(estimator)
+        first, second = (rv, v) if source == 'realized' else (v, rv)
+        sigma = first if first else second
+        if sigma:
+            sigmas[i] = sigma
+    return sigmas
+
+
+def resolve_sigma(stock, default=0.40):
+    """Single-stock resolve_sigmas."""
+    return float(resolve_sigmas([stock], default)[0])
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.alerts import AlertEngine, AlertError
+
+TICKERS = ["PETR4", "VALE3", "ITUB4", "BBAS3"]
+
+
+def _snapshot(prices):
+    return [{"ticker": t, "price": f"{p:.2f}", "min_val": "25", "max_val": "40", "falta_val": "-10"}
+            for t, p in zip(TICKERS, prices)]
+
+
+def test_crossings_match_brute_force():
+    rng = np.random.default_rng(4)
+    engine = AlertEngine()
+    alerts = []
+    for k in range(400):
+        definition = {"ticker": TICKERS[k % 4], "field": "price", "op": ["above", "below"][k % 2],
+                      "value": round(float(rng.uniform(25, 35)), 2), "repeat": True}
+        alerts.append(engine.add(definition))
+
+    path = np.round(30 + np.cumsum(rng.normal(0, 0.8, (40, 4)), axis=0), 2)
+    engine.on_stocks(_snapshot(path[0]))
+    for old, new in zip(path[:-1], path[1:]):
+        since = engine.events[-1]["id"] if engine.events else 0
+        engine.on_stocks(_snapshot(new))
+        fired = sorted(e["alert_id"] for e in engine.events_since(since))
+        expected = []
+        for a in alerts:
+            o, n = old[TICKERS.index(a["ticker"])], new[TICKERS.index(a["ticker"])]
+            if (a["op"] == "above" and o < a["value"] <= n) or (a["op"] == "below" and n <= a["value"] < o):
+                expected.append(a["id"])
+        assert fired == sorted(expected)
+
+
+def test_one_shot_alerts_fire_once():
+    engine = AlertEngine()
+    alert = engine.add({"ticker": "PETR4", "field": "price", "op": "above", "value": 31, "user": "ana"})
+    for prices in ([30, 30, 30, 30], [32, 30, 30, 30], [30, 30, 30, 30], [33, 30, 30, 30]):
+        engine.on_stocks(_snapshot(prices))
+    events = engine.events_since(0, user="ana")
+    assert [(e["alert_id"], e["value"]) for e in events] == [(alert["id"], 32.0)]
+    assert engine.list() == []
+
+
+def test_threshold_already_passed_fires_on_add():
+    engine = AlertEngine()
+    engine.on_stocks(_snapshot([30, 60, 35, 20]))
+    engine.add({"ticker": "VALE3", "field": "max_gap", "op": "above", "value": 0.2})   # 60 / 40 - 1 = 0.5
+    assert [e["reason"] for e in engine.events_since(0)] == ["already"]
+
+
+def test_invalid_definitions():
+    engine = AlertEngine()
+    for definition in ({"field": "price", "op": "above", "value": 1},
+                       {"ticker": "PETR4", "field": "volume", "op": "above", "value": 1},
+                       {"ticker": "PETR4", "field": "price", "op": "sideways", "value": 1},
+                       {"ticker": "PETR4", "field": "price", "op": "above", "value": "nan"},
+                       {"ticker": "PETR4", "kind": "news"}):
+        try:
+            engine.add(definition)
+        except AlertError:
+            continue
+        raise AssertionError(f"expected AlertError for {definition}")
+
+
+if __name__ == "__main__":
+    test_crossings_match_brute_force()
+    test_one_shot_alerts_fire_once()
+    test_threshold_already_passed_fires_on_add()
+    test_invalid_definitions()
+    print("Test Passed!")
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import chain_archive
+from services.backtest import run_backtest
+
+ENTRY, EXPIRY = "2025-01-02", "2025-01-20"
+
+
+def _archive(spot_expiry, vol_ano):
+    """Two archived days of PETR4: an entry day and the expiry day (settlement spot)."""
+    root, snapshots = tempfile.mkdtemp(), tempfile.mkdtemp()
+    chain = pd.DataFrame({
+        "subjacente": ["PETR4", "PETR4"],
+        "vencimento": [EXPIRY, EXPIRY],
+        "ativo": ["PETRA320", "PETRA400"],
+        "tipo": ["CALL", "CALL"],
+        "modelo": ["A", "A"],
+        "strike": [32.0, 40.0],
+        "preco": [0.50, 0.03],
+        "negocios": [10, 10],
+        "volume": [1000.0, 100.0],
+    })
+    chain_archive.archive_chain(chain, {"PETR4": 30.0}, 0.10, snapshot_date=ENTRY, root=root)
+    chain_archive.archive_chain(chain, {"PETR4": spot_expiry}, 0.10, snapshot_date=EXPIRY, root=root)
+    stock = {"ticker": "PETR4", "price": "30", "min_val": "20", "max_val": "31", "falta_val": "-60",
+             "vol_ano": vol_ano}
+    chain_archive.write_stock_snapshot([stock], snapshot_date=ENTRY, root=snapshots)
+    return root, snapshots
+
+
+def _run(root, snapshots, strategies):
+    saved = chain_archive.STOCK_SNAPSHOT_DIR
+    chain_archive.STOCK_SNAPSHOT_DIR = snapshots
+    try:
+        return run_backtest(strategies, root=root, workers=1)
+    finally:
+        chain_archive.STOCK_SNAPSHOT_DIR = saved
+
+
+def test_covered_call_caps_the_upside():
+    root, snapshots = _archive(spot_expiry=36.0, vol_ano="30%")
+    trades = _run(root, snapshots, ["covered_call"])["trades"]
+    assert list(trades["ativo"]) == ["PETRA320"]
+    # Stock bought at 30, called away at 32, plus the premium: a gain, not a loss
+    assert np.isclose(trades["pnl"].iloc[0], min(36.0, 32.0) - 30.0 + 0.50)
+    assert np.isclose(trades["ret"].iloc[0], 2.5 / 30.0)
+
+
+def test_covered_call_keeps_the_stock_loss():
+    root, snapshots = _archive(spot_expiry=25.0, vol_ano="30%")
+    trades = _run(root, snapshots, ["covered_call"])["trades"]
+    assert np.isclose(trades["pnl"].iloc[0], 25.0 - 30.0 + 0.50)
+
+
+def test_pozinho_delta_uses_vol_ano():
+    # Same option and prices: only the BASE sigma decides whether |delta| >= 0.01
+    root, snapshots = _archive(spot_expiry=30.0, vol_ano="80%")
+    assert list(_run(root, snapshots, ["pozinho"])["trades"]["ativo"]) == ["PETRA400"]
+    root, snapshots = _archive(spot_expiry=30.0, vol_ano="10%")
+    assert _run(root, snapshots, ["pozinho"])["trades"].empty
+
+
+if __name__ == "__main__":
+    test_covered_call_caps_the_upside()
+    test_covered_call_keeps_the_stock_loss()
+    test_pozinho_delta_uses_vol_ano()
+    print("Test Passed!")
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.binomial import binomial_batch
+from services.bs_engine import bs_price_batch
+
+
+def _crr_reference(S, K, T, r, sigma, is_call, steps=2000):
+    """Scalar Cox-Ross-Rubinstein American price, one node at a time."""
+    dt = T / steps
+    u = np.exp(sigma * np.sqrt(dt))
+    d = 1.0 / u
+    p = (np.exp(r * dt) - d) / (u - d)
+    disc = np.exp(-r * dt)
+    payoff = (lambda s: max(s - K, 0.0)) if is_call else (lambda s: max(K - s, 0.0))
+    values = [payoff(S * u ** j * d ** (steps - j)) for j in range(steps + 1)]
+    for step in range(steps - 1, -1, -1):
+        values = [max(disc * (p * values[j + 1] + (1 - p) * values[j]), payoff(S * u ** j * d ** (step - j)))
+                  for j in range(step + 1)]
+    return values[0]
+
+
+def test_european_lr_converges_to_black_scholes():
+    S, K = 30.0, np.array([25.0, 30.0, 36.0])
+    for is_call in (True, False):
+        lattice = binomial_batch(S, K, 0.5, 0.1, 0.35, is_call, american=False)
+        assert np.allclose(lattice, bs_price_batch(S, K, 0.5, 0.1, 0.35, is_call), atol=2e-3)
+
+
+def test_american_put_matches_reference_lattice():
+    # Longstaff-Schwartz benchmark rows: early exercise premium over the European put
+    for S, sigma, T in ((36.0, 0.2, 1.0), (40.0, 0.4, 2.0), (44.0, 0.2, 1.0)):
+        american = binomial_batch(S, 40.0, T, 0.06, sigma, False, steps=301)[0]
+        assert abs(american - _crr_reference(S, 40.0, T, 0.06, sigma, False)) < 5e-3
+        assert american > float(bs_price_batch(S, 40.0, T, 0.06, sigma, False))
+
+
+def test_american_call_without_dividends_is_european():
+    american = binomial_batch(30.0, 28.0, 0.25, 0.1, 0.3, True)
+    european = binomial_batch(30.0, 28.0, 0.25, 0.1, 0.3, True, american=False)
+    assert np.allclose(american, european, atol=1e-10)
+
+
+def test_dividend_lowers_the_call_and_makes_early_exercise_worth_it():
+    times, amounts = np.array([[0.1]]), np.array([[3.0]])
+    plain = binomial_batch(30.0, 25.0, 0.25, 0.1, 0.3, True)[0]
+    european = binomial_batch(30.0, 25.0, 0.25, 0.1, 0.3, True, american=False,
+                              div_times=times, div_amounts=amounts)[0]
+    american = binomial_batch(30.0, 25.0, 0.25, 0.1, 0.3, True, div_times=times, div_amounts=amounts)[0]
+    assert european < plain
+    assert american > european + 0.05
+
+
+def test_degenerate_rows_get_intrinsic_value():
+    prices = binomial_batch([30.0, 30.0, 0.0], [25.0, 35.0, 10.0], [0.0, -1.0, 0.5], 0.1, 0.3,
+                            [True, False, True])
+    assert np.allclose(prices, [5.0, 5.0, 0.0])
+
+
+if __name__ == "__main__":
+    test_european_lr_converges_to_black_scholes()
+    test_american_put_matches_reference_lattice()
+    test_american_call_without_dividends_is_european()
+    test_dividend_lowers_the_call_and_makes_early_exercise_worth_it()
+    test_degenerate_rows_get_intrinsic_value()
+    print("Test Passed!")
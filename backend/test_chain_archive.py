@@ -0,0 +1,56 @@
+import ast
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import chain_archive
+
+DAY = "2026-10-19"
+
+
+def _chain(underlyings):
+    rows = []
+    for u in underlyings:
+        rows.append({"subjacente": u, "vencimento": "2026-11-20", "ativo": f"{u[:4]}K300", "tipo": "CALL",
+                     "modelo": "A", "strike": 30.0, "preco": 1.2, "negocios": 10, "volume": 1200.0})
+    return pd.DataFrame(rows)
+
+
+def test_archive_round_trip_with_greeks():
+    root = tempfile.mkdtemp()
+    assert chain_archive.archive_chain(_chain(["PETR4"]), {"PETR4": 30.0}, 0.10, snapshot_date=DAY, root=root) == 1
+    df = chain_archive.read_chain_range("PETR4", root=root)
+    assert list(df["ativo"]) == ["PETRK300"] and str(df["date"].iloc[0])[:10] == DAY
+    assert df["dias_uteis"].iloc[0] == np.busday_count(DAY, "2026-11-20")
+    assert 0.0 < df["iv"].iloc[0] < 1.0 and 0.0 < df["delta"].iloc[0] < 1.0
+
+
+def test_rerun_replaces_the_day_partition():
+    root = tempfile.mkdtemp()
+    spots = {"PETR4": 30.0, "VALE3": 30.0}
+    chain_archive.archive_chain(_chain(["PETR4", "VALE3"]), spots, 0.10, snapshot_date=DAY, root=root)
+    # Second run of the day: VALE3 dropped out of the chain
+    chain_archive.archive_chain(_chain(["PETR4"]), spots, 0.10, snapshot_date=DAY, root=root)
+    assert chain_archive.list_archived_underlyings(root) == ["PETR4"]
+    assert chain_archive.read_chain_range("VALE3", root=root).empty
+
+
+def test_ingestion_script_does_not_import_the_archive():
+    # pyarrow is only needed when archiving: --no-archive must work without it
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts", "opcoes_to_sheets_rules.py")
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    top_level = [node.module for node in tree.body if isinstance(node, ast.ImportFrom)]
+    assert "services.chain_archive" not in top_level
+
+
+if __name__ == "__main__":
+    test_archive_round_trip_with_greeks()
+    test_rerun_replaces_the_day_partition()
+    test_ingestion_script_does_not_import_the_archive()
+    print("Test Passed!")
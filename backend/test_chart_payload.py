@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store, charts
+from services.charts import clean_columns, frame_columns
+
+
+def _history(bars=30):
+    index = pd.date_range("2026-09-01", periods=bars, freq="B", tz="America/Sao_Paulo")
+    close = np.linspace(30.0, 33.0, bars) + 0.004
+    df = pd.DataFrame({"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close,
+                       "Volume": np.arange(bars) * 1000.0}, index=index)
+    df.iloc[3, df.columns.get_loc("Close")] = np.nan      # holes Yahoo sometimes returns
+    df.iloc[7, df.columns.get_loc("Low")] = 0.0
+    df.iloc[9, df.columns.get_loc("Volume")] = np.nan
+    return df
+
+
+def _row_loop(df):
+    """The per-row construction the endpoint used before the column version."""
+    candles = []
+    for ts, row in df.iterrows():
+        if any(pd.isna(row[c]) or row[c] <= 0 for c in ("Open", "High", "Low", "Close")):
+            continue
+        candles.append({"time": int(ts.timestamp()), "open": round(row["Open"], 2), "high": round(row["High"], 2),
+                        "low": round(row["Low"], 2), "close": round(row["Close"], 2),
+                        "volume": int(0 if pd.isna(row["Volume"]) else row["Volume"])})
+    return candles
+
+
+def test_columns_match_the_row_loop():
+    df = _history()
+    columns = clean_columns(frame_columns(df))
+    assert len(columns["time"]) == len(df) - 2
+    assert charts.candle_rows(columns) == _row_loop(df)
+
+
+def test_chart_payload_from_the_store():
+    root, df = tempfile.mkdtemp(), _history()
+    candle_store.append_candles("CHRT3", "1d", df.tz_convert("UTC").tz_localize(None), root)
+    saved = candle_store.CANDLE_DIR, candle_store.sync, charts.get_company_name
+    candle_store.CANDLE_DIR = root
+    candle_store.sync = lambda tickers, interval: {}
+    charts.get_company_name = lambda ticker, yf_ticker=None: "Chart SA"
+    try:
+        chart = charts.get_chart("CHRT3", "10y", "1d", adjust=False)
+        small = charts.get_chart("CHRT3", "10y", "1d", max_points=10, adjust=False)
+    finally:
+        candle_store.CANDLE_DIR, candle_store.sync, charts.get_company_name = saved
+    assert chart["name"] == "Chart SA" and chart["interval"] == "1d" and chart["adjusted"] is False
+    assert chart["candles"] == _row_loop(df)
+    assert small["bars"] == 28 and len(small["candles"]) == 10 and small["mode"] == "candle"
+
+
+if __name__ == "__main__":
+    test_columns_match_the_row_loop()
+    test_chart_payload_from_the_store()
+    print("Test Passed!")
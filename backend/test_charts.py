@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store, charts
+
+
+def _dividend_store(bars=60):
+    root = tempfile.mkdtemp()
+    index = pd.date_range("2026-01-05 03:00", periods=bars, freq="B")
+    close = np.linspace(20.0, 26.0, bars)
+    dividends = np.zeros(bars)
+    dividends[[20, 45]] = [0.50, 0.80]
+    candle_store.append_candles("PETR4", "1d", pd.DataFrame(
+        {"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close,
+         "Volume": 1000.0, "Dividends": dividends}, index=index), root)
+    return root, close, dividends
+
+
+def _columns(root, interval, adjust):
+    saved = candle_store.CANDLE_DIR, candle_store.sync
+    candle_store.CANDLE_DIR = root
+    candle_store.sync = lambda tickers, interval: {}     # no network: serve the stored bars
+    try:
+        return charts._store_columns("PETR4", "max", interval, adjust)
+    finally:
+        candle_store.CANDLE_DIR, candle_store.sync = saved
+
+
+def test_dividend_factors_match_adj_close():
+    close = np.array([10.0, 10.5, 10.2, 11.0, 10.8])
+    dividends = np.array([0.0, 0.0, 0.3, 0.0, 0.2])
+    # Yahoo: every bar before an ex-date is scaled by 1 - dividend / previous close
+    expected = np.ones(5)
+    for j in np.nonzero(dividends)[0]:
+        expected[:j] *= 1.0 - dividends[j] / close[j - 1]
+    assert np.allclose(candle_store.dividend_factors(close, dividends), expected)
+
+
+def test_store_candles_are_dividend_adjusted():
+    root, close, dividends = _dividend_store()
+    raw = _columns(root, "1d", adjust=False)
+    adjusted = _columns(root, "1d", adjust=True)
+    assert np.allclose(raw["close"], close)
+    factors = candle_store.dividend_factors(close, dividends)
+    assert np.allclose(adjusted["close"], close * factors)
+    assert np.allclose(adjusted["high"], (close + 0.5) * factors)
+    assert adjusted["close"][-1] == close[-1] and adjusted["close"][0] < close[0]
+
+
+def test_weekly_candles_use_the_last_daily_factor():
+    root, close, dividends = _dividend_store()
+    weekly = _columns(root, "1wk", adjust=True)
+    daily = _columns(root, "1d", adjust=True)
+    # The week's close is its last daily close, adjusted the same way
+    last_of_week = np.searchsorted(daily["time"], weekly["time"][1:], side="left") - 1
+    assert np.allclose(weekly["close"][:-1], daily["close"][last_of_week])
+    assert np.isclose(weekly["close"][-1], daily["close"][-1])
+
+
+def test_ranges_older_than_the_store_are_downloaded():
+    assert charts._store_covers("5y", "1d")
+    assert charts._store_covers("10y", "1wk")
+    assert not charts._store_covers("max", "1d")
+    assert not charts._store_covers("max", "1mo")
+    assert not charts._store_covers("2y", "1h")
+    assert charts._store_covers("1mo", "5m")
+
+
+if __name__ == "__main__":
+    test_dividend_factors_match_adj_close()
+    test_store_candles_are_dividend_adjusted()
+    test_weekly_candles_use_the_last_daily_factor()
+    test_ranges_older_than_the_store_are_downloaded()
+    print("Test Passed!")
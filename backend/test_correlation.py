@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store
+from services.correlation import CorrelationBook
+
+TICKERS = ["AAAA3", "BBBB4", "CCCC3"]
+WINDOW = 60
+
+
+def _closes(bars, seed=11):
+    """Correlated random walks; CCCC3 skips some days (pairwise-complete observations)."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-02 03:00", periods=bars, freq="B")
+    common = rng.normal(0.0, 0.015, bars)
+    closes = {}
+    for k, t in enumerate(TICKERS):
+        ret = 0.6 * common + rng.normal(0.0, 0.01 * (k + 1), bars)
+        closes[t] = pd.Series(25.0 * np.exp(np.cumsum(ret)), index=index)
+    closes["CCCC3"] = closes["CCCC3"].drop(index[::7])
+    return closes
+
+
+def _write(root, closes, start=0, stop=None):
+    for t, close in closes.items():
+        part = close.iloc[start:stop]
+        candle_store.append_candles(t, "1d", pd.DataFrame(
+            {"Open": part, "High": part, "Low": part, "Close": part, "Volume": 1.0}), root)
+
+
+def _reference(closes, end):
+    """pandas pairwise statistics of the last WINDOW days of the union grid, up to `end`."""
+    returns = pd.DataFrame({t: np.log(c[c.index <= end]).diff() for t, c in closes.items()})
+    returns = returns.iloc[1:].tail(WINDOW)
+    return returns.cov(min_periods=20), returns.corr(min_periods=20)
+
+
+def _check(book, closes, end):
+    cov, corr, obs = book.statistics(TICKERS)
+    ref_cov, ref_corr = _reference(closes, end)
+    assert np.allclose(cov, ref_cov.to_numpy(), rtol=1e-8, atol=1e-12)
+    assert np.allclose(corr, ref_corr.to_numpy(), rtol=1e-8)
+    assert obs[2, 2] < obs[0, 0] == WINDOW
+
+
+def test_matches_pandas_pairwise_statistics():
+    root, closes = tempfile.mkdtemp(), _closes(200)
+    _write(root, closes)
+    book = CorrelationBook(WINDOW, root)
+    book.refresh(TICKERS)
+    _check(book, closes, closes["AAAA3"].index[-1])
+
+
+def test_incremental_days_match_a_full_rebuild():
+    root, closes = tempfile.mkdtemp(), _closes(200)
+    dates = closes["AAAA3"].index
+    _write(root, {t: c[c.index <= dates[149]] for t, c in closes.items()})
+    book = CorrelationBook(WINDOW, root)
+    book.refresh(TICKERS)
+    # Refreshes with 1, 5 and 44 new days: rolling-window updates of the sums
+    last = dates[149]
+    for end in (dates[150], dates[155], dates[199]):
+        _write(root, {t: c[(c.index > last) & (c.index <= end)] for t, c in closes.items()})
+        book.refresh(TICKERS)
+        _check(book, closes, end)
+        last = end
+
+
+if __name__ == "__main__":
+    test_matches_pandas_pairwise_statistics()
+    test_incremental_days_match_a_full_rebuild()
+    print("Test Passed!")
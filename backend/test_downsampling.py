@@ -0,0 +1,75 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.charts import downsample, lttb_indices, ohlc_buckets
+
+
+def _lttb_reference(x, y, threshold):
+    """Plain-loop Largest-Triangle-Three-Buckets (Steinarsson), same bucket edges."""
+    n = len(x)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep, a = [0], 0
+    for b in range(threshold - 2):
+        s, e = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            nx, ny = np.mean(x[edges[b + 1]:edges[b + 2]]), np.mean(y[edges[b + 1]:edges[b + 2]])
+        else:
+            nx, ny = x[-1], y[-1]
+        best, best_area = s, -1.0
+        for i in range(s, e):
+            area = abs((x[a] - nx) * (y[i] - y[a]) - (x[a] - x[i]) * (ny - y[a])) / 2
+            if area > best_area:
+                best, best_area = i, area
+        keep.append(best)
+        a = best
+    return np.array(keep + [n - 1])
+
+
+def _columns(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 20.0 + np.cumsum(rng.normal(0.0, 0.3, n))
+    return {
+        'time': 1_700_000_000 + 86400 * np.arange(n, dtype=np.int64),
+        'open': close + rng.normal(0.0, 0.1, n),
+        'high': close + 0.5,
+        'low': close - 0.5,
+        'close': close,
+        'volume': rng.integers(100, 1000, n),
+    }
+
+
+def test_lttb_matches_reference():
+    columns = _columns(2000)
+    x, y = columns['time'].astype(float), columns['close']
+    for threshold in (3, 10, 300, 1999):
+        assert np.array_equal(lttb_indices(x, y, threshold), _lttb_reference(x, y, threshold))
+
+
+def test_lttb_keeps_ends_and_spikes():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    keep = lttb_indices(np.arange(1000.0), y, 50)
+    assert len(keep) == 50 and keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep and np.all(np.diff(keep) > 0)
+    assert np.array_equal(lttb_indices(np.arange(10.0), np.arange(10.0), 20), np.arange(10))
+
+
+def test_ohlc_buckets_preserve_range_and_volume():
+    columns = _columns(1001)
+    buckets = ohlc_buckets(columns, 100)
+    assert len(buckets['time']) == 100
+    assert buckets['open'][0] == columns['open'][0] and buckets['close'][-1] == columns['close'][-1]
+    assert buckets['high'].max() == columns['high'].max() and buckets['low'].min() == columns['low'].min()
+    assert buckets['volume'].sum() == columns['volume'].sum()
+    assert downsample(columns, 2000)['close'] is columns['close']
+
+
+if __name__ == "__main__":
+    test_lttb_matches_reference()
+    test_lttb_keeps_ends_and_spikes()
+    test_ohlc_buckets_preserve_range_and_volume()
+    print("Test Passed!")
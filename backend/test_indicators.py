@@ -0,0 +1,97 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store
+from services.indicators import IndicatorBook, compute, parse_spec
+
+SPEC = "sma:20,ema:9,rsi:14,macd:12:26:9,bb:20:2,atr:14,vwap:20"
+
+
+def _frame(bars=400, seed=9):
+    rng = np.random.default_rng(seed)
+    close = 30.0 * np.exp(np.cumsum(rng.normal(0.0, 0.015, bars)))
+    spread = np.abs(rng.normal(0.0, 0.3, bars))
+    return pd.DataFrame({"Open": close, "High": close + spread, "Low": close - spread, "Close": close,
+                         "Volume": rng.integers(1000, 5000, bars).astype(float)},
+                        index=pd.date_range("2024-01-02 03:00", periods=bars, freq="B"))
+
+
+def _bars(df):
+    return {"time": df.index.to_numpy(dtype="datetime64[s]").astype(np.int64), "open": df["Open"].to_numpy(),
+            "high": df["High"].to_numpy(), "low": df["Low"].to_numpy(), "close": df["Close"].to_numpy(),
+            "volume": df["Volume"].to_numpy()}
+
+
+def _wilder(x, n):
+    """Reference smoothing: SMA of the first n values, then y += (x - y) / n."""
+    out = np.full(len(x), np.nan)
+    out[n - 1] = np.mean(x[:n])
+    for i in range(n, len(x)):
+        out[i] = out[i - 1] + (x[i] - out[i - 1]) / n
+    return out
+
+
+def test_indicators_match_references():
+    df = _frame()
+    bars, close = _bars(df), df["Close"]
+    assert np.allclose(compute("sma", (20,), bars)["value"], close.rolling(20).mean(), equal_nan=True)
+
+    seeded = close.copy()      # EMA seeded with the SMA of the first 9 closes
+    seeded.iloc[:8] = np.nan
+    seeded.iloc[8] = close.iloc[:9].mean()
+    ema = seeded.ewm(span=9, adjust=False).mean()
+    assert np.allclose(compute("ema", (9,), bars)["value"], ema, equal_nan=True)
+
+    bb = compute("bb", (20, 2.0), bars)
+    assert np.allclose(bb["upper"], close.rolling(20).mean() + 2 * close.rolling(20).std(ddof=0), equal_nan=True)
+
+    diff = close.diff().to_numpy()[1:]
+    gain, loss = _wilder(np.maximum(diff, 0), 14), _wilder(np.maximum(-diff, 0), 14)
+    rsi = np.r_[np.nan, 100 - 100 / (1 + gain / loss)]
+    assert np.allclose(compute("rsi", (14,), bars)["value"], rsi, equal_nan=True)
+
+    prev = close.shift().to_numpy()
+    tr = np.maximum(df["High"] - df["Low"], np.maximum(abs(df["High"] - prev), abs(df["Low"] - prev))).to_numpy()
+    assert np.allclose(compute("atr", (14,), bars)["value"], np.r_[np.nan, _wilder(tr[1:], 14)], equal_nan=True)
+
+
+def test_incremental_book_matches_one_shot():
+    root, df = tempfile.mkdtemp(), _frame()
+    book, specs = IndicatorBook(root), parse_spec(SPEC)
+    bars = _bars(df)
+    # Appends of 300, 1, 1 and 98 bars; the last stored bar is rewritten each time
+    start = 0
+    for stop in (300, 301, 302, 400):
+        part = df.iloc[start:stop].copy()
+        if stop < len(df):
+            part.iloc[-1, part.columns.get_loc("Close")] *= 1.01     # provisional last bar
+        candle_store.append_candles("PETR4", "1d", part, root)
+        result = book.indicators("PETR4", specs)
+        start = stop - 1
+    for key, name, params in specs:
+        expected = compute(name, params, bars)
+        for output, values in expected.items():
+            assert np.allclose(result[key][output], values, equal_nan=True), (key, output)
+
+
+def test_invalid_specs():
+    for spec in ("foo", "sma:0", "sma:abc", "macd:1:2:3:4", "bb:20:-1", f"ema:{10 ** 6}"):
+        try:
+            parse_spec(spec)
+        except ValueError:
+            continue
+        raise AssertionError(f"expected ValueError for {spec}")
+    assert [key for key, _, _ in parse_spec("rsi, bb")] == ["rsi_14", "bb_20_2"]
+
+
+if __name__ == "__main__":
+    test_indicators_match_references()
+    test_incremental_book_matches_one_shot()
+    test_invalid_specs()
+    print("Test Passed!")
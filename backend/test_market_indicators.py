@@ -0,0 +1,97 @@
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store, market_data
+
+indicators = market_data.get_market_indicators.__wrapped__
+
+
+@contextlib.contextmanager
+def _store(sync=None):
+    """Temp candle store and indicators file; BRL=X syncs go to `sync` (default: no-op)."""
+    root = tempfile.mkdtemp()
+    patched = {
+        (candle_store, "CANDLE_DIR"): root,
+        (market_data, "INDICATORS_FILE"): os.path.join(root, "indicators_cache.json"),
+        (market_data, "_last_good"): None,
+        (market_data, "_dollar_job"): None,
+        (market_data, "INDICATOR_FETCHERS"): {"selic": lambda: 15.0, "ipca": lambda: 5.1,
+                                              "dollar": market_data._fetch_dollar},
+        (market_data, "sync"): sync or (lambda tickers, interval: {}),
+    }
+    saved = {key: getattr(*key) for key in patched}
+    for (module, name), value in patched.items():
+        setattr(module, name, value)
+    try:
+        yield root
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+
+
+def _write_dollar(root, close=5.43):
+    index = pd.date_range("2026-10-12 03:00", periods=5, freq="B")
+    frame = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close}, index=index)
+    candle_store.append_candles("BRL=X", "1d", frame, root)
+
+
+def _wait_saved(key, timeout=2.0):
+    # Last good values are saved by a done-callback on the indicators pool
+    stop = time.time() + timeout
+    while time.time() < stop:
+        if os.path.exists(market_data.INDICATORS_FILE):
+            with open(market_data.INDICATORS_FILE, encoding="utf-8") as f:
+                if key in f.read():
+                    return
+        time.sleep(0.01)
+
+
+def test_dollar_is_synced_when_old():
+    calls = []
+
+    def sync(tickers, interval):
+        calls.append(tickers)
+        _write_dollar(candle_store.CANDLE_DIR)
+
+    with _store(sync):
+        result = indicators(deadline=5)
+    assert calls == [["BRL=X"]]
+    assert result["dollar"] == 5.43 and result["stale"] == []
+
+
+def test_old_dollar_is_listed_as_stale():
+    with _store() as root:     # the sync never writes (Yahoo down)
+        _write_dollar(root, 5.10)
+        old = time.time() - 2 * 86400
+        os.utime(candle_store._column_path("BRL=X", "1d", "time", root), (old, old))
+        result = indicators(deadline=5)
+    assert result["dollar"] == 5.10
+    assert result["stale"] == ["dollar"]
+
+
+def test_missing_dollar_falls_back_to_last_good():
+    with _store() as root:
+        _write_dollar(root, 5.20)
+        assert indicators(deadline=5)["dollar"] == 5.20
+        _wait_saved("indicators:dollar")
+        # Cold restart with an empty store: the persisted last good value is served
+        os.remove(candle_store._column_path("BRL=X", "1d", "time", root))
+        market_data._last_good = None
+        result = indicators(deadline=5)
+    assert result["dollar"] == 5.20 and result["stale"] == ["dollar"]
+    assert np.isclose(result["selic"], 15.0)
+
+
+if __name__ == "__main__":
+    test_dollar_is_synced_when_old()
+    test_old_dollar_is_listed_as_stale()
+    test_missing_dollar_falls_back_to_last_good()
+    print("Test Passed!")
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+from scipy.stats import norm
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.bs_engine import bs_price_batch
+from services.monte_carlo import evaluate_options, fit_student_df
+
+S, SIGMA, R, BDAYS = 30.0, 0.35, 0.10, 63
+
+
+def _evaluate(strike, is_call, premium, **kwargs):
+    n = len(strike)
+    return evaluate_options("PETR4", S, SIGMA, R, strike, is_call, np.full(n, BDAYS), premium,
+                            n_paths=kwargs.pop("n_paths", 40000), **kwargs)
+
+
+def test_gbm_matches_closed_form():
+    strike = np.array([27.0, 30.0, 33.0, 30.0])
+    is_call = np.array([True, True, True, False])
+    premium = np.array([3.5, 1.8, 0.7, 1.2])
+    out = _evaluate(strike, is_call, premium)
+
+    T = BDAYS / 252.0
+    # Buyer profits beyond strike +/- premium; expected P&L at expiry is the undiscounted BS price minus it
+    breakeven = np.where(is_call, strike + premium, strike - premium)
+    d = (np.log(S / breakeven) + (R - 0.5 * SIGMA ** 2) * T) / (SIGMA * np.sqrt(T))
+    prob = np.where(is_call, norm.cdf(d), norm.cdf(-d))
+    pnl = np.exp(R * T) * bs_price_batch(S, strike, T, R, SIGMA, is_call) - premium
+    assert np.allclose(out["prob_profit"], prob, atol=0.01)
+    assert np.allclose(out["expected_pnl"], pnl, atol=0.03)
+    # Touching the strike is at least as likely as finishing beyond it
+    assert np.all(out["prob_touch"] >= out["prob_profit"])
+
+
+def test_results_do_not_depend_on_the_batch():
+    strike, is_call, premium = np.array([28.0, 32.0]), np.array([False, True]), np.array([0.5, 0.6])
+    both = _evaluate(strike, is_call, premium, n_paths=2000)
+    alone = _evaluate(strike[1:], is_call[1:], premium[1:], n_paths=2000)
+    assert both["prob_profit"][1] == alone["prob_profit"][0]
+    assert np.array_equal(_evaluate(strike, is_call, premium, n_paths=2000)["expected_pnl"], both["expected_pnl"])
+
+
+def test_dead_options_are_nan():
+    out = evaluate_options("PETR4", S, SIGMA, R, [30.0, 0.0], [True, True], [0, 10], [1.0, 1.0], n_paths=200)
+    assert np.isnan(out["prob_profit"]).all()
+
+
+def test_student_df_fit():
+    rng = np.random.default_rng(1)
+    assert abs(fit_student_df(rng.standard_t(6.0, 200000)) - 6.0) < 1.0
+    normal = fit_student_df(rng.standard_normal(200000))    # no excess kurtosis: None or ~MAX_TAIL_DF
+    assert normal is None or normal > 20
+    assert fit_student_df(rng.standard_t(6.0, 30)) is None
+
+
+if __name__ == "__main__":
+    test_gbm_matches_closed_form()
+    test_results_do_not_depend_on_the_batch()
+    test_dead_options_are_nan()
+    test_student_df_fit()
+    print("Test Passed!")
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.movers import get_market_movers
+from services.screener import StockTable
+
+STOCKS = [
+    {"ticker": "PETR4", "sector": "Petróleo", "change_day": "2,5%", "dividend": "12,1%", "var_1m": "4%", "var_12m": "-3%"},
+    {"ticker": "PRIO3", "sector": "Petróleo", "change_day": "-1,2%", "dividend": "0,0%", "var_1m": "-2%", "var_12m": "15%"},
+    {"ticker": "VALE3", "sector": "Mineração", "change_day": "0,8%", "dividend": "8,4%", "var_1m": "1%", "var_12m": "-10%"},
+    {"ticker": "ITUB4", "sector": "Bancos", "change_day": "#N/A", "dividend": "6,0%", "var_1m": "3%", "var_12m": "20%"},
+    {"ticker": "MGLU3", "sector": "Varejo", "change_day": "-4,0%", "dividend": "", "var_1m": "-9%", "var_12m": "-40%"},
+]
+
+movers = get_market_movers.__wrapped__
+
+
+def _tickers(rows):
+    return [row["ticker"] for row in rows]
+
+
+def test_lists_follow_the_parsed_columns():
+    result = movers(StockTable(STOCKS), n=3)
+    assert _tickers(result["highs"]) == ["PETR4", "VALE3", "PRIO3"]      # ITUB4 has no change: left out
+    assert _tickers(result["lows"]) == ["MGLU3", "PRIO3", "VALE3"]
+    assert _tickers(result["dividends"]) == ["PETR4", "VALE3", "ITUB4"]
+    assert _tickers(result["year_highs"]) == ["ITUB4", "PRIO3", "PETR4"]
+    assert result["highs"][0]["var_val"] == 2.5 and result["dividends"][0]["dy_val"] == 12.1
+
+
+def test_sector_filter_and_limits():
+    table = StockTable(STOCKS)
+    result = movers(table, n=5, sector="petróleo")
+    assert _tickers(result["highs"]) == ["PETR4", "PRIO3"]
+    assert _tickers(result["month_lows"]) == ["PRIO3", "PETR4"]
+    assert len(movers(table, n=0)["highs"]) == 1
+    assert movers(table, n=5, sector="Saúde")["highs"] == []
+
+
+if __name__ == "__main__":
+    test_lists_follow_the_parsed_columns()
+    test_sector_filter_and_limits()
+    print("Test Passed!")
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+from email.utils import formatdate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import news_feed
+from services.news_feed import NewsFeedCache
+
+
+class _Response:
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class _Session:
+    """Serves a growing RSS document: each get() publishes `batch` more articles."""
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.published = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.published += self.batch
+        now = time.time()
+        items = "".join(
+            f"<item><title>News {i} - Source</title><link>https://example.com/{i}</link>"
+            f"<pubDate>{formatdate(now - (self.published - i) * 60)}</pubDate></item>"
+            for i in range(self.published))
+        return _Response(f"<rss><channel>{items}</channel></rss>".encode("utf-8"))
+
+
+def test_cursor_polling_never_skips_items():
+    session = _Session(batch=5)
+    cache = NewsFeedCache(feeds={"BRASIL": "https://example.com/rss"}, session=session)
+    cache.refresh("BRASIL", force=True)
+    first, cursor = cache.items("BRASIL", limit=10)
+    assert [item["title"] for item in first] == [f"News {i}" for i in range(4, -1, -1)]
+
+    # 30 new articles while the client was away, read 10 per poll
+    session.batch = 30
+    cache.refresh("BRASIL", force=True)
+    delivered = []
+    while True:
+        page, cursor = cache.items("BRASIL", limit=10, since=cursor)
+        if not page:
+            break
+        assert [item["id"] for item in page] == sorted(item["id"] for item in page)
+        delivered.extend(page)
+    assert [item["title"] for item in delivered] == [f"News {i}" for i in range(5, 35)]
+    assert len({item["id"] for item in delivered}) == 30
+
+
+def test_ring_drops_duplicates_and_keeps_max_items():
+    session = _Session(batch=news_feed.MAX_ITEMS + 20)
+    cache = NewsFeedCache(feeds={"BRASIL": "https://example.com/rss"}, session=session)
+    cache.refresh("BRASIL", force=True)
+    session.batch = 0
+    assert cache.refresh("BRASIL", force=True) == 0
+    items, _ = cache.items("BRASIL", limit=1000)
+    assert len(items) == news_feed.MAX_ITEMS
+    assert len({item["link"] for item in items}) == news_feed.MAX_ITEMS
+    assert items[0]["title"] == f"News {news_feed.MAX_ITEMS + 19}"
+
+
+if __name__ == "__main__":
+    test_cursor_polling_never_skips_items()
+    test_ring_drops_duplicates_and_keeps_max_items()
+    print("Test Passed!")
@@ -0,0 +1,92 @@
+import contextlib
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import market_data, option_chain, sheets, volatility
+
+opportunities = sheets.get_filtered_opportunities.__wrapped__   # without the 5-minute response cache
+EXPIRY = (date.today() + timedelta(days=30)).strftime("%d/%m/%Y")
+
+
+def _stock(ticker, price="30", falta="-10"):
+    return {"ticker": ticker, "price": price, "min_val": "29", "max_val": "40", "falta_val": float(falta),
+            "vol_ano": "30%"}
+
+
+def _put(underlying, strike="30", premium="0.02"):
+    return {"ticker": f"{underlying[:4]}V300", "underlying": underlying, "type": "PUT", "strike": strike,
+            "expiration": EXPIRY, "premium_val": premium, "price_val": "0.60"}
+
+
+@contextlib.contextmanager
+def _sources(state):
+    """Sheet / index sources answer from `state`; counts the per-underlying rebuilds."""
+    built = []
+    original = sheets._stock_opportunity
+
+    def counting(stock, *args, **kwargs):
+        built.append(stock["ticker"])
+        return original(stock, *args, **kwargs)
+
+    def no_chain():
+        raise RuntimeError("no chain in tests")
+
+    patched = {
+        (sheets, "get_sheet_data"): lambda: state["stocks"],
+        (sheets, "get_options_data"): lambda _=None: state["options"],
+        (sheets, "get_economic_indices"): lambda: {"selic": "10,75"},
+        (sheets, "get_fixed_income_data"): lambda: [],
+        (sheets, "_stock_opportunity"): counting,
+        (market_data, "get_treasury_etfs"): lambda: [],
+        (option_chain, "get_option_chain"): no_chain,
+        (volatility, "resolve_sigmas"): lambda stocks: np.full(len(stocks), 0.30),
+    }
+    saved = {key: getattr(*key) for key in patched}
+    for (module, name), value in patched.items():
+        setattr(module, name, value)
+    sheets._opportunity_fragments.clear()
+    try:
+        yield built
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+        sheets._opportunity_fragments.clear()
+
+
+def test_only_changed_underlyings_are_recomputed():
+    state = {"stocks": [_stock("PETR4"), _stock("VALE3")], "options": [_put("PETR4"), _put("VALE3")]}
+    with _sources(state) as built:
+        first = opportunities()
+        assert sorted(built) == ["PETR4", "VALE3"]
+        assert [x["stock"]["ticker"] for x in first["cheap"]] == ["PETR4", "VALE3"]
+
+        built.clear()
+        assert opportunities() == first
+        assert built == []
+
+        # A new premium on one underlying: only that one is rebuilt
+        state["options"] = [_put("PETR4"), _put("VALE3", premium="0.005")]
+        result = opportunities()
+        assert built == ["VALE3"]
+        assert [x["stock"]["ticker"] for x in result["cheap"]] == ["PETR4"]
+
+
+def test_vanished_underlyings_are_pruned():
+    state = {"stocks": [_stock("PETR4"), _stock("VALE3")], "options": [_put("PETR4"), _put("VALE3")]}
+    with _sources(state):
+        opportunities()
+        state["stocks"] = [_stock("PETR4")]
+        result = opportunities()
+        assert [x["stock"]["ticker"] for x in result["cheap"]] == ["PETR4"]
+        assert set(sheets._opportunity_fragments.store) == {"PETR4"}
+
+
+if __name__ == "__main__":
+    test_only_changed_underlyings_are_recomputed()
+    test_vanished_underlyings_are_pruned()
+    print("Test Passed!")
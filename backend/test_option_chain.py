@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.option_chain import OptionChainIndex, scan_pozinho
+
+EXPIRY = "18/12/2099"
+STOCKS = [{"ticker": "PETR4", "price": "30", "vol_ano": "40%"}]
+
+
+def _option(ticker, strike, price, kind="CALL"):
+    return {"ticker": ticker, "underlying": "PETR4", "type": kind, "strike": strike,
+            "expiration": EXPIRY, "price_val": price, "premium_val": "0"}
+
+
+def test_chain_is_sorted_by_price():
+    chain = OptionChainIndex([_option("PETRA400", "40", "0.30"), _option("PETRA500", "50", "0.04"),
+                              _option("PETRA450", "45", "0.12")], STOCKS, 0.10)
+    assert list(chain.price) == [0.04, 0.12, 0.30]
+    assert chain.upto_price(0.12) == 2
+    assert chain.rows[chain.find("PETRA450")]["ticker"] == "PETRA450"
+    assert chain.priceable.all()
+
+
+def test_unparseable_price_is_not_priceable():
+    chain = OptionChainIndex([_option("PETRA400", "40", "0.03"), _option("PETRA999", "40", "#N/A"),
+                              _option("PETRA998", "40", None)], STOCKS, 0.10)
+    junk = [chain.find("PETRA999"), chain.find("PETRA998")]
+    # No usable quote: sorted after every real price, out of any price <= X scan
+    assert np.isnan(chain.price[junk]).all() and not chain.priceable[junk].any()
+    assert chain.find("PETRA400") == 0 and chain.upto_price(0.05) == 1
+
+
+def test_empty_snapshot_keeps_the_empty_shape():
+    assert scan_pozinho.__wrapped__(OptionChainIndex([], STOCKS, 0.10)) == {}
+    assert scan_pozinho.__wrapped__(OptionChainIndex([_option("PETRA400", "40", "0.03")], [], 0.10)) == {}
+
+
+if __name__ == "__main__":
+    test_chain_is_sorted_by_price()
+    test_unparseable_price_is_not_priceable()
+    test_empty_snapshot_keeps_the_empty_shape()
+    print("Test Passed!")
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.payoff import PayoffError, compute_payoff
+
+EXPIRY = "2099-12-18"
+
+
+class _Chain:
+    r = 0.10
+    stocks = [{"ticker": "PETR4", "price": "30"}]
+
+    def find(self, ticker):
+        return -1
+
+
+def _call(strike, premium, side="buy"):
+    return {"type": "CALL", "strike": strike, "expiration": EXPIRY, "premium": premium, "side": side}
+
+
+def _payoff(legs, **kwargs):
+    return compute_payoff(legs, _Chain(), underlying="PETR4", sigma=0.30, **kwargs)
+
+
+def test_expiry_curve_is_intrinsic_value():
+    result = _payoff([_call(30, 2.0), _call(35, 0.8, side="sell")])
+    spots = np.array(result["spots"])
+    expected = np.maximum(spots - 30, 0) - 2.0 - (np.maximum(spots - 35, 0) - 0.8)
+    assert np.allclose(result["expiry"]["pnl"], expected, atol=1e-4)
+    assert np.allclose(result["breakevens"], [31.2], atol=1e-3)
+    assert result["max_gain"] == 3.8 and result["max_loss"] == -1.2
+
+
+def test_extremes_beyond_the_spot_range():
+    # Wide call spread: both strikes outside the +/-30% grid around 30
+    result = _payoff([_call(20, 10.5), _call(50, 0.5, side="sell")])
+    assert result["max_gain"] == 20.0        # (50 - 20) - 10
+    assert result["max_loss"] == -10.0
+    assert max(result["expiry"]["pnl"]) < result["max_gain"]
+
+
+def test_invalid_manual_legs_are_payoff_errors():
+    bad_legs = [
+        [dict(_call(30, 1.0), expiration="someday")],
+        [_call("abc", 1.0)],
+        [_call(30, "1,0x")],
+        [dict(_call(30, 1.0), quantity="lots")],
+    ]
+    for legs in bad_legs:
+        try:
+            _payoff(legs)
+        except PayoffError:
+            continue
+        raise AssertionError(f"expected PayoffError for {legs}")
+
+
+if __name__ == "__main__":
+    test_expiry_curve_is_intrinsic_value()
+    test_extremes_beyond_the_spot_range()
+    test_invalid_manual_legs_are_payoff_errors()
+    print("Test Passed!")
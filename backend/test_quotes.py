@@ -0,0 +1,70 @@
+import calendar
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import market_data
+from services.cache import market_hours_ttl
+from services.market_data import QUOTE_LAGS, QUOTE_TICKERS, quote_variations
+
+quotes = market_data.get_general_quotes.__wrapped__
+
+
+def _closes(days=60, seed=8):
+    """IBOV on business days, BTC every day, a currency with a short history."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2026-08-01", periods=days, freq="D")
+    frame = pd.DataFrame({t: 10.0 * np.exp(np.cumsum(rng.normal(0, 0.01, days))) for t in QUOTE_TICKERS},
+                         index=index)
+    frame.loc[index.dayofweek >= 5, "^BVSP"] = np.nan
+    frame.iloc[:-4, 3] = np.nan
+    frame["GBPBRL=X"] = np.nan
+    return frame
+
+
+def test_variations_match_per_ticker_history():
+    closes = _closes()
+    stats = quote_variations(closes)
+    for j, ticker in enumerate(closes.columns):
+        history = closes[ticker].dropna()
+        if history.empty:
+            assert np.isnan(stats["price"][j])
+            continue
+        assert stats["price"][j] == history.iloc[-1]
+        for name, k in QUOTE_LAGS.items():
+            # k-th last close, or the first one when the history is shorter
+            base = history.iloc[-1 - k] if len(history) > k else history.iloc[0]
+            assert np.isclose(stats[name][j], (history.iloc[-1] - base) / base * 100)
+
+
+def test_quotes_flag_missing_symbols():
+    saved = market_data._stored_closes
+    market_data._stored_closes = lambda tickers: _closes()
+    try:
+        result = quotes()
+    finally:
+        market_data._stored_closes = saved
+    assert [q["id"] for q in result] == list(QUOTE_TICKERS)
+    assert result[-1]["error"] and result[-1]["price"] == 0.0
+    assert not any(q.get("error") for q in result[:-1])
+    assert result[0]["change"] == result[0]["change_1d"]
+    assert market_data._quotes_ttl(result) == 30
+
+
+def test_market_hours_ttl():
+    # Timestamps in Brasília time (UTC-3)
+    brt = lambda *t: calendar.timegm(t + (0,)) + 3 * 3600
+    assert market_hours_ttl(60, 900, now=brt(2026, 10, 19, 11, 0)) == 60    # Monday, in session
+    assert market_hours_ttl(60, 900, now=brt(2026, 10, 19, 19, 0)) == 900   # after the close
+    assert market_hours_ttl(60, 900, now=brt(2026, 10, 18, 11, 0)) == 900   # Sunday
+
+
+if __name__ == "__main__":
+    test_variations_match_per_ticker_history()
+    test_quotes_flag_missing_symbols()
+    test_market_hours_ttl()
+    print("Test Passed!")
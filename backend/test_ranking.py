@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.ranking import top_k, top_k_per_group
+
+
+def _values(n=5000, seed=2):
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.normal(0.0, 1.0, n), 2)     # rounded: plenty of ties
+    values[rng.choice(n, 300, replace=False)] = np.nan
+    return values, np.flatnonzero(rng.random(n) < 0.6)
+
+
+def test_top_k_matches_a_full_sort():
+    values, candidates = _values()
+    finite = candidates[np.isfinite(values[candidates])]
+    expected = finite[np.argsort(-values[finite], kind="stable")]
+    for k in (1, 20, 500, len(finite), len(finite) + 10):
+        best = top_k(values, candidates, k)
+        assert len(best) == min(k, len(finite))
+        # Same values in the same order (ties may pick different rows at the cut)
+        assert np.array_equal(values[best], values[expected[:k]])
+    assert len(top_k(values, candidates, 0)) == 0
+
+
+def test_top_k_per_group_matches_a_full_sort():
+    values, candidates = _values()
+    groups = np.arange(len(values)) % 37
+    result = top_k_per_group(values, candidates, groups, 5)
+    for gid in range(37):
+        rows = candidates[(groups[candidates] == gid) & np.isfinite(values[candidates])]
+        expected = rows[np.argsort(-values[rows], kind="stable")][:5]
+        assert np.array_equal(values[result[gid]], values[expected])
+    assert top_k_per_group(values, candidates[:0], groups, 5) == {}
+
+
+if __name__ == "__main__":
+    test_top_k_matches_a_full_sort()
+    test_top_k_per_group_matches_a_full_sort()
+    print("Test Passed!")
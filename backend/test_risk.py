@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store
+from services.risk import RiskError, portfolio_risk
+
+
+class _Chain:
+    r = 0.10
+
+    def __init__(self, stocks):
+        self.stocks = stocks
+
+    def find(self, ticker):
+        return -1
+
+
+def _store(tickers, bars=300, seed=3):
+    root = tempfile.mkdtemp()
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2023-01-02 03:00", periods=bars, freq="B")
+    for t in tickers:
+        close = 20.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+        candle_store.append_candles(t, "1d", pd.DataFrame(
+            {"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1.0}, index=index), root)
+    return root
+
+
+def _risk(root, positions, stocks, **kwargs):
+    saved = candle_store.CANDLE_DIR
+    candle_store.CANDLE_DIR = root
+    try:
+        return portfolio_risk(positions, _Chain(stocks), **kwargs)
+    finally:
+        candle_store.CANDLE_DIR = saved
+
+
+def _stock(ticker, price="20"):
+    return {"ticker": ticker, "price": price, "vol_ano": "30%"}
+
+
+def test_stock_var_matches_historical_quantile():
+    root = _store(["AAAA3"])
+    result = _risk(root, [{"ticker": "AAAA3", "type": "STOCK", "quantity": 100}], [_stock("AAAA3")], history=250)
+    close = candle_store.read_candles("AAAA3", "1d", root=root)["close"]
+    ret = np.diff(np.log(np.asarray(close)))[-250:]
+    pnl = 100 * 20.0 * (np.exp(ret) - 1.0)
+    expected = -np.quantile(pnl, 0.05, method="lower")
+    assert np.isclose(result["var"]["1d"]["95"]["var"], round(expected, 2))
+    assert result["by_underlying"]["AAAA3"]["history_coverage"] == 1.0
+
+
+def test_underlying_without_history_is_an_error():
+    root = _store(["AAAA3"])
+    positions = [{"ticker": "AAAA3", "type": "STOCK", "quantity": 100},
+                 {"ticker": "BBBB3", "type": "STOCK", "quantity": 100}]
+    try:
+        _risk(root, positions, [_stock("AAAA3"), _stock("BBBB3")])
+    except RiskError as e:
+        assert "BBBB3" in str(e)
+    else:
+        raise AssertionError("BBBB3 has no candles: expected RiskError")
+
+
+def test_bad_numbers_are_risk_errors():
+    root = _store(["AAAA3"])
+    for kwargs in ({"r": "abc"}, {"history": "lots"}):
+        try:
+            _risk(root, [{"ticker": "AAAA3", "type": "STOCK", "quantity": 1}], [_stock("AAAA3")], **kwargs)
+        except RiskError:
+            continue
+        raise AssertionError(f"expected RiskError for {kwargs}")
+
+
+if __name__ == "__main__":
+    test_stock_var_matches_historical_quantile()
+    test_underlying_without_history_is_an_error()
+    test_bad_numbers_are_risk_errors()
+    print("Test Passed!")
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+from email.utils import formatdate
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import news_feed
+from services.news_feed import NewsFeedCache, parse_items
+
+URL = "https://example.com/rss"
+
+
+def _rss(ages):
+    """RSS document with one item per age (seconds before now)."""
+    now = time.time()
+    items = "".join(
+        f"<item><title>News {i} - Source</title><link>https://example.com/{i}</link>"
+        f"<pubDate>{formatdate(now - age)}</pubDate>"
+        f"<description>&lt;img src=\"https://img.example.com/{i}.jpg\"&gt;</description></item>"
+        for i, age in enumerate(ages))
+    return f"<rss><channel>{items}</channel></rss>".encode("utf-8")
+
+
+class _Response:
+    def __init__(self, status, content=b"", headers=None):
+        self.status_code = status
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class _Session:
+    """Replays a list of responses, recording the request headers."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+def test_parse_items():
+    items = parse_items(_rss([60, 120]), "BRASIL")
+    assert [item["title"] for item in items] == ["News 0", "News 1"]
+    assert items[0]["image"] == "https://img.example.com/0.jpg"
+    assert items[0]["timestamp"] > items[1]["timestamp"] and items[0]["category"] == "BRASIL"
+
+
+def test_conditional_get_and_freshness():
+    session = _Session([
+        _Response(200, _rss([60, 120]), {"ETag": '"v1"', "Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT"}),
+        _Response(304),
+    ])
+    cache = NewsFeedCache(feeds={"BRASIL": URL}, session=session)
+    assert cache.refresh("BRASIL") == 2
+    assert cache.refresh("BRASIL") == 0 and len(session.requests) == 1     # fresh: no request
+    assert cache.refresh("BRASIL", force=True) == 0                         # 304: nothing to parse
+    assert session.requests[1]["If-None-Match"] == '"v1"'
+    assert session.requests[1]["If-Modified-Since"] == "Mon, 19 Oct 2026 10:00:00 GMT"
+    assert len(cache.items("BRASIL")[0]) == 2
+
+
+def test_failures_keep_items_and_old_articles_are_dropped():
+    session = _Session([_Response(200, _rss([60, news_feed.MAX_AGE + 60])), _Response(503)])
+    cache = NewsFeedCache(feeds={"BRASIL": URL}, session=session)
+    assert cache.refresh("BRASIL") == 1          # the week-old article is left out
+    assert cache.refresh("BRASIL", force=True) == 0
+    feed = cache.feeds["BRASIL"]
+    assert feed.next_check - time.time() <= news_feed.RETRY_AFTER_ERROR
+    assert [item["title"] for item in cache.items("BRASIL")[0]] == ["News 0"]
+
+
+if __name__ == "__main__":
+    test_parse_items()
+    test_conditional_get_and_freshness()
+    test_failures_keep_items_and_old_articles_are_dropped()
+    print("Test Passed!")
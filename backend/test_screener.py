@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.screener import ScreenerError, StockTable, filter_mask, screen_stocks
+
+STOCKS = [
+    {"ticker": "PETR4", "sector": "Petróleo", "price": "R$ 30,50", "roe_val": "18,2%", "div_ebit": "1,1", "falta_val": "-10"},
+    {"ticker": "VALE3", "sector": "Mineração", "price": "R$ 61,00", "roe_val": "12,0%", "div_ebit": "0,8", "falta_val": "5"},
+    {"ticker": "ITUB4", "sector": "Bancos", "price": "R$ 35,10", "roe_val": "21,5%", "div_ebit": "", "falta_val": "-25"},
+    {"ticker": "MGLU3", "sector": "Varejo", "price": "R$ 9,80", "roe_val": "#N/A", "div_ebit": "4,2", "falta_val": "-40"},
+]
+
+screen = screen_stocks.__wrapped__
+
+
+def _tickers(result):
+    return [row["ticker"] for row in result["rows"]]
+
+
+def test_filter_and_sort():
+    table = StockTable(STOCKS)
+    assert np.isclose(table.num["roe_val"][0], 0.182) and np.isnan(table.num["roe_val"][3])
+    result = screen(table, where="roe_val > 0.15 and falta_val > -30", sort="roe_val desc")
+    assert _tickers(result) == ["ITUB4", "PETR4"] and result["total"] == 2
+    # NaN rows are last whatever the direction
+    assert _tickers(screen(table, sort="-div_ebit"))[-1] == "ITUB4"
+    assert _tickers(screen(table, where="ticker in ['VALE3', 'MGLU3']", sort="price")) == ["MGLU3", "VALE3"]
+
+
+def test_invalid_queries_are_screener_errors():
+    table = StockTable(STOCKS)
+    bad = [
+        "__import__('os')",
+        "unknown_field > 1",
+        "'PETR4'",
+        "ticker > 1",
+        "-" * 999 + "price > 1",                   # nesting beyond the recursion limit
+        "(" * 300 + "price" + ")" * 300 + " > 1",
+        "not " * 200 + "price > 1",
+        "price > 1 and " * 100 + "price > 1",      # longer than MAX_EXPRESSION_LENGTH
+    ]
+    for where in bad:
+        try:
+            filter_mask(table, where)
+        except ScreenerError:
+            continue
+        raise AssertionError(f"expected ScreenerError for {where[:40]!r}")
+
+
+if __name__ == "__main__":
+    test_filter_and_sort()
+    test_invalid_queries_are_screener_errors()
+    print("Test Passed!")
@@ -0,0 +1,97 @@
+import contextlib
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import sgs_client
+from services.sgs_client import SGSError
+
+
+class _Response:
+    def __init__(self, status, data=None):
+        self.status_code = status
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _Session:
+    """Answers from a list of statuses (200 returns `data`), recording every URL asked."""
+
+    def __init__(self, statuses=(200,), data=None, delay=0.0):
+        self.statuses = list(statuses)
+        self.data = data if data is not None else [
+            {"data": f"{d:02d}/10/2026", "valor": f"0,0{d}"} for d in range(10, 15)]
+        self.delay = delay
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(url)
+        time.sleep(self.delay)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return _Response(status, self.data)
+
+
+@contextlib.contextmanager
+def _client(session):
+    saved = sgs_client._session, sgs_client.BACKOFF_BASE
+    sgs_client._session, sgs_client.BACKOFF_BASE = session, 0.0
+    sgs_client.clear_cache()
+    try:
+        yield session
+    finally:
+        sgs_client._session, sgs_client.BACKOFF_BASE = saved
+        sgs_client.clear_cache()
+
+
+def test_cached_last_n_answers_smaller_n():
+    with _client(_Session()) as session:
+        assert len(sgs_client.latest(11, 5)) == 5
+        assert sgs_client.latest(11, 1) == [(date(2026, 10, 14), 0.014)]
+        assert sgs_client.latest_value(11) == 0.014
+        assert len(session.calls) == 1
+        sgs_client.latest(11, 10)       # more than cached: a new request
+        assert len(session.calls) == 2
+
+
+def test_transient_errors_are_retried():
+    with _client(_Session([503, 429, 200])) as session:
+        assert len(sgs_client.series(432, date(2026, 10, 1), date(2026, 10, 19))) == 5
+        assert len(session.calls) == 3
+
+
+def test_permanent_errors_raise():
+    with _client(_Session([400])) as session:
+        try:
+            sgs_client.latest(432, 1)
+        except SGSError:
+            pass
+        else:
+            raise AssertionError("expected SGSError for HTTP 400")
+        assert len(session.calls) == 1
+        assert sgs_client.latest_value(432, default=15.0) == 15.0
+
+
+def test_concurrent_callers_share_one_request():
+    with _client(_Session(delay=0.2)) as session:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(sgs_client.latest(13522, 3)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(session.calls) == 1 and len(results) == 8
+
+
+if __name__ == "__main__":
+    test_cached_last_n_answers_smaller_n()
+    test_transient_errors_are_retried()
+    test_permanent_errors_raise()
+    test_concurrent_callers_share_one_request()
+    print("Test Passed!")
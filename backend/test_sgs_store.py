@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import sgs_client, sgs_store
+
+
+def _daily(n=300, seed=5):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2025-01-02", periods=n).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return days, 0.05 + rng.normal(0.0, 0.002, n)     # Selic-like daily rates, in %
+
+
+def test_chunked_appends_match_one_cumprod():
+    root = tempfile.mkdtemp()
+    days, values = _daily()
+    for lo, hi in ((0, 100), (100, 101), (101, 250), (250, 300)):
+        sgs_store.append_observations(11, days[lo:hi], values[lo:hi], root)
+    stored = sgs_store.read_series(11, root=root)
+    assert np.array_equal(stored["date"], days)
+    assert np.allclose(stored["acc"], np.cumprod(1.0 + values / 100.0), rtol=1e-12)
+
+    # Base-100 index over a window: the compounded rates inside it only
+    start = pd.Timestamp(np.datetime64(int(days[120]), "D"))
+    index = sgs_store.accumulated_index(11, start, root=root)
+    assert index.index[0] == start and len(index) == 180
+    assert np.allclose(index.to_numpy(), 100.0 * np.cumprod(1.0 + values[120:] / 100.0))
+
+
+def test_revised_last_observation_is_replaced():
+    root = tempfile.mkdtemp()
+    days, values = _daily(50)
+    sgs_store.append_observations(11, days, values, root)
+    revised = values.copy()
+    revised[-1] = 0.07
+    sgs_store.append_observations(11, days[-1:], revised[-1:], root)
+    stored = sgs_store.read_series(11, root=root)
+    assert len(stored["date"]) == 50
+    assert np.isclose(stored["acc"][-1], np.prod(1.0 + revised / 100.0))
+
+
+def test_poupanca_compounds_once_a_month():
+    root = tempfile.mkdtemp()
+    days = np.array(["2025-01-01", "2025-01-02", "2025-02-01", "2025-02-10", "2025-03-01"],
+                    dtype="datetime64[D]").astype(np.int64)
+    values = np.array([0.6, 0.61, 0.62, 0.63, 0.64])
+    sgs_store.append_observations(195, days[:3], values[:3], root)
+    sgs_store.append_observations(195, days[3:], values[3:], root)
+    acc = sgs_store.read_series(195, root=root)["acc"]
+    assert np.allclose(acc, np.cumprod([1.006, 1.0, 1.0062, 1.0, 1.0064]))
+
+
+def test_sync_only_asks_after_the_last_stored_date():
+    root = tempfile.mkdtemp()
+    days, values = _daily(30)
+    sgs_store.append_observations(11, days[:20], values[:20], root)
+    calls = []
+
+    def series(code, start, end, ttl=None):
+        calls.append(start)
+        return [(str(np.datetime64(int(d), "D")), v) for d, v in zip(days, values)
+                if np.datetime64(int(d), "D") >= np.datetime64(start)]
+
+    saved = sgs_client.series
+    sgs_client.series = series
+    try:
+        assert sgs_store.sync_series(11, force=True, root=root) == 11   # the last stored one is re-fetched
+        assert sgs_store.sync_series(11, root=root) == 0                # fresh: no request
+    finally:
+        sgs_client.series = saved
+    assert calls == [date.fromordinal(date(1970, 1, 1).toordinal() + int(days[19]))]
+    assert np.allclose(sgs_store.read_series(11, root=root)["acc"][-1], np.prod(1.0 + values / 100.0))
+
+
+if __name__ == "__main__":
+    test_chunked_appends_match_one_cumprod()
+    test_revised_last_observation_is_replaced()
+    test_poupanca_compounds_once_a_month()
+    test_sync_only_asks_after_the_last_stored_date()
+    print("Test Passed!")
@@ -0,0 +1,75 @@
+import math
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import candle_store
+from services.volatility import EWMA_LAMBDA, VOL_WINDOW, VolatilityBook, resolve_sigmas
+
+
+def _frame(bars=200, seed=6):
+    rng = np.random.default_rng(seed)
+    close = 30.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+    open_ = close * np.exp(rng.normal(0.0, 0.005, bars))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0.0, 0.01, bars)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0.0, 0.01, bars)))
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": 1.0},
+                        index=pd.date_range("2025-01-02 03:00", periods=bars, freq="B"))
+
+
+def _reference(df):
+    ret = np.log(df["Close"] / df["Close"].shift()).iloc[1:]
+    tail = df.iloc[-VOL_WINDOW:]
+    hl2 = np.log(tail["High"] / tail["Low"]) ** 2
+    co2 = np.log(tail["Close"] / tail["Open"]) ** 2
+    ewma = ret.iloc[0] ** 2
+    for x in ret.iloc[1:]:
+        ewma = EWMA_LAMBDA * ewma + (1 - EWMA_LAMBDA) * x * x
+    return {
+        "close_to_close": ret.iloc[-VOL_WINDOW:].std(ddof=1) * math.sqrt(252),
+        "ewma": math.sqrt(ewma * 252),
+        "parkinson": math.sqrt(hl2.mean() / (4 * math.log(2)) * 252),
+        "garman_klass": math.sqrt((0.5 * hl2 - (2 * math.log(2) - 1) * co2).mean() * 252),
+    }
+
+
+def test_estimators_match_references():
+    root, df = tempfile.mkdtemp(), _frame()
+    candle_store.append_candles("PETR4", "1d", df, root)
+    result = VolatilityBook(root=root).estimates(["PETR4"])["PETR4"]
+    for name, value in _reference(df).items():
+        assert np.isclose(result[name], value, rtol=1e-9), name
+
+
+def test_incremental_refreshes_match_a_fresh_book():
+    root, df = tempfile.mkdtemp(), _frame()
+    book = VolatilityBook(root=root)
+    start = 0
+    for stop in (120, 121, 150, 200):
+        part = df.iloc[start:stop].copy()
+        if stop < len(df):
+            part.iloc[-1, part.columns.get_loc("Close")] *= 1.02     # provisional last bar, replaced next time
+        candle_store.append_candles("PETR4", "1d", part, root)
+        book.estimates(["PETR4"])
+        start = stop - 1
+    incremental = book.estimates(["PETR4"])["PETR4"]
+    fresh = VolatilityBook(root=root).estimates(["PETR4"])["PETR4"]
+    for name, value in _reference(df).items():
+        assert np.isclose(incremental[name], value, rtol=1e-9) and np.isclose(fresh[name], value, rtol=1e-9)
+
+
+def test_sigma_source_order():
+    stocks = [{"ticker": "AAAA3", "vol_ano": "35%"}, {"ticker": "BBBB3", "vol_ano": "#N/A"}]
+    assert np.allclose(resolve_sigmas(stocks, source="sheet"), [0.35, 0.40])
+
+
+if __name__ == "__main__":
+    test_estimators_match_references()
+    test_incremental_refreshes_match_a_fresh_book()
+    test_sigma_source_order()
+    print("Test Passed!")
@@ -15,15 +15,19 @@ Exemplos:
 
 Requisitos:
   pip install pandas requests
+  (usa o cliente SGS do backend: backend/services/sgs_client.py)
 """
 import argparse
 import datetime as dt
+import os
 import sys
-import time
 from typing import Dict, Tuple
 
 import pandas as pd
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from services import sgs_client  # noqa: E402
 
 SERIES: Dict[str, Tuple[str, int]] = {
     "selic_pm": ("Selic (% a.m.)", 4390),
@@ -43,38 +47,16 @@ def parse_end_month(s: str | None) -> dt.date:
 
 def fetch_sgs(code: int, start: dt.date, end: dt.date, timeout: int = 30, retries: int = 3) -> pd.DataFrame:
     """Busca série do SGS (BCB) e devolve DF com data (1º dia do mês) e valor (float)."""
-    def fmt(d: dt.date) -> str:
-        return d.strftime("%d/%m/%Y")
-    url = (
-        f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados"
-        f"?formato=json&dataInicial={fmt(start)}&dataFinal={fmt(end)}"
-    )
-    last_err = None
-    for attempt in range(1, retries + 1):
-        try:
-            r = requests.get(url, timeout=timeout)
-            r.raise_for_status()
-            df = pd.DataFrame(r.json())
-            if df.empty:
-                return pd.DataFrame(columns=["data", "valor"])
-            df["data"] = pd.to_datetime(df["data"], dayfirst=True, errors="coerce")
-            df["valor"] = (
-                df["valor"].astype(str).str.replace(",", ".", regex=False)
-            )
-            df["valor"] = pd.to_numeric(df["valor"], errors="coerce")
-            df["data"] = df["data"].dt.to_period("M").dt.to_timestamp()
-            mask = (df["data"] >= pd.Timestamp(start)) & (df["data"] <= pd.Timestamp(end))
-            df = df.loc[mask, ["data", "valor"]].drop_duplicates("data").sort_values("data")
-            return df.reset_index(drop=True)
-        except Exception as e:
-            last_err = e
-            if attempt < retries:
-                time.sleep(min(2 ** attempt, 5))
-            else:
-                raise
-    if last_err:
-        raise last_err
-    return pd.DataFrame(columns=["data", "valor"])
+    # Cliente SGS compartilhado do backend: sessão keep-alive e backoff com jitter;
+    # `retries` aqui é o total de tentativas
+    obs = sgs_client.series(code, start, end, timeout=timeout, retries=max(0, retries - 1))
+    if not obs:
+        return pd.DataFrame(columns=["data", "valor"])
+    df = pd.DataFrame(obs, columns=["data", "valor"])
+    df["data"] = pd.to_datetime(df["data"]).dt.to_period("M").dt.to_timestamp()
+    mask = (df["data"] >= pd.Timestamp(start)) & (df["data"] <= pd.Timestamp(end))
+    df = df.loc[mask, ["data", "valor"]].drop_duplicates("data").sort_values("data")
+    return df.reset_index(drop=True)
 
 def build_date_index(months: int, end_month: dt.date) -> pd.DatetimeIndex:
     if months <= 0: